@@ -0,0 +1,599 @@
+"""
+Benchmarks for the model admin request paths.
+
+Seeds a database for each backend (SQLite through SQLAlchemy and Django,
+mongomock or a real server for MongoEngine), drives the list, edit, add
+and bulk delete views through the Flask test client and reports latency
+percentiles, database queries per request and peak memory per scenario.
+Each scenario runs in a forked process, so its memory high-water mark and
+the rows it adds or removes don't carry over to the next one.
+
+Usage::
+
+    python benchmarks/bench.py --rows 10000 --repeat 50
+    python benchmarks/bench.py --save benchmarks/baseline.json
+    python benchmarks/bench.py --compare benchmarks/baseline.json
+
+`--compare` exits with status 1 when a scenario got slower than the
+baseline by more than `--tolerance` or runs more queries than it did.
+Latencies depend on the machine, only compare runs made on the same one.
+"""
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import timeit
+import traceback
+from contextlib import contextmanager
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+
+from flask_superadmin import Admin
+
+
+BACKENDS = ('sqlalchemy', 'django', 'mongoengine')
+
+SCENARIOS = ('list', 'list_page', 'list_sort', 'list_search', 'edit',
+             'edit_post', 'add', 'add_post', 'delete')
+
+# Rows deleted by each run of the delete scenario
+DELETE_BATCH = 20
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'bench'
+    app.config['WTF_CSRF_ENABLED'] = False
+    return app, Admin(app)
+
+
+def book_rows(start, count, author_pks):
+    for i in xrange(start, start + count):
+        yield dict(title='book%s' % i, year=1900 + i % 120,
+                   author=author_pks[i % len(author_pks)])
+
+
+class Backend(object):
+    """
+        Sets up one backend with an `Author` and a `Book` model and its
+        admin, and counts the queries it runs.
+    """
+    name = None
+
+    list_display = ('title', 'year', 'author.name')
+    search_fields = ('title',)
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+        self.app, self.admin = make_app()
+        self.setup()
+        self.author_pks = self.seed_authors(max(rows / 10, 1))
+        self.book_pks = self.seed_books(0, rows)
+        self.next_row = rows
+
+    def setup(self):
+        raise NotImplementedError()
+
+    def seed_authors(self, count):
+        raise NotImplementedError()
+
+    def seed_books(self, start, count):
+        """ Inserts `count` books in bulk and returns their pks. """
+        raise NotImplementedError()
+
+    @contextmanager
+    def count_queries(self):
+        yield
+
+    def new_books(self, count):
+        pks = self.seed_books(self.next_row, count)
+        self.next_row += count
+        return pks
+
+    def teardown(self):
+        pass
+
+
+class SQLAlchemyBackend(Backend):
+    name = 'sqlalchemy'
+
+    def setup(self):
+        from flask.ext.sqlalchemy import SQLAlchemy
+        from sqlalchemy import event
+        from flask_superadmin.model.backends.sqlalchemy.view import ModelAdmin
+
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.path
+        db = self.db = SQLAlchemy(self.app)
+
+        class Author(db.Model):
+            id = db.Column(db.Integer, primary_key=True)
+            name = db.Column(db.String(50))
+
+            def __unicode__(self):
+                return self.name
+
+        class Book(db.Model):
+            id = db.Column(db.Integer, primary_key=True)
+            title = db.Column(db.String(50))
+            year = db.Column(db.Integer)
+            author_id = db.Column(db.Integer, db.ForeignKey(Author.id))
+            author = db.relationship(Author, backref='books')
+
+            def __unicode__(self):
+                return self.title
+
+        self.Author, self.Book = Author, Book
+        with self.app.app_context():
+            db.create_all()
+            event.listen(db.engine, 'before_cursor_execute', self._on_query)
+
+        class BookAdmin(ModelAdmin):
+            list_display = self.list_display
+            search_fields = self.search_fields
+
+        self.admin.register(Author, session=db.session)
+        self.admin.register(Book, BookAdmin, session=db.session)
+
+    def _on_query(self, *args):
+        self.queries += 1
+
+    def seed_authors(self, count):
+        with self.app.app_context():
+            self.db.session.execute(
+                self.Author.__table__.insert(),
+                [dict(name='author%s' % i) for i in xrange(count)])
+            self.db.session.commit()
+            return [pk for pk, in self.db.session.query(self.Author.id)]
+
+    def seed_books(self, start, count):
+        rows = [dict(title=row['title'], year=row['year'],
+                     author_id=row['author'])
+                for row in book_rows(start, count, self.author_pks)]
+        with self.app.app_context():
+            self.db.session.execute(self.Book.__table__.insert(), rows)
+            self.db.session.commit()
+            return [pk for pk, in self.db.session.query(self.Book.id)
+                    .filter(self.Book.title.in_([r['title'] for r in rows]))]
+
+    def teardown(self):
+        os.remove(self.path)
+
+
+class DjangoBackend(Backend):
+    name = 'django'
+
+    path = None
+
+    @classmethod
+    def configure(cls):
+        # Has to happen before the first `Admin` is created, it imports the
+        # Django backend
+        from django.conf import settings
+
+        fd, cls.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        settings.configure(DATABASES={'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': cls.path,
+        }})
+
+    def setup(self):
+        from django.db import connection, models
+        from flask_superadmin.model.backends.django.view import ModelAdmin
+        from examples.django.utils import install_models
+
+        class Author(models.Model):
+            name = models.CharField(max_length=50)
+
+            class Meta:
+                app_label = 'bench'
+
+            def __unicode__(self):
+                return self.name
+
+        class Book(models.Model):
+            title = models.CharField(max_length=50)
+            year = models.IntegerField()
+            author = models.ForeignKey(Author)
+
+            class Meta:
+                app_label = 'bench'
+
+            def __unicode__(self):
+                return self.title
+
+        install_models(Author, Book)
+        self.Author, self.Book = Author, Book
+        self.connection = connection
+
+        class BookAdmin(ModelAdmin):
+            list_display = self.list_display
+            search_fields = self.search_fields
+
+        self.admin.register(Author)
+        self.admin.register(Book, BookAdmin)
+
+    @contextmanager
+    def count_queries(self):
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(self.connection) as context:
+            yield
+        self.queries += len(context)
+
+    def seed_authors(self, count):
+        self.Author.objects.bulk_create(
+            [self.Author(name='author%s' % i) for i in xrange(count)])
+        return list(self.Author.objects.values_list('pk', flat=True))
+
+    def seed_books(self, start, count):
+        rows = list(book_rows(start, count, self.author_pks))
+        self.Book.objects.bulk_create(
+            [self.Book(title=row['title'], year=row['year'],
+                       author_id=row['author']) for row in rows])
+        return list(self.Book.objects
+                    .filter(title__in=[row['title'] for row in rows])
+                    .values_list('pk', flat=True))
+
+    def teardown(self):
+        self.connection.close()
+        os.remove(self.path)
+
+
+class MongoEngineBackend(Backend):
+    name = 'mongoengine'
+
+    # Set from the command line to benchmark against a real server
+    host = None
+
+    def setup(self):
+        import mongoengine
+        from mongoengine import connection
+        from flask_superadmin.model.backends.mongoengine.view import ModelAdmin
+
+        if self.host:
+            mongoengine.connect('superadmin_bench', host=self.host)
+        else:
+            # In-process stand-in, good enough to compare query counts and
+            # the time spent on the Python side
+            import mongomock
+            client = mongomock.MongoClient()
+            connection.get_connection = lambda *args, **kwargs: client
+            connection.register_connection('default', 'superadmin_bench')
+            self._patch_mongomock()
+        self._count_commands()
+
+        class Author(mongoengine.Document):
+            name = mongoengine.StringField()
+
+            def __unicode__(self):
+                return self.name
+
+        class Book(mongoengine.Document):
+            title = mongoengine.StringField()
+            year = mongoengine.IntField()
+            author = mongoengine.ReferenceField(Author)
+
+            def __unicode__(self):
+                return self.title
+
+        Author.drop_collection()
+        Book.drop_collection()
+        self.Author, self.Book = Author, Book
+
+        class BookAdmin(ModelAdmin):
+            list_display = self.list_display
+            search_fields = self.search_fields
+
+        self.admin.register(Author)
+        self.admin.register(Book, BookAdmin)
+
+    def _patch_mongomock(self):
+        # MongoEngine passes the write concern as a dict, mongomock only
+        # takes it as keyword arguments
+        from mongomock import Collection
+
+        remove = Collection.remove
+        if getattr(remove, 'patched', False):
+            return
+
+        def patched(collection, spec_or_id=None, write_concern=None,
+                    **kwargs):
+            kwargs.update(write_concern or {})
+            return remove(collection, spec_or_id, **kwargs)
+        patched.patched = True
+        Collection.remove = patched
+
+    def _count_commands(self):
+        # Every collection method that goes to the server
+        if self.host:
+            from pymongo.collection import Collection
+        else:
+            from mongomock import Collection
+
+        def counting(method):
+            def counted(collection, *args, **kwargs):
+                # Methods implemented on top of others count once
+                if self._in_command:
+                    return method(collection, *args, **kwargs)
+                self.queries += 1
+                self._in_command = True
+                try:
+                    return method(collection, *args, **kwargs)
+                finally:
+                    self._in_command = False
+            counted.counted = True
+            return counted
+
+        self._in_command = False
+        for name in ('find', 'find_one', 'find_and_modify', 'insert',
+                     'update', 'save', 'remove', 'count', 'aggregate',
+                     'distinct'):
+            method = getattr(Collection, name, None)
+            if method is None or getattr(method, 'counted', False):
+                continue
+            setattr(Collection, name, counting(method))
+
+    def seed_authors(self, count):
+        authors = self.Author.objects.insert(
+            [self.Author(name='author%s' % i) for i in xrange(count)])
+        return [str(author.pk) for author in authors]
+
+    def seed_books(self, start, count):
+        books = [self.Book(title=row['title'], year=row['year'],
+                           author=self.Author(pk=row['author']))
+                 for row in book_rows(start, count, self.author_pks)]
+        return [str(book.pk) for book in self.Book.objects.insert(books)]
+
+    def teardown(self):
+        self.Author.drop_collection()
+        self.Book.drop_collection()
+
+
+BACKEND_CLASSES = {
+    'sqlalchemy': SQLAlchemyBackend,
+    'django': DjangoBackend,
+    'mongoengine': MongoEngineBackend,
+}
+
+
+def book_form(backend, i):
+    return dict(title='new%s' % i, year='2000',
+                author=str(backend.author_pks[i % len(backend.author_pks)]))
+
+
+def run_scenario(backend, client, name, i):
+    """
+        Issues one request for the scenario `name`. Returns a function
+        that runs it, setup that shouldn't be timed happens here.
+    """
+    url = '/admin/book/'
+    pk = backend.book_pks[i % len(backend.book_pks)]
+
+    if name == 'list':
+        return lambda: client.get(url)
+    if name == 'list_page':
+        page = backend.rows / 20 / 2
+        return lambda: client.get(url + '?page=%s' % page)
+    if name == 'list_sort':
+        return lambda: client.get(url + '?sort=-year')
+    if name == 'list_search':
+        return lambda: client.get(url + '?q=book%s' % (i % 100))
+    if name == 'edit':
+        return lambda: client.get(url + '%s/' % pk)
+    if name == 'edit_post':
+        data = book_form(backend, i)
+        return lambda: client.post(url + '%s/' % pk, data=data)
+    if name == 'add':
+        return lambda: client.get(url + 'add/')
+    if name == 'add_post':
+        data = book_form(backend, i)
+        return lambda: client.post(url + 'add/', data=data)
+    if name == 'delete':
+        data = dict(action='delete', confirm_delete='Confirm',
+                    _selected_action=backend.new_books(DELETE_BATCH))
+        return lambda: client.post(url, data=data)
+    raise ValueError('Unknown scenario %r' % name)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = max(int(round(fraction * len(values))) - 1, 0)
+    return values[index]
+
+
+def peak_memory():
+    # Kilobytes on Linux, bytes on OS X
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def in_child(func, *args):
+    """
+        Calls `func` in a forked process and returns its result, which has
+        to be JSON serializable.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            result = func(*args)
+        except Exception:
+            traceback.print_exc()
+            result, status = None, 1
+        with os.fdopen(write_fd, 'w') as f:
+            json.dump(result, f)
+        sys.stderr.flush()
+        os._exit(status)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        output = f.read()
+    os.waitpid(pid, 0)
+    result = json.loads(output) if output else None
+    if result is None:
+        raise RuntimeError('Child process failed')
+    return result
+
+
+def bench(backend, name, repeat, warmup):
+    client = backend.app.test_client()
+    timings = []
+    queries = []
+    # A forked child starts out with the memory of its parent, only count
+    # what the scenario adds to it
+    memory = peak_memory()
+
+    for i in xrange(warmup + repeat):
+        request = run_scenario(backend, client, name, i)
+        backend.queries = 0
+        with backend.count_queries():
+            start = timeit.default_timer()
+            response = request()
+            elapsed = timeit.default_timer() - start
+        if response.status_code >= 400:
+            raise RuntimeError('%s returned %s' % (name, response.status))
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(backend.queries)
+
+    return {
+        'p50': percentile(timings, 0.5),
+        'p90': percentile(timings, 0.9),
+        'p99': percentile(timings, 0.99),
+        'max': max(timings),
+        'queries': float(sum(queries)) / len(queries),
+        'peak_memory': peak_memory() - memory,
+    }
+
+
+def run(options):
+    if 'django' in options.backends:
+        try:
+            DjangoBackend.configure()
+        except ImportError:
+            pass
+
+    results = {}
+    for name in options.backends:
+        try:
+            backend = BACKEND_CLASSES[name](options.rows)
+        except ImportError, ex:
+            print >> sys.stderr, 'Skipping %s: %s' % (name, ex)
+            continue
+
+        try:
+            for scenario in options.scenarios:
+                key = '%s.%s' % (name, scenario)
+                try:
+                    results[key] = in_child(bench, backend, scenario,
+                                            options.repeat, options.warmup)
+                except Exception:
+                    print >> sys.stderr, 'Failed %s:' % key
+                    traceback.print_exc()
+                    results[key] = None
+                report_line(key, results[key])
+        finally:
+            backend.teardown()
+    return results
+
+
+def report_header():
+    print '%-28s %9s %9s %9s %9s %8s %10s' % (
+        'scenario', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'queries',
+        'peak KB')
+
+
+def report_line(key, result):
+    if result is None:
+        print '%-28s %s' % (key, 'failed')
+        return
+    print '%-28s %9.2f %9.2f %9.2f %9.2f %8.1f %10d' % (
+        key, result['p50'], result['p90'], result['p99'], result['max'],
+        result['queries'], result['peak_memory'])
+
+
+def compare(results, baseline, tolerance):
+    """
+        Prints the scenarios that regressed against `baseline` and returns
+        whether there were any.
+    """
+    regressed = False
+    print
+    print 'Compared to baseline (tolerance %d%%):' % (tolerance * 100)
+    for key in sorted(results):
+        result, base = results[key], baseline.get(key)
+        if result is None or base is None:
+            continue
+        change = (result['p50'] - base['p50']) / base['p50']
+        problems = []
+        if change > tolerance:
+            problems.append('p50 %+.0f%%' % (change * 100))
+        if result['queries'] > base['queries']:
+            problems.append('queries %.1f -> %.1f' % (base['queries'],
+                                                      result['queries']))
+        status = ', '.join(problems) or 'ok (p50 %+.0f%%)' % (change * 100)
+        print '%-28s %s' % (key, status)
+        regressed = regressed or bool(problems)
+    return regressed
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--rows', type='int', default=10000,
+                      help='books seeded per backend [%default]')
+    parser.add_option('--repeat', type='int', default=30,
+                      help='timed requests per scenario [%default]')
+    parser.add_option('--warmup', type='int', default=3,
+                      help='untimed requests per scenario [%default]')
+    parser.add_option('--backends', default=','.join(BACKENDS),
+                      help='comma separated backends [%default]')
+    parser.add_option('--scenarios', default=','.join(SCENARIOS),
+                      help='comma separated scenarios [%default]')
+    parser.add_option('--mongo-host', default=None,
+                      help='MongoDB URI to use instead of mongomock')
+    parser.add_option('--save', metavar='FILE',
+                      help='write the results to FILE')
+    parser.add_option('--compare', metavar='FILE',
+                      help='compare the results with a saved baseline')
+    parser.add_option('--tolerance', type='float', default=0.25,
+                      help='allowed p50 slowdown when comparing [%default]')
+    options, args = parser.parse_args()
+    options.backends = options.backends.split(',')
+    options.scenarios = options.scenarios.split(',')
+    MongoEngineBackend.host = options.mongo_host
+
+    report_header()
+    results = run(options)
+
+    if options.save:
+        # Failed scenarios would have nothing to compare against
+        saved = dict((key, result) for key, result in results.iteritems()
+                     if result is not None)
+        with open(options.save, 'w') as f:
+            json.dump({'rows': options.rows, 'created': time.time(),
+                       'results': saved}, f, indent=2, sort_keys=True,
+                      separators=(',', ': '))
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('rows') != options.rows:
+            print >> sys.stderr, 'Baseline was seeded with %s rows' % \
+                baseline.get('rows')
+        if compare(results, baseline['results'], options.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 import re
 
+from contextlib import contextmanager
 from functools import wraps
 
 from flask import Blueprint, render_template, url_for, abort
 
-from flask_superadmin import babel
+from flask_superadmin import babel, instrumentation
 
 
 def expose(url='/', methods=('GET',)):
@@ -34,6 +35,13 @@ def _wrap_view(f):
         if h is not None:
             return h
 
+        # Views are wrapped once per subclass, only the outermost collects
+        if (self.admin is not None and self.admin.instrument and
+                instrumentation.current_stats() is None):
+            with instrumentation.collect(self):
+                with self.instrument_queries():
+                    return f(self, *args, **kwargs)
+
         return f(self, *args, **kwargs)
 
     return inner
@@ -166,7 +174,20 @@ class BaseView(object):
         kwargs['_gettext'] = babel.gettext
         kwargs['_ngettext'] = babel.ngettext
 
-        return render_template(template, **kwargs)
+        if self.admin is not None and self.admin.debug_footer:
+            kwargs['request_stats'] = instrumentation.current_stats()
+
+        with instrumentation.timed('template_time'):
+            return render_template(template, **kwargs)
+
+    @contextmanager
+    def instrument_queries(self):
+        """
+            Count the database queries run in the block with
+            `instrumentation.record_query`. Model views override it for
+            their backend.
+        """
+        yield
 
     def _prettify_name(self, name):
         """
@@ -277,7 +298,7 @@ class Admin(object):
     app = None
 
     def __init__(self, app=None, name=None, url=None, index_view=None,
-                 translations_path=None):
+                 translations_path=None, instrument=False, debug_footer=False):
         """
             Constructor.
 
@@ -290,13 +311,23 @@ class Admin(object):
             `translations_path`
                 Location of the translation message catalogs. By default will use translations
                 shipped with the Flask-SuperAdmin.
+            `instrument`
+                Collect query counts and timings for every admin request, see
+                `flask_superadmin.instrumentation`.
+            `debug_footer`
+                Show the collected stats at the bottom of every admin page. Implies `instrument`.
         """
         self.translations_path = translations_path
+        self.instrument = instrument or debug_footer
+        self.debug_footer = debug_footer
+        self.stats_callbacks = []
 
         self._views = []
         self._menu = []
         self._menu_categories = dict()
         self._models = []
+        self._model_views = dict()
+        self._model_view_cache = dict()
         self._model_backends = list()
 
         try:
@@ -317,6 +348,10 @@ class Admin(object):
         except:
             pass
 
+        if self.instrument:
+            for backend in self._model_backends:
+                backend.prepare_instrumentation()
+
         if name is None:
             name = 'Admin'
         self.name = name
@@ -362,8 +397,32 @@ class Admin(object):
         model_view = new_class(model, *args, **kwargs)
 
         self._models.append((model, model_view))
+        self._model_views.setdefault(model, model_view)
+        self._model_view_cache.clear()
         self.add_view(model_view)
 
+    def get_model_view(self, model):
+        """
+            Return the view registered for `model` or, failing that, for the
+            closest of its base classes. Returns ``None`` if there is none.
+
+            `model`
+                Model class to look up.
+        """
+        try:
+            return self._model_view_cache[model]
+        except KeyError:
+            pass
+
+        model_view = None
+        for cls in getattr(model, '__mro__', (model,)):
+            model_view = self._model_views.get(cls)
+            if model_view is not None:
+                break
+
+        self._model_view_cache[model] = model_view
+        return model_view
+
     def add_view(self, view):
         """
             Add view to the collection.
@@ -410,6 +469,16 @@ class Admin(object):
 
         self.locale_selector_func = f
 
+    def stats_callback(self, f):
+        """
+            Register a function called with the
+            `flask_superadmin.instrumentation.RequestStats` of every admin
+            request when instrumentation is enabled. Can be used as a
+            decorator.
+        """
+        self.stats_callbacks.append(f)
+        return f
+
     def _add_view_to_menu(self, view):
         """
             Add view to the menu tree
@@ -3,6 +3,7 @@ import datetime
 
 from flask.ext import wtf
 from wtforms import fields, widgets
+from wtforms.validators import StopValidation, ValidationError
 
 from flask_superadmin.babel import gettext
 from flask import request
@@ -104,6 +105,150 @@ class ChosenSelectField(fields.SelectField):
     """
     widget = ChosenSelectWidget
 
+class AutocompleteSelectWidget(widgets.Select):
+    """
+        `Chosen <http://harvesthq.github.com/chosen/>`_ styled select widget
+        that only renders the selected options and looks the other ones up
+        on the server as the user types.
+
+        You must include chosen.js and form.js for styling to work.
+    """
+    def __call__(self, field, **kwargs):
+        kwargs['data-role'] = u'autocomplete'
+        kwargs['data-url'] = field.url or u''
+        if getattr(field, 'allow_blank', False) and not self.multiple:
+            kwargs['data-allow-blank'] = u'1'
+
+        return super(AutocompleteSelectWidget, self).__call__(field, **kwargs)
+
+
+class AutocompleteSelectField(fields.SelectFieldBase):
+    """
+        Select field for relations with too many rows to list. The `data`
+        property holds the selected object, submitted primary keys are
+        resolved with a single `get_objects` call.
+
+        `get_objects`
+            Callable returning the objects with the given primary keys
+        `get_pk`
+            Callable returning the primary key of an object
+        `get_label`
+            Callable returning the label of an object. Defaults to the
+            object's `__unicode__`
+        `url`
+            Autocomplete URL, or a callable returning it
+    """
+    widget = AutocompleteSelectWidget()
+
+    def __init__(self, label=None, validators=None, get_objects=None,
+                 get_pk=None, get_label=None, url=None, allow_blank=False,
+                 blank_text=u'', **kwargs):
+        super(AutocompleteSelectField, self).__init__(label, validators,
+                                                      **kwargs)
+        self.get_objects = get_objects
+        self.get_pk = get_pk
+        self.get_label = get_label or unicode
+        self._url = url
+        self.allow_blank = allow_blank
+        self.blank_text = blank_text
+        self._formdata = None
+        self._invalid_formdata = False
+
+    @property
+    def url(self):
+        if callable(self._url):
+            return self._url()
+        return self._url
+
+    def _lookup(self, pks):
+        if not pks:
+            return {}
+        try:
+            return dict((unicode(self.get_pk(obj)), obj)
+                        for obj in self.get_objects(pks))
+        except ValueError:
+            # Primary keys the database can't even compare
+            return {}
+
+    def _get_data(self):
+        if self._formdata is not None:
+            obj = self._lookup([self._formdata]).get(self._formdata)
+            self._invalid_formdata = obj is None
+            self._set_data(obj)
+        return self._data
+
+    def _set_data(self, data):
+        self._data = data
+        self._formdata = None
+
+    data = property(_get_data, _set_data)
+
+    def iter_choices(self):
+        if self.allow_blank:
+            yield (u'__None', self.blank_text, self.data is None)
+
+        if self.data is not None:
+            yield (unicode(self.get_pk(self.data)),
+                   self.get_label(self.data), True)
+
+    def process_formdata(self, valuelist):
+        if valuelist:
+            if valuelist[0] in (u'__None', u''):
+                self.data = None
+            else:
+                self._data = None
+                self._formdata = valuelist[0]
+
+    def pre_validate(self, form):
+        data = self.data
+        # Unknown primary keys make the other validators moot
+        if self._invalid_formdata:
+            raise StopValidation(self.gettext('Not a valid choice'))
+        if data is None and not self.allow_blank:
+            raise ValidationError(self.gettext('Not a valid choice'))
+
+
+class AutocompleteSelectMultipleField(AutocompleteSelectField):
+    """
+        Multiple select version of `AutocompleteSelectField`. The `data`
+        property holds a list of objects.
+    """
+    widget = AutocompleteSelectWidget(multiple=True)
+
+    def __init__(self, label=None, validators=None, default=None, **kwargs):
+        if default is None:
+            default = []
+        super(AutocompleteSelectMultipleField, self).__init__(
+            label, validators, default=default, **kwargs)
+
+    def _get_data(self):
+        formdata = self._formdata
+        if formdata is not None:
+            objects = self._lookup(formdata)
+            self._invalid_formdata = len(objects) != len(formdata)
+            self._set_data([objects[pk] for pk in formdata if pk in objects])
+        return self._data
+
+    data = property(_get_data, AutocompleteSelectField._set_data)
+
+    def iter_choices(self):
+        for obj in self.data or ():
+            yield (unicode(self.get_pk(obj)), self.get_label(obj), True)
+
+    def process_formdata(self, valuelist):
+        formdata = []
+        for pk in valuelist:
+            if pk not in formdata:
+                formdata.append(pk)
+        self._data = None
+        self._formdata = formdata
+
+    def pre_validate(self, form):
+        self.data
+        if self._invalid_formdata:
+            raise StopValidation(self.gettext('Not a valid choice'))
+
+
 class FileFieldWidget(object):
     # widget_file = widgets.FileInput()
     widget_checkbox = widgets.CheckboxInput()
@@ -0,0 +1,168 @@
+"""
+Per request instrumentation of the admin views.
+
+When an `Admin` is created with ``instrument=True``, every request to one of
+its views collects a `RequestStats`: the number of database queries and the
+time spent running them, rendering templates and building forms. Once the
+view returns, the stats are logged at debug level, passed to the callbacks
+registered with `Admin.stats_callback` and sent with the `request_stats`
+signal (if blinker is installed)::
+
+    admin = Admin(app, instrument=True)
+
+    @admin.stats_callback
+    def log_slow_requests(stats):
+        if stats.db_time > 0.5:
+            app.logger.warning('%s: %s', stats.endpoint, stats)
+
+    # or, with blinker
+    from flask_superadmin.instrumentation import request_stats
+
+    @request_stats.connect
+    def log_slow_requests(view, stats):
+        ...
+
+Queries are counted by the backend of the view, see
+`BaseView.instrument_queries`. MongoEngine needs PyMongo 3.1 or later and
+the `Admin` to be created before the connection.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from flask.signals import Namespace, signals_available
+
+
+_signals = Namespace()
+
+# Sent with the `RequestStats` of every instrumented admin request
+request_stats = _signals.signal('superadmin-request-stats')
+
+# Stats of the request a thread works for, see `bound`
+_local = threading.local()
+
+
+class RequestStats(object):
+    """
+        What an admin request cost. Times are in seconds.
+    """
+    def __init__(self, view, endpoint=None):
+        self.view = view
+        self.endpoint = endpoint
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.form_time = 0.0
+        self.total_time = None
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record_query(self, duration):
+        # Queries can run in background threads, see `bound`
+        with self._lock:
+            self.query_count += 1
+            self.db_time += duration
+
+    @property
+    def elapsed(self):
+        """ Time since the request started, even while it's running. """
+        if self.total_time is not None:
+            return self.total_time
+        return time.time() - self.started
+
+    def as_dict(self):
+        return {
+            'endpoint': self.endpoint,
+            'query_count': self.query_count,
+            'db_time': self.db_time,
+            'template_time': self.template_time,
+            'form_time': self.form_time,
+            'total_time': self.total_time,
+        }
+
+    def __str__(self):
+        return ('%d queries in %.1fms, templates %.1fms, forms %.1fms, '
+                'total %.1fms' % (self.query_count, self.db_time * 1000,
+                                  self.template_time * 1000,
+                                  self.form_time * 1000,
+                                  self.elapsed * 1000))
+
+
+def current_stats():
+    """
+        Return the `RequestStats` of the current request, or ``None`` if
+        it isn't instrumented.
+    """
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        return stats
+    if not has_request_context():
+        return None
+    return getattr(g, '_superadmin_stats', None)
+
+
+def record_query(duration):
+    """
+        Count a query that took `duration` seconds in the current request.
+        Does nothing outside of instrumented requests.
+    """
+    stats = current_stats()
+    if stats is not None:
+        stats.record_query(duration)
+
+
+@contextmanager
+def bound(stats):
+    """
+        Record the queries run in the block in `stats`, for threads working
+        for a request outside of its context.
+    """
+    _local.stats = stats
+    try:
+        yield
+    finally:
+        _local.stats = None
+
+
+@contextmanager
+def timed(name):
+    """
+        Add the time spent in the block to the `name` attribute of the
+        current request's stats.
+    """
+    stats = current_stats()
+    if stats is None:
+        yield
+        return
+
+    start = time.time()
+    try:
+        yield
+    finally:
+        setattr(stats, name, getattr(stats, name) + time.time() - start)
+
+
+@contextmanager
+def collect(view):
+    """
+        Collect the stats of the request handled by `view` in the block
+        and publish them when it's done.
+    """
+    stats = g._superadmin_stats = RequestStats(view, request.endpoint)
+    try:
+        yield stats
+    finally:
+        stats.total_time = time.time() - stats.started
+        g._superadmin_stats = None
+        publish(view.admin, stats)
+
+
+def publish(admin, stats):
+    current_app.logger.debug('Admin request %s: %s', stats.endpoint, stats)
+
+    for callback in admin.stats_callbacks:
+        callback(stats)
+
+    if signals_available:
+        request_stats.send(stats.view, stats=stats)
@@ -0,0 +1,97 @@
+"""
+Actions of the list view.
+
+`BaseModelAdmin.update_actions` lists the updates offered in the action
+select of the list view for the selected rows::
+
+    class ArticleAdmin(ModelAdmin):
+        update_actions = (
+            # applied right away
+            UpdateAction('publish', 'Publish', values={'published': True}),
+            # asks for the new status first
+            UpdateAction('set_status', 'Change status', fields=('status',)),
+        )
+
+The rows are updated with one statement per chunk of
+`BaseModelAdmin.update_chunk_size` primary keys (``UPDATE ... WHERE pk IN``,
+``QuerySet.update``, ``update(set__...)``) instead of being saved one by one,
+unless the model relies on per-object hooks, see
+`BaseModelAdmin.bulk_update`.
+
+Other actions are methods of the model admin decorated with `action`. They
+get a lazy queryset of the selected rows, or of every row matching the
+current search, so they can work on them with set-based queries instead of
+loading every object::
+
+    class ArticleAdmin(ModelAdmin):
+        @action('archive', 'Archive')
+        def archive(self, qs):
+            qs.update({'archived': True}, synchronize_session=False)
+            self.session.commit()
+
+An action can return a response, otherwise the list view is shown again.
+Actions are only offered and run when the model admin allows editing, pass
+``permission='delete'`` for one that deletes rows or ``permission=None`` for
+one that doesn't change anything::
+
+    @action('export_csv', 'Export CSV', permission=None)
+    def export_csv(self, qs):
+        ...
+"""
+
+
+class UpdateAction(object):
+    """
+        Sets fields of the selected rows.
+
+        `name`
+            Value of the action in the action select
+        `label`
+            Text shown in the action select
+        `values`
+            Dict of the values to set, e.g. ``{'published': True}``
+        `fields`
+            Fields whose values are asked for in a form before updating
+    """
+    def __init__(self, name, label=None, values=None, fields=()):
+        if not values and not fields:
+            raise ValueError('Update action %r sets no fields' % name)
+        self.name = name
+        self.label = label or name.replace('_', ' ').capitalize()
+        self.values = dict(values or {})
+        self.fields = tuple(fields)
+
+
+# Permissions an action can require, by the model admin flag granting them
+PERMISSIONS = {
+    'create': 'can_create',
+    'edit': 'can_edit',
+    'delete': 'can_delete',
+}
+
+
+def action(name=None, label=None, permission='edit'):
+    """
+        Registers the decorated model admin method as an action of the list
+        view, called with the queryset of the rows to act on.
+
+        `name`
+            Value of the action in the action select, the method name by
+            default
+        `label`
+            Text shown in the action select
+        `permission`
+            ``'create'``, ``'edit'`` or ``'delete'``, the action is only
+            available when the matching ``can_*`` flag of the model admin is
+            set. ``None`` for actions that need none.
+    """
+    if permission is not None and permission not in PERMISSIONS:
+        raise ValueError('Unknown action permission %r' % permission)
+
+    def wrap(func):
+        action_name = name or func.__name__
+        func._action = (action_name,
+                        label or action_name.replace('_', ' ').capitalize(),
+                        permission)
+        return func
+    return wrap
@@ -57,7 +57,9 @@ class AdminModelConverter(ModelConverterBase):
         f.TextAreaField: ['TextField', 'XMLField'],
     }
 
-    def __init__(self, extra_converters=None, simple_conversions=None):
+    def __init__(self, extra_converters=None, simple_conversions=None,
+                 view=None):
+        self.view = view
         converters = {}
         if simple_conversions is None:
             simple_conversions = self.DEFAULT_SIMPLE_CONVERSIONS
@@ -76,6 +78,16 @@ class AdminModelConverter(ModelConverterBase):
         return _converter
 
     def conv_ForeignKey(self, model, field, kwargs):
+        if self.view is not None and \
+                field.name in self.view.autocomplete_fields:
+            remote_model = field.rel.to
+            return form.AutocompleteSelectField(
+                get_objects=lambda pks: remote_model._default_manager.filter(
+                    pk__in=pks),
+                get_pk=lambda obj: obj.pk,
+                url=lambda: self.view.get_autocomplete_url(remote_model),
+                allow_blank=field.null, **kwargs)
+
         return ModelSelectField(widget=form.ChosenSelectWidget(),
                                 model=field.rel.to, **kwargs)
 
@@ -0,0 +1,34 @@
+"""
+Full-text search engines for Django models.
+"""
+import operator
+
+from django.db import models
+
+from flask_superadmin.model.search import BaseSearchEngine, parse_search_query
+
+
+class FullTextSearch(BaseSearchEngine):
+    """
+        Django's ``search`` lookup: MySQL full-text indexes up to Django
+        1.9, PostgreSQL search vectors with ``django.contrib.postgres``
+        from Django 1.10 on.
+
+        Every word has to match one of the search fields, like the default
+        search. ``^word`` and ``=word`` use ``startswith`` and ``exact``
+        lookups, which a plain index on the field can answer.
+    """
+    lookups = {'': 'search', '^': 'startswith', '=': 'exact'}
+
+    def apply(self, view, qs, search_query):
+        # The default search's field prefixes don't apply here
+        fields = [str(field).lstrip('^=') for field in view.search_fields]
+        terms = parse_search_query(search_query)
+        if not terms and search_query.split():
+            return qs.none()
+        for term in terms:
+            lookup = self.lookups[term.op]
+            qs = qs.filter(reduce(operator.or_, [
+                models.Q(**{'%s__%s' % (field, lookup): term.word})
+                for field in fields]))
+        return qs
@@ -1,11 +1,43 @@
-from flask_superadmin.model.base import BaseModelAdmin
+from flask_superadmin import instrumentation
+from flask_superadmin.model import pagination
+from flask_superadmin.model.base import BaseModelAdmin, SortColumn, chunked
 
 from orm import model_form, AdminModelConverter
-from django.db import models
+from filters import FilterConverter, FilterDateRange
+from search import FullTextSearch
+from django.db import connections, models, router
+from django.db.models import signals
+from django.core.exceptions import ValidationError
+from django.db.models.fields import FieldDoesNotExist
+from django.conf import settings
+from django.utils import timezone
 
+try:
+    # Django >= 1.10
+    from django.db.models.functions import Extract
+except ImportError:
+    Extract = None
+
+from contextlib import contextmanager
 import operator
+import time
+
+
+def _record_execute(execute, sql, params, many, context):
+    start = time.time()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        instrumentation.record_query(time.time() - start)
+
 
 class ModelAdmin(BaseModelAdmin):
+    search_engines = dict(BaseModelAdmin.search_engines,
+                          fulltext=FullTextSearch)
+
+    # Turns the fields of `list_filters` into filters
+    filter_converter = FilterConverter()
+
     @staticmethod
     def model_detect(model):
         return issubclass(model, models.Model)
@@ -17,14 +49,21 @@ class ModelAdmin(BaseModelAdmin):
         return model_form
 
     def get_converter(self):
-        return AdminModelConverter
+        return AdminModelConverter(view=self)
 
     def get_queryset(self):
-        return self.model.objects
+        # A QuerySet, managers can't be sliced
+        return self.model.objects.all()
 
     def get_objects(self, *pks):
         return self.get_queryset().filter(pk__in=pks)
 
+    def apply_pk_order(self, qs):
+        ordering = list(qs.query.order_by)
+        if not ordering and qs.query.default_ordering:
+            ordering = list(self.model._meta.ordering)
+        return qs.order_by(*(ordering + ['pk']))
+
     def get_object(self, pk):
         return self.model.objects.get(pk=pk)
 
@@ -34,45 +73,456 @@ class ModelAdmin(BaseModelAdmin):
     def save_model(self, instance, form, adding=False):
         form.populate_obj(instance)
         instance.save()
+        self.invalidate_list_cache()
         return instance
 
     def delete_models(self, *pks):
-        self.get_objects(*pks).delete()
+        for chunk in chunked(pks, self.delete_chunk_size):
+            if self.bulk_delete:
+                # Django collects the cascades and sends the signals itself
+                self.get_objects(*chunk).delete()
+            else:
+                for obj in self.get_objects(*chunk):
+                    obj.delete()
+        self.invalidate_list_cache()
+        return True
+
+    def delete_matching_models(self, search_query=None, filters=None):
+        if not self.bulk_delete:
+            return super(ModelAdmin, self).delete_matching_models(
+                search_query, filters)
+        qs = self.get_action_queryset(None, search_query, filters)
+        count = qs.count()
+        # Django collects the cascades and sends the signals itself
+        qs.delete()
+        self.invalidate_list_cache()
+        return count
+
+    def can_bulk_update(self, values):
+        if not self.bulk_update:
+            return False
+        # QuerySet.update() doesn't call save() nor send the save signals
+        if self.model.save.__func__ is not models.Model.save.__func__:
+            return False
+        if signals.pre_save.has_listeners(self.model) or \
+                signals.post_save.has_listeners(self.model):
+            return False
+        for name in values:
+            field = self._get_field(name)
+            if field is None or isinstance(field, models.ManyToManyField):
+                return False
         return True
 
-    def construct_search(self, field_name):
+    def update_models(self, values, *pks):
+        bulk = self.can_bulk_update(values)
+        count = 0
+        for chunk in chunked(pks, self.update_chunk_size):
+            if bulk:
+                count += self.get_objects(*chunk).update(**values)
+            else:
+                for obj in self.get_objects(*chunk):
+                    for name, value in values.iteritems():
+                        setattr(obj, name, value)
+                    obj.save()
+                    count += 1
+        self.invalidate_list_cache()
+        return count
+
+    def update_matching_models(self, values, search_query=None,
+                               filters=None):
+        if not self.can_bulk_update(values):
+            return super(ModelAdmin, self).update_matching_models(
+                values, search_query, filters)
+        qs = self.get_action_queryset(None, search_query, filters)
+        count = qs.update(**values)
+        self.invalidate_list_cache()
+        return count
+
+    def get_unique_checks(self):
+        meta = self.model._meta
+        checks = [(field.name,) for field in meta.fields if field.unique]
+        for names in meta.unique_together:
+            if tuple(names) not in checks:
+                checks.append(tuple(names))
+        return checks
+
+    def find_unique_conflicts(self, checks, instance=None):
+        lookups = [models.Q(**dict(zip(names, values)))
+                   for names, values in checks]
+        # Unique indexes cover every row, not only those of get_queryset
+        qs = self.model._base_manager.filter(reduce(operator.or_, lookups))
+        if instance is not None and instance.pk is not None:
+            qs = qs.exclude(pk=instance.pk)
+
+        names = sorted(set(name for check in checks for name in check[0]))
+        fields = [self._get_field(name) for name in names]
+        # Every check matches at most one other row
+        rows = qs.values_list(*[field.attname for field in fields])
+        rows = [dict(zip(names, row)) for row in rows[:len(checks)]]
+
+        conflicts = []
+        for names, values in checks:
+            # Related objects are compared by primary key
+            values = [getattr(value, 'pk', value)
+                      if isinstance(self._get_field(name), models.ForeignKey)
+                      else value for name, value in zip(names, values)]
+            if any([row[name] for name in names] == values for row in rows):
+                conflicts.append(names)
+        if rows and not conflicts:
+            # Matched by the database only, e.g. with a case-insensitive
+            # collation
+            conflicts = [names for names, values in checks]
+        return conflicts
+
+    def get_matching_pks(self, search_query=None, filters=None):
+        qs = self.get_queryset()
+        if search_query and self.search_fields:
+            qs = self.apply_search(qs, search_query)
+        if filters:
+            qs = self.apply_filters(qs, filters)
+        return qs.values_list('pk', flat=True).distinct()
+
+    @contextmanager
+    def instrument_queries(self):
+        connection = connections[router.db_for_read(self.model)]
+        if hasattr(connection, 'execute_wrapper'):
+            # Django >= 2.0
+            with connection.execute_wrapper(_record_execute):
+                yield
+            return
+
+        # Older versions only time queries with the debug cursor
+        if hasattr(connection, 'force_debug_cursor'):
+            flag = 'force_debug_cursor'
+        else:
+            flag = 'use_debug_cursor'
+        debug_cursor = getattr(connection, flag)
+        setattr(connection, flag, True)
+        start = len(connection.queries)
+        try:
+            yield
+        finally:
+            setattr(connection, flag, debug_cursor)
+            for query in connection.queries[start:]:
+                instrumentation.record_query(float(query['time']))
+
+    def can_count_concurrently(self):
+        connection = connections[router.db_for_read(self.model)]
+        # In-memory SQLite has a database per connection, i.e. per thread
+        return not (connection.vendor == 'sqlite' and
+                    connection.settings_dict['NAME'] in ('', ':memory:'))
+
+    def count_concurrently(self, qs, search_query=None, filters=None):
+        try:
+            return self.get_count(qs, search_query, filters)
+        finally:
+            # Connections are per thread, don't leave one open in the pool
+            connections[qs.db].close()
+
+    def get_related_model(self, model, name):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.rel:
+            return field.rel.to
+
+    def get_referenced_models(self):
+        opts = self.model._meta
+        return [field.rel.to
+                for field in list(opts.fields) + list(opts.many_to_many)
+                if field.rel]
+
+    def _is_many_path(self, path):
+        model = self.model
+        for name in path.split('.'):
+            field = model._meta.get_field(name)
+            if isinstance(field, models.ManyToManyField):
+                return True
+            model = field.rel.to
+        return False
+
+    def apply_select_related(self, qs, paths):
+        # Foreign keys are joined in, many-to-many relations are prefetched
+        # with one query per relation
+        for path in paths:
+            lookup = path.replace('.', '__')
+            if self._is_many_path(path):
+                qs = qs.prefetch_related(lookup)
+            else:
+                qs = qs.select_related(lookup)
+        return qs
+
+    def get_projection_fields(self, name):
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        # Many-to-many relations aren't columns of the model's table
+        if isinstance(field, models.ManyToManyField):
+            return []
+        return [name]
+
+    def apply_projection(self, qs, fields):
+        return qs.only(*fields)
+
+    def estimate_count(self):
+        connection = connections[router.db_for_read(self.model)]
+        table = self.model._meta.db_table
+
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples FROM pg_class WHERE relname = %s'
+        elif connection.vendor == 'mysql':
+            sql = ('SELECT table_rows FROM information_schema.tables '
+                   'WHERE table_schema = DATABASE() AND table_name = %s')
+        else:
+            return None
+
+        cursor = connection.cursor()
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+
+        # Tables that were never analyzed have no (or a negative) estimate
+        if row is None or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+    def construct_search(self, field_name, match='contains'):
         if field_name.startswith('^'):
             return "%s__istartswith" % field_name[1:]
         elif field_name.startswith('='):
             return "%s__iexact" % field_name[1:]
+        elif match == 'prefix':
+            # Case sensitive, so the pattern index Django creates for
+            # indexed text fields on PostgreSQL applies
+            return "%s__startswith" % field_name
+        elif match == 'exact':
+            return "%s__exact" % field_name
         else:
             return "%s__icontains" % field_name
 
-    def get_list(self, page=0, sort=None, sort_desc=None, execute=False, search_query=None):
+    def _get_field(self, field_name):
+        if field_name == 'pk':
+            return self.model._meta.pk
+        try:
+            return self.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            return None
+
+    def scaffold_filters(self, name):
+        field = self._get_field(name)
+        if field is None:
+            return None
+        return self.filter_converter.convert(field, field.name,
+                                             self.field_name(name))
+
+    def get_facet_counts(self, qs, name):
+        field = self._get_field(name).name
+        qs = qs.order_by().values_list(field).annotate(models.Count('pk'))
+        return list(qs.order_by('-pk__count', field)[:self.list_facet_limit])
+
+    def scaffold_date_filter(self, name):
+        field = self._get_field(name)
+        if not isinstance(field, models.DateField):
+            return None
+        return FilterDateRange(field.name, self.field_name(name),
+                               isinstance(field, models.DateTimeField))
+
+    def get_date_buckets(self, qs, name, level):
+        field = self._get_field(name)
+        qs = qs.order_by()
+        if Extract is not None:
+            qs = qs.annotate(date_bucket=Extract(field.name, level))
+        else:
+            connection = connections[qs.db]
+            column = '%s.%s' % (
+                connection.ops.quote_name(self.model._meta.db_table),
+                connection.ops.quote_name(field.column))
+            if isinstance(field, models.DateTimeField):
+                tzname = (timezone.get_current_timezone_name()
+                          if settings.USE_TZ else None)
+                sql, params = connection.ops.datetime_extract_sql(
+                    level, column, tzname)
+            else:
+                sql = connection.ops.date_extract_sql(level, column)
+                params = []
+            qs = qs.extra(select={'date_bucket': sql}, select_params=params)
+        qs = qs.values_list('date_bucket').annotate(models.Count('pk'))
+        return [(int(value), count)
+                for value, count in qs.order_by('date_bucket')
+                if value is not None]
+
+    def get_date_bounds(self, qs, name):
+        field = self._get_field(name).name
+        bounds = qs.aggregate(first=models.Min(field), last=models.Max(field))
+        return bounds['first'], bounds['last']
+
+    def _is_indexed(self, model, field):
+        if field.db_index or field.unique or field.primary_key:
+            return True
+        # Also counts when it's the leading field of a multi-field index
+        meta = model._meta
+        together = list(meta.index_together) + list(meta.unique_together)
+        together += [index.fields for index in getattr(meta, 'indexes', [])]
+        return any(list(fields)[:1] == [field.name] for fields in together)
+
+    def get_index_match(self, field_name):
+        field = self._get_field(field_name)
+        if field is None or field.rel or \
+                not self._is_indexed(self.model, field):
+            return None
+
+        if isinstance(field, (models.CharField, models.TextField)):
+            return 'prefix'
+        if isinstance(field, (models.IntegerField, models.FloatField,
+                              models.DecimalField, models.AutoField)):
+            return 'exact'
+        return None
+
+    def compile_sort(self, name):
+        model = self.model
+        path = name.split('.')
+        for i, part in enumerate(path):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return None
+            if isinstance(field, models.ManyToManyField):
+                return None
+            if i < len(path) - 1:
+                if not field.rel:
+                    return None
+                model = field.rel.to
+        indexed = self._is_indexed(model, field)
+        return SortColumn('__'.join(path), (), indexed)
+
+    def get_keyset(self, instance, sort):
+        values = [self.get_pk(instance)]
+        if sort:
+            # Foreign keys are sorted (and seeked) by their raw column value
+            path = sort.split('.')
+            value, model = instance, self.model
+            for name in path[:-1]:
+                if value is not None:
+                    value = getattr(value, name)
+                model = model._meta.get_field(name).rel.to
+            if value is not None:
+                value = getattr(value, model._meta.get_field(path[-1]).attname)
+            values.insert(0, value)
+        return values
+
+    def apply_keyset(self, qs, sort, sort_desc, cursor):
+        direction, values = cursor or (pagination.NEXT, None)
+        ascending = pagination.is_ascending(sort_desc, direction)
+
+        names = ['pk']
+        if sort:
+            names.insert(0, self.get_sort_column(sort).expression)
+
+        # Seek past the cursor row: (f1, f2) > (v1, v2)
+        if values:
+            lookup = 'gt' if ascending else 'lt'
+            or_queries = []
+            for i, name in enumerate(names):
+                query = dict(zip(names[:i], values[:i]))
+                query['%s__%s' % (name, lookup)] = values[i]
+                or_queries.append(models.Q(**query))
+            qs = qs.filter(reduce(operator.or_, or_queries))
+
+        qs = qs.order_by(*['%s%s' % ('' if ascending else '-', name)
+                           for name in names])
+
+        return qs[:self.list_fetch_size]
+
+    def apply_default_search(self, qs, search_query):
+        plan = self.get_search_plan()
+        orm_lookups = [(self.construct_search(str(search_field), match),
+                        search_field, match)
+                       for search_field, match in plan]
+        for bit in search_query.split():
+            or_queries = []
+            for orm_lookup, search_field, match in orm_lookups:
+                value = bit
+                if match == 'exact':
+                    # Skip the field if the word isn't one of its values
+                    try:
+                        value = self._get_field(search_field).to_python(bit)
+                    except ValidationError:
+                        continue
+                or_queries.append(models.Q(**{orm_lookup: value}))
+            if not or_queries:
+                return qs.none()
+            qs = qs.filter(reduce(operator.or_, or_queries))
+        if self.search_explain:
+            self.explain_search(search_query, plan, qs.query)
+        return qs
+
+    def get_export_list(self, sort=None, sort_desc=None, search_query=None,
+                        filters=None):
+        qs = self.get_queryset()
+        if search_query and self.search_fields:
+            qs = self.apply_search(qs, search_query)
+        if filters:
+            qs = self.apply_filters(qs, filters)
+
+        # iterator() ignores prefetch_related, only foreign keys are
+        # joined in
+        select_related = [path for path in self.get_select_related()
+                          if not self._is_many_path(path)]
+        if select_related:
+            qs = self.apply_select_related(qs, select_related)
+
+        fields = self.get_list_projection()
+        if fields is not None:
+            qs = self.apply_projection(qs, fields)
+
+        names = ['pk']
+        if sort:
+            names.insert(0, self.get_sort_column(sort).expression)
+        qs = qs.order_by(*['%s%s' % ('-' if sort_desc else '', name)
+                           for name in names])
+
+        # Skips the queryset's result cache
+        return qs.iterator()
+
+    def get_list(self, page=0, sort=None, sort_desc=None, execute=False,
+                 search_query=None, cursor=None, filters=None):
         qs = self.get_queryset()
 
         # Filter by search query
         if search_query and self.search_fields:
-            orm_lookups = [self.construct_search(str(search_field))
-                           for search_field in self.search_fields]
-            for bit in search_query.split():
-                or_queries = [models.Q(**{orm_lookup: bit})
-                              for orm_lookup in orm_lookups]
-                qs = qs.filter(reduce(operator.or_, or_queries))
+            qs = self.apply_search(qs, search_query)
+
+        if filters:
+            qs = self.apply_filters(qs, filters)
 
         #Calculate number of rows
-        count = qs.count()
+        count = self.start_count(qs, search_query, filters)
 
-        #Order queryset
-        if sort:
-            qs = qs.order_by('%s%s' % ('-' if sort_desc else '', sort))
+        # Only load the fields shown in the list
+        fields = self.get_list_projection(sort)
+        if fields is not None:
+            qs = self.apply_projection(qs, fields)
+
+        # Load the relations shown in the list along with the rows
+        select_related = self.get_select_related()
+        if select_related:
+            qs = self.apply_select_related(qs, select_related)
+
+        if self.keyset_pagination:
+            qs = self.apply_keyset(qs, sort, sort_desc, cursor)
+        else:
+            #Order queryset
+            if sort:
+                name = self.get_sort_column(sort).expression
+                qs = qs.order_by('%s%s' % ('-' if sort_desc else '', name))
 
-        # Pagination
-        if page is not None:
-            qs = qs.all()[page * self.list_per_page:]
-        qs = qs[:self.list_per_page]
+            # Pagination
+            if page is not None:
+                qs = qs.all()[page * self.list_per_page:]
+            qs = qs[:self.list_fetch_size]
 
-        if execute:
+        if execute or count.concurrent:
             qs = list(qs)
 
-        return count, qs
+        return count.get(), qs
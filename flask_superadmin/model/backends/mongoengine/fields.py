@@ -3,6 +3,7 @@ Useful form fields for use with the mongoengine.
 """
 import operator
 
+import mongoengine
 from wtforms import widgets
 from wtforms.fields import SelectFieldBase, FieldList
 from wtforms.validators import ValidationError
@@ -43,6 +44,10 @@ class QuerySelectField(SelectFieldBase):
     top of the list. Selecting this choice will result in the `data` property
     being `None`. The label for this blank choice can be set by specifying the
     `blank_text` parameter.
+
+    Submitted choices are looked up by primary key with a single query, the
+    whole query is only loaded to render the choices, with just the primary
+    key and the `get_label` attribute when it's a string.
     """
     widget = widgets.Select()
 
@@ -54,9 +59,11 @@ class QuerySelectField(SelectFieldBase):
 
         self.get_pk = lambda x: x.id
 
+        self.label_field = None
         if get_label is None:
             self.get_label = lambda x: x
         elif isinstance(get_label, (str, basestring)):
+            self.label_field = get_label
             self.get_label = operator.attrgetter(get_label)
         else:
             self.get_label = get_label
@@ -65,13 +72,14 @@ class QuerySelectField(SelectFieldBase):
         self.blank_text = blank_text
         self.query = None
         self._object_list = None
+        # Objects of the query by primary key, see _get_objects
+        self._objects = {}
 
     def _get_data(self):
         if self._formdata is not None:
-            for pk, obj in self._get_object_list():
-                if pk == self._formdata:
-                    self._set_data(obj)
-                    break
+            # None when it isn't a valid choice
+            self._set_data(self._get_objects([self._formdata])
+                           .get(self._formdata))
         return self._data
 
     def _set_data(self, data):
@@ -80,24 +88,63 @@ class QuerySelectField(SelectFieldBase):
 
     data = property(_get_data, _set_data)
 
+    def _get_query(self):
+        # Form classes are reused across requests, so never iterate (and
+        # cache results in) the queryset the field was created with
+        return self.query_factory.clone()
+
     def _get_object_list(self):
 
-        if not self.query_factory:
+        if self.query_factory is None:
             return []
 
-        self.query_factory.rewind()
         if self._object_list is None:
-            query = self.query_factory
+            query = self._get_query()
+            if self.label_field:
+                query = query.only(query._document._meta['id_field'],
+                                   self.label_field)
             get_pk = self.get_pk
             self._object_list = list((str(get_pk(obj)), obj) for obj in query)
         return self._object_list
 
+    def _get_objects(self, pks):
+        """
+            Return the objects of the query with the primary keys `pks`
+            (strings) by primary key, looking up the unknown ones with one
+            query. Primary keys that aren't valid or in the query are left
+            out.
+        """
+        missing = set(pks) - set(self._objects)
+        if missing and self.query_factory is not None:
+            query = self._get_query()
+            document = query._document
+            pk_field = document._fields[document._meta['id_field']]
+            values = []
+            for pk in missing:
+                try:
+                    values.append(pk_field.to_mongo(pk))
+                except (TypeError, ValueError, mongoengine.ValidationError):
+                    pass
+            if values:
+                for obj in query.filter(pk__in=values):
+                    self._objects[str(self.get_pk(obj))] = obj
+        return dict((pk, self._objects[pk]) for pk in pks
+                    if pk in self._objects)
+
+    def _is_valid_choice(self, obj):
+        pk = str(self.get_pk(obj))
+        if self._object_list is not None:
+            return pk in set(x[0] for x in self._object_list)
+        return pk in self._get_objects([pk])
+
     def iter_choices(self):
         if self.allow_blank:
             yield ('__None', self.blank_text, self.data is None)
 
+        data = self.data
+        selected = None if data is None else str(self.get_pk(data))
         for pk, obj in self._get_object_list():
-            yield (pk, self.get_label(obj), obj == self.data)
+            yield (pk, self.get_label(obj), pk == selected)
 
     def process_formdata(self, valuelist):
         if valuelist:
@@ -109,10 +156,7 @@ class QuerySelectField(SelectFieldBase):
 
     def pre_validate(self, form):
         if not self.allow_blank or self.data is not None:
-            for pk, obj in self._get_object_list():
-                if self.data == obj:
-                    break
-            else:
+            if self.data is None or not self._is_valid_choice(self.data):
                 raise ValidationError(self.gettext('Not a valid choice'))
 
 
@@ -137,16 +181,11 @@ class QuerySelectMultipleField(QuerySelectField):
     def _get_data(self):
         formdata = self._formdata
         if formdata is not None:
-            data = []
-            for pk, obj in self._get_object_list():
-                if not formdata:
-                    break
-                elif pk in formdata:
-                    formdata.remove(pk)
-                    data.append(obj)
-            if formdata:
+            objects = self._get_objects(formdata)
+            if len(objects) < len(formdata):
                 self._invalid_formdata = True
-            self._set_data(data)
+            self._set_data([objects[pk] for pk in formdata
+                            if pk in objects])
         return self._data
 
     def _set_data(self, data):
@@ -156,20 +195,29 @@ class QuerySelectMultipleField(QuerySelectField):
     data = property(_get_data, _set_data)
 
     def iter_choices(self):
+        selected = set(str(self.get_pk(obj)) for obj in self.data)
         for pk, obj in self._get_object_list():
-            yield (pk, self.get_label(obj), obj in self.data)
+            yield (pk, self.get_label(obj), pk in selected)
 
     def process_formdata(self, valuelist):
-        self._formdata = set(valuelist)
+        # Unique submitted primary keys, in the order of the choices
+        seen = set()
+        self._formdata = [pk for pk in valuelist
+                          if not (pk in seen or seen.add(pk))]
 
     def pre_validate(self, form):
+        # Resolves the submitted choices
+        data = self.data
         if self._invalid_formdata:
             raise ValidationError(self.gettext('Not a valid choice'))
-        elif self.data:
-            obj_list = list(x[1] for x in self._get_object_list())
-            for v in self.data:
-                if v not in obj_list:
-                    raise ValidationError(self.gettext('Not a valid choice'))
+        elif data:
+            pks = [str(self.get_pk(obj)) for obj in data]
+            if self._object_list is not None:
+                valid = set(x[0] for x in self._object_list)
+            else:
+                valid = set(self._get_objects(pks))
+            if not valid.issuperset(pks):
+                raise ValidationError(self.gettext('Not a valid choice'))
 
 
 def get_pk_from_identity(obj):
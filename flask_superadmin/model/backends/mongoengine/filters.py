@@ -0,0 +1,162 @@
+import decimal
+
+from flask_superadmin.babel import gettext
+
+from flask_superadmin.model import filters
+
+
+def parse_like_term(term):
+    if term.startswith('^'):
+        return 'istartswith', term[1:]
+    elif term.startswith('='):
+        return 'iexact', term[1:]
+    return 'icontains', term
+
+
+class BaseMongoFilter(filters.BaseFilter):
+    """
+        Base MongoEngine filter.
+    """
+    def __init__(self, field_name, name, options=None, data_type=None,
+                 coerce=None):
+        """
+            Constructor.
+
+            `field_name`
+                Field lookup, e.g. 'address__city'
+            `name`
+                Display name
+            `options`
+                Fixed set of options
+            `data_type`
+                Client data type
+            `coerce`
+                Converts the value from the URL
+        """
+        super(BaseMongoFilter, self).__init__(name, options, data_type,
+                                               coerce)
+
+        self.field_name = field_name
+
+    def lookup(self, lookup_type, value):
+        return {'%s__%s' % (self.field_name, lookup_type): value}
+
+
+# Common filters
+class FilterEqual(BaseMongoFilter):
+    def apply(self, query, value):
+        # Plain equality, `exact` would be a regular expression
+        return query.filter(**{self.field_name: value})
+
+    def operation(self):
+        return gettext('equals')
+
+
+class FilterNotEqual(BaseMongoFilter):
+    def apply(self, query, value):
+        return query.filter(**self.lookup('ne', value))
+
+    def operation(self):
+        return gettext('not equal')
+
+
+class FilterLike(BaseMongoFilter):
+    def apply(self, query, value):
+        return query.filter(**self.lookup(*parse_like_term(value)))
+
+    def operation(self):
+        return gettext('contains')
+
+
+class FilterNotLike(BaseMongoFilter):
+    def apply(self, query, value):
+        lookup_type, value = parse_like_term(value)
+        return query.filter(**self.lookup('not__' + lookup_type, value))
+
+    def operation(self):
+        return gettext('not contains')
+
+
+class FilterGreater(BaseMongoFilter):
+    def apply(self, query, value):
+        return query.filter(**self.lookup('gt', value))
+
+    def operation(self):
+        return gettext('greater than')
+
+
+class FilterSmaller(BaseMongoFilter):
+    def apply(self, query, value):
+        return query.filter(**self.lookup('lt', value))
+
+    def operation(self):
+        return gettext('smaller than')
+
+
+# Customized type filters
+class BooleanEqualFilter(FilterEqual, filters.BaseBooleanFilter):
+    def __init__(self, field_name, name):
+        filters.BaseBooleanFilter.__init__(self, name)
+        self.field_name = field_name
+
+
+class BooleanNotEqualFilter(FilterNotEqual, filters.BaseBooleanFilter):
+    def __init__(self, field_name, name):
+        filters.BaseBooleanFilter.__init__(self, name)
+        self.field_name = field_name
+
+
+class FilterDateRange(BaseMongoFilter, filters.BaseDateRangeFilter):
+    """
+        Filter of the date hierarchy, see
+        `flask_superadmin.model.filters.BaseDateRangeFilter`.
+    """
+    def __init__(self, field_name, name, datetimes=False):
+        filters.BaseDateRangeFilter.__init__(self, name, datetimes)
+        self.field_name = field_name
+
+    def apply(self, query, value):
+        start, end = value
+        return query.filter(**dict(self.lookup('gte', start),
+                                   **self.lookup('lt', end)))
+
+
+# Base MongoEngine filter field converter
+class FilterConverter(filters.BaseFilterConverter):
+    strings = (FilterEqual, FilterNotEqual, FilterLike, FilterNotLike)
+    numeric = (FilterEqual, FilterNotEqual, FilterGreater, FilterSmaller)
+
+    def convert(self, field, field_name, name):
+        # Subclasses of the known fields too
+        for cls in type(field).__mro__:
+            if cls.__name__ in self.converters:
+                return self.converters[cls.__name__](field_name, name)
+
+        return None
+
+    @filters.convert('StringField')
+    def conv_string(self, field_name, name):
+        return [f(field_name, name) for f in self.strings]
+
+    @filters.convert('BooleanField')
+    def conv_bool(self, field_name, name):
+        return [BooleanEqualFilter(field_name, name),
+                BooleanNotEqualFilter(field_name, name)]
+
+    @filters.convert('IntField', 'LongField', 'SequenceField')
+    def conv_int(self, field_name, name):
+        return [f(field_name, name, coerce=int) for f in self.numeric]
+
+    @filters.convert('DecimalField')
+    def conv_decimal(self, field_name, name):
+        return [f(field_name, name, coerce=decimal.Decimal)
+                for f in self.numeric]
+
+    @filters.convert('FloatField')
+    def conv_float(self, field_name, name):
+        return [f(field_name, name, coerce=float) for f in self.numeric]
+
+    @filters.convert('DateTimeField', 'ComplexDateTimeField')
+    def conv_datetime(self, field_name, name):
+        return [f(field_name, name, data_type='datetimepicker',
+                  coerce=filters.parse_datetime) for f in self.numeric]
@@ -7,8 +7,10 @@ from werkzeug import secure_filename
 from wtforms import Form, validators, fields as f
 
 from fields import ModelSelectField, ModelSelectMultipleField, ListField
+from mongoengine import ValidationError
 from mongoengine.fields import ReferenceField, IntField, FloatField
 
+from flask_superadmin import form
 from flask_superadmin.model import AdminModelConverter as AdminModelConverter_
 
 __all__ = ('model_fields', 'model_form')
@@ -165,7 +167,8 @@ class ModelConverter(object):
         if field.field.choices:
             return self.convert(model, field.field, None, multiple=True)
         if isinstance(field.field, ReferenceField):
-            return ModelSelectMultipleField(model=field.field.document_type, **kwargs)
+            return self.reference_field(field.name, field.field.document_type,
+                                        kwargs, multiple=True)
         unbound_field = self.convert(model, field.field, {})
         return ListField(unbound_field, min_entries=0, **kwargs)
 
@@ -196,7 +199,12 @@ class ModelConverter(object):
     @converts('ReferenceField')
     def conv_Reference(self, model, field, kwargs):
         kwargs['allow_blank'] = not field.required
-        return ModelSelectField(model=field.document_type, **kwargs)
+        return self.reference_field(field.name, field.document_type, kwargs)
+
+    def reference_field(self, name, document_type, kwargs, multiple=False):
+        if multiple:
+            return ModelSelectMultipleField(model=document_type, **kwargs)
+        return ModelSelectField(model=document_type, **kwargs)
 
     @converts('GenericReferenceField')
     def conv_GenericReference(self, model, field, kwargs):
@@ -325,5 +333,31 @@ def model_form(model, base_class=Form, fields=None, readonly_fields=None,
 
 
 class AdminModelConverter(AdminModelConverter_, ModelConverter):
-    pass
+    def __init__(self, view=None, converters=None):
+        super(AdminModelConverter, self).__init__(converters)
+        self.view = view
+
+    def reference_field(self, name, document_type, kwargs, multiple=False):
+        if self.view is None or name not in self.view.autocomplete_fields:
+            return super(AdminModelConverter, self).reference_field(
+                name, document_type, kwargs, multiple)
+
+        id_field = document_type._fields[document_type._meta['id_field']]
+
+        def get_objects(pks):
+            try:
+                pks = [id_field.to_mongo(pk) for pk in pks]
+            except ValidationError:
+                return []
+            return document_type.objects(pk__in=pks)
+
+        kwargs.update({
+            'get_objects': get_objects,
+            'get_pk': lambda obj: obj.pk,
+            'url': lambda: self.view.get_autocomplete_url(document_type)
+        })
+
+        if multiple:
+            return form.AutocompleteSelectMultipleField(**kwargs)
+        return form.AutocompleteSelectField(**kwargs)
 
@@ -0,0 +1,37 @@
+"""
+Full-text search engines for MongoEngine documents.
+"""
+from flask_superadmin.model.search import (BaseSearchEngine,
+                                           parse_search_query, split_words)
+
+
+class TextIndexSearch(BaseSearchEngine):
+    """
+        MongoDB ``$text`` search. Needs a text index over the search
+        fields, e.g. ``meta = {'indexes': [{'fields': ['$title', '$body']}]}``.
+
+        Words are OR'ed, like the default search does. Text indexes have no
+        prefix matching, ``^word`` is matched as a plain word (which the
+        index stems). ``=word`` is matched as an exact phrase, which every
+        result then has to contain.
+
+        `language`
+            Language used to stem the words, the index's one by default
+    """
+    def __init__(self, language=None):
+        self.language = language
+
+    def apply(self, view, qs, search_query):
+        words = []
+        for term in parse_search_query(search_query):
+            if term.op == '=':
+                words.append('"%s"' % ' '.join(split_words(term.word)))
+            else:
+                words.extend(split_words(term.word))
+        if not words:
+            return qs.none() if search_query.split() else qs
+
+        text = {'$search': ' '.join(words)}
+        if self.language:
+            text['$language'] = self.language
+        return qs.filter(__raw__={'$text': text})
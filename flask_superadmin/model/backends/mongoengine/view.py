@@ -1,11 +1,24 @@
-from flask_superadmin.model.base import BaseModelAdmin
+from flask_superadmin import instrumentation
+from flask_superadmin.model import pagination
+from flask_superadmin.model.base import BaseModelAdmin, SortColumn, chunked
 
 from orm import model_form, AdminModelConverter
+from filters import FilterConverter, FilterDateRange
+from search import TextIndexSearch
 
 import operator
 import mongoengine
+from mongoengine import signals
+from mongoengine.queryset import QuerySet
 
 from bson.objectid import ObjectId
+from bson.son import SON
+
+try:
+    # PyMongo >= 3.1
+    from pymongo import monitoring
+except ImportError:
+    monitoring = None
 
 SORTABLE_FIELDS = (
     mongoengine.BooleanField,
@@ -18,7 +31,25 @@ SORTABLE_FIELDS = (
 )
 
 
+if monitoring is not None:
+    class CommandListener(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            instrumentation.record_query(event.duration_micros / 1e6)
+
+        def failed(self, event):
+            instrumentation.record_query(event.duration_micros / 1e6)
+
+
 class ModelAdmin(BaseModelAdmin):
+    search_engines = dict(BaseModelAdmin.search_engines,
+                          text=TextIndexSearch)
+
+    # Turns the fields of `list_filters` into filters
+    filter_converter = FilterConverter()
+
     @staticmethod
     def model_detect(model):
         return issubclass(model, mongoengine.Document)
@@ -26,15 +57,31 @@ class ModelAdmin(BaseModelAdmin):
     def allow_pk(self):
         return False
 
-    def is_sortable(self, column):
-        field = getattr(self.model, column, None)
-        return isinstance(field, SORTABLE_FIELDS)
+    def compile_sort(self, name):
+        # Only embedded documents can be sorted by, references aren't joined
+        document = self.model
+        path = name.split('.')
+        db_path = []
+        for i, part in enumerate(path):
+            field = document._fields.get(part)
+            if field is None:
+                return None
+            db_path.append(field.db_field)
+            if i < len(path) - 1:
+                if not isinstance(field, mongoengine.EmbeddedDocumentField):
+                    return None
+                document = field.document_type
+        if not isinstance(field, SORTABLE_FIELDS):
+            return None
+        indexed = (document is self.model and self._is_indexed(field)) or \
+            self._is_index_prefix('.'.join(db_path))
+        return SortColumn('__'.join(path), (), indexed)
 
     def get_model_form(self):
         return model_form
 
     def get_converter(self):
-        return AdminModelConverter
+        return AdminModelConverter(view=self)
 
     def get_queryset(self):
         return self.model.objects
@@ -51,47 +98,414 @@ class ModelAdmin(BaseModelAdmin):
     def save_model(self, instance, form, adding=False):
         form.populate_obj(instance)
         instance.save()
+        self.invalidate_list_cache()
         return instance
 
     def delete_models(self, *pks):
-        for obj in self.get_objects(*pks):
-            obj.delete()
+        for chunk in chunked(pks, self.delete_chunk_size):
+            if self.bulk_delete:
+                # Still applies the document's reverse delete rules and
+                # falls back to per-document deletes for signal receivers
+                self.get_objects(*chunk).delete()
+            else:
+                for obj in self.get_objects(*chunk):
+                    obj.delete()
+        self.invalidate_list_cache()
         return True
 
-    def construct_search(self, field_name):
+    def delete_matching_models(self, search_query=None, filters=None):
+        if not self.bulk_delete:
+            return super(ModelAdmin, self).delete_matching_models(
+                search_query, filters)
+        qs = self.get_action_queryset(None, search_query, filters)
+        count = qs.count()
+        # Still applies the document's reverse delete rules
+        qs.delete()
+        self.invalidate_list_cache()
+        return count
+
+    def can_bulk_update(self, values):
+        if not self.bulk_update:
+            return False
+        # Updates don't call save() nor send the save signals
+        if self.model.save.__func__ is not mongoengine.Document.save.__func__:
+            return False
+        # Without blinker nothing can listen, and asking raises
+        if signals.signals_available:
+            for signal in (signals.pre_save, signals.post_save):
+                if signal.has_receivers_for(self.model):
+                    return False
+        return all(name in self.model._fields for name in values)
+
+    def update_models(self, values, *pks):
+        bulk = self.can_bulk_update(values)
+        count = 0
+        for chunk in chunked(pks, self.update_chunk_size):
+            if bulk:
+                count += self.get_objects(*chunk).update(
+                    **dict(('set__%s' % name, value)
+                           for name, value in values.iteritems()))
+            else:
+                for obj in self.get_objects(*chunk):
+                    for name, value in values.iteritems():
+                        setattr(obj, name, value)
+                    obj.save()
+                    count += 1
+        self.invalidate_list_cache()
+        return count
+
+    def update_matching_models(self, values, search_query=None,
+                               filters=None):
+        if not self.can_bulk_update(values):
+            return super(ModelAdmin, self).update_matching_models(
+                values, search_query, filters)
+        qs = self.get_action_queryset(None, search_query, filters)
+        count = qs.update(**dict(('set__%s' % name, value)
+                                 for name, value in values.iteritems()))
+        self.invalidate_list_cache()
+        return count
+
+    def scaffold_filters(self, name):
+        try:
+            field = self.model._lookup_field(name.split('.'))[-1]
+        except mongoengine.LookUpError:
+            return None
+        return self.filter_converter.convert(field, name.replace('.', '__'),
+                                             self.field_name(name))
+
+    def get_facet_counts(self, qs, name):
+        field = self.model._lookup_field(name.split('.'))[-1]
+        pipeline = [
+            {'$match': qs._query},
+            {'$group': {'_id': '$' + self.model._translate_field_name(name),
+                        'count': {'$sum': 1}}},
+            {'$sort': SON([('count', -1), ('_id', 1)])},
+            {'$limit': self.list_facet_limit},
+        ]
+        return [(None if row['_id'] is None else field.to_python(row['_id']),
+                 row['count']) for row in self._aggregate(qs, pipeline)]
+
+    def _aggregate(self, qs, pipeline):
+        result = qs._collection.aggregate(pipeline)
+        # PyMongo < 3 returns the whole response
+        if isinstance(result, dict):
+            result = result['result']
+        return result
+
+    def scaffold_date_filter(self, name):
+        try:
+            field = self.model._lookup_field(name.split('.'))[-1]
+        except mongoengine.LookUpError:
+            return None
+        # Not ComplexDateTimeField, stored as strings the date operators
+        # of get_date_buckets can't read
+        if not isinstance(field, mongoengine.DateTimeField):
+            return None
+        return FilterDateRange(name.replace('.', '__'), self.field_name(name),
+                               datetimes=True)
+
+    def get_date_buckets(self, qs, name, level):
+        date_operator = {'year': '$year', 'month': '$month',
+                         'day': '$dayOfMonth'}[level]
+        db_field = self.model._translate_field_name(name)
+        pipeline = [
+            {'$match': qs._query},
+            # Date operators fail on missing values
+            {'$match': {db_field: {'$type': 9}}},
+            {'$group': {'_id': {date_operator: '$' + db_field},
+                        'count': {'$sum': 1}}},
+            {'$sort': {'_id': 1}},
+        ]
+        return [(row['_id'], row['count'])
+                for row in self._aggregate(qs, pipeline)]
+
+    def get_date_bounds(self, qs, name):
+        path = name.split('.')
+        qs = qs.filter(**{'__'.join(path) + '__ne': None}).only(name)
+        first = qs.order_by(name).first()
+        if first is None:
+            return None, None
+        last = qs.order_by('-' + name).first()
+        return reduce(getattr, path, first), reduce(getattr, path, last)
+
+    def get_unique_checks(self):
+        checks = []
+        for name, field in self.model._fields.iteritems():
+            if not (field.unique or field.primary_key):
+                continue
+            unique_with = field.unique_with or ()
+            if isinstance(unique_with, basestring):
+                unique_with = (unique_with,)
+            checks.append((name,) + tuple(unique_with))
+        return checks
+
+    def find_unique_conflicts(self, checks, instance=None):
+        lookups = [mongoengine.Q(**dict((name.replace('.', '__'), value)
+                                        for name, value in zip(*check)))
+                   for check in checks]
+        # Unique indexes cover every document, not only those of
+        # get_queryset or of a custom `objects` manager
+        queryset_class = self.model._meta.get('queryset_class', QuerySet)
+        qs = queryset_class(self.model, self.model._get_collection())
+        qs = qs.filter(reduce(operator.or_, lookups))
+        if instance is not None and instance.pk is not None:
+            qs = qs.filter(pk__ne=instance.pk)
+
+        names = set(name for check in checks for name in check[0])
+        # Every check matches at most one other document
+        rows = list(qs.only(*names).limit(len(checks)).as_pymongo())
+
+        conflicts = []
+        for names, values in checks:
+            # Compare in their stored form, e.g. references as ObjectIds
+            stored = []
+            for name, value in zip(names, values):
+                field = self.model._lookup_field(name.split('.'))[-1]
+                stored.append((self.model._translate_field_name(name),
+                               field.to_mongo(value)))
+            if any(all(self._get_stored(row, key) == value
+                       for key, value in stored) for row in rows):
+                conflicts.append(names)
+        return conflicts
+
+    def _get_stored(self, row, key):
+        for part in key.split('.'):
+            row = row.get(part) if isinstance(row, dict) else None
+        return row
+
+    def get_matching_pks(self, search_query=None, filters=None):
+        qs = self.get_queryset()
+        if search_query and self.search_fields:
+            qs = self.apply_search(qs, search_query)
+        if filters:
+            qs = self.apply_filters(qs, filters)
+        return qs.scalar('pk')
+
+    _command_listener = None
+
+    @classmethod
+    def prepare_instrumentation(cls):
+        # Listeners only see the clients created after they're registered
+        if monitoring is not None and ModelAdmin._command_listener is None:
+            ModelAdmin._command_listener = CommandListener()
+            monitoring.register(ModelAdmin._command_listener)
+
+    def get_related_model(self, model, name):
+        field = getattr(model, '_fields', {}).get(name)
+        if isinstance(field, (mongoengine.ReferenceField,
+                              mongoengine.EmbeddedDocumentField)):
+            return field.document_type
+
+    def get_referenced_models(self):
+        models = []
+        for field in self.model._fields.values():
+            if isinstance(field, mongoengine.ListField):
+                field = field.field
+            if isinstance(field, mongoengine.ReferenceField):
+                models.append(field.document_type)
+        return models
+
+    def apply_select_related(self, qs, paths):
+        # Dereferences all references of the page with one query per
+        # collection. This runs the query, so it has to come last.
+        max_depth = max(len(path.split('.')) for path in paths)
+        return qs.select_related(max_depth=max_depth)
+
+    def get_projection_fields(self, name):
+        if name in self.model._fields:
+            return [name]
+        return None
+
+    def apply_projection(self, qs, fields):
+        return qs.only(*fields)
+
+    def estimate_count(self):
+        # Subclasses share the collection of their parent document, so the
+        # collection size is not an estimate of their own number of documents
+        if '.' in self.model._class_name:
+            return None
+
+        collection = self.model._get_collection()
+        # Look the method up on the class, collections return sub-collections
+        # for unknown attributes
+        if hasattr(type(collection), 'estimated_document_count'):
+            return collection.estimated_document_count()
+        # Without a query, count() is answered from collection metadata
+        return collection.count()
+
+    def construct_search(self, field_name, match='contains'):
         if field_name.startswith('^'):
             return "%s__istartswith" % field_name[1:]
         elif field_name.startswith('='):
             return "%s__iexact" % field_name[1:]
+        elif match == 'prefix':
+            # Only case sensitive anchored regexes can use the index
+            return "%s__startswith" % field_name
+        elif match == 'exact':
+            return field_name
         else:
             return "%s__icontains" % field_name
 
-    def get_list(self, page=0, sort=None, sort_desc=None, execute=False, search_query=None):
+    def _is_index_prefix(self, db_field):
+        # Whether it's the leading field of one of the indexes
+        for spec in self.model._meta.get('index_specs') or []:
+            name, direction = spec['fields'][0]
+            if name == db_field and direction in (1, -1):
+                return True
+        return False
+
+    def _is_indexed(self, field):
+        return (field.primary_key or field.unique or
+                field.name == self.model._meta['id_field'] or
+                self._is_index_prefix(field.db_field))
+
+    def get_index_match(self, field_name):
+        field = self.model._fields.get(field_name)
+        if field is None or not self._is_indexed(field):
+            return None
+
+        if isinstance(field, mongoengine.StringField):
+            return 'prefix'
+        if isinstance(field, (mongoengine.IntField, mongoengine.FloatField,
+                              mongoengine.DecimalField)):
+            return 'exact'
+        return None
+
+    def get_keyset(self, instance, sort):
+        values = super(ModelAdmin, self).get_keyset(instance, sort)
+        # Referenced documents are sorted (and seeked) by their id
+        if sort and isinstance(values[0], mongoengine.Document):
+            values[0] = values[0].pk
+        return values
+
+    def apply_keyset(self, qs, sort, sort_desc, cursor):
+        direction, values = cursor or (pagination.NEXT, None)
+        ascending = pagination.is_ascending(sort_desc, direction)
+
+        names = [self.model._meta['id_field']]
+        if sort:
+            names.insert(0, self.get_sort_column(sort).expression)
+
+        # Seek past the cursor row: (f1, f2) > (v1, v2)
+        if values:
+            lookup = 'gt' if ascending else 'lt'
+            or_queries = []
+            for i, name in enumerate(names):
+                query = dict(zip(names[:i], values[:i]))
+                query['%s__%s' % (name, lookup)] = values[i]
+                or_queries.append(mongoengine.queryset.Q(**query))
+            qs = qs.filter(reduce(operator.or_, or_queries))
+
+        qs = qs.order_by(*['%s%s' % ('' if ascending else '-', name)
+                           for name in names])
+
+        return qs.limit(self.list_fetch_size)
+
+    def apply_default_search(self, qs, search_query):
+        plan = self.get_search_plan()
+        orm_lookups = [(self.construct_search(str(search_field), match),
+                        search_field, match)
+                       for search_field, match in plan]
+        for bit in search_query.split():
+            or_queries = []
+            for orm_lookup, search_field, match in orm_lookups:
+                value = bit
+                if match == 'exact':
+                    # Skip the field if the word isn't one of its values
+                    field = self.model._fields[search_field]
+                    try:
+                        value = field.to_python(bit)
+                        field.validate(value)
+                    except (mongoengine.ValidationError, ValueError,
+                            TypeError):
+                        continue
+                or_queries.append(mongoengine.queryset.Q(**{orm_lookup: value}))
+            if not or_queries:
+                return qs.none()
+            qs = qs.filter(reduce(operator.or_, or_queries))
+        if self.search_explain:
+            self.explain_search(search_query, plan, qs._query)
+        return qs
+
+    def apply_pk_order(self, qs):
+        # order_by() replaces the default ordering of the document
+        ordering = list(self.model._meta.get('ordering') or [])
+        return qs.order_by(*(ordering + [self.model._meta['id_field']]))
+
+    def get_autocomplete_list(self, search_query=None, offset=0, limit=None):
         qs = self.get_queryset()
+        if search_query and search_query.split():
+            if not self.search_fields:
+                return []
+            qs = self.apply_search(qs, search_query)
+        qs = self.apply_pk_order(qs)
+        return qs.skip(offset).limit(limit or self.autocomplete_limit)
 
-        # Filter by search query
+    def get_export_list(self, sort=None, sort_desc=None, search_query=None,
+                        filters=None):
+        qs = self.get_queryset()
         if search_query and self.search_fields:
-            orm_lookups = [self.construct_search(str(search_field))
-                           for search_field in self.search_fields]
-            for bit in search_query.split():
-                or_queries = [mongoengine.queryset.Q(**{orm_lookup: bit})
-                              for orm_lookup in orm_lookups]
-                qs = qs.filter(reduce(operator.or_, or_queries))
-
-        #Calculate number of documents
-        count = qs.count()
+            qs = self.apply_search(qs, search_query)
+        if filters:
+            qs = self.apply_filters(qs, filters)
 
-        #Order queryset
+        names = ['pk']
         if sort:
-            qs = qs.order_by('%s%s' % ('-' if sort_desc else '', sort))
+            names.insert(0, self.get_sort_column(sort).expression)
+        qs = qs.order_by(*['%s%s' % ('-' if sort_desc else '', name)
+                           for name in names])
+
+        fields = self.get_list_projection()
+        if fields is not None:
+            qs = self.apply_projection(qs, fields)
+
+        # Don't keep the documents around once they've been exported
+        qs = qs.no_cache()
+        if hasattr(qs, 'batch_size'):
+            # MongoEngine >= 0.9
+            qs = qs.batch_size(self.export_batch_size)
+        return qs
+
+    def get_list(self, page=0, sort=None, sort_desc=None, execute=False,
+                 search_query=None, cursor=None, filters=None):
+        qs = self.get_queryset()
+
+        # Filter by search query
+        if search_query and self.search_fields:
+            qs = self.apply_search(qs, search_query)
+
+        if filters:
+            qs = self.apply_filters(qs, filters)
+
+        #Calculate number of documents, on a copy that only the count's
+        # thread uses
+        count = self.start_count(qs.clone(), search_query, filters)
+
+        # Only load the fields shown in the list
+        fields = self.get_list_projection(sort)
+        if fields is not None:
+            qs = self.apply_projection(qs, fields)
+
+        if self.keyset_pagination:
+            qs = self.apply_keyset(qs, sort, sort_desc, cursor)
+        else:
+            #Order queryset
+            if sort:
+                name = self.get_sort_column(sort).expression
+                qs = qs.order_by('%s%s' % ('-' if sort_desc else '', name))
+
+            # Pagination
+            if page is not None:
+                qs = qs.skip(page * self.list_per_page)
+            qs = qs.limit(self.list_fetch_size)
 
-        # Pagination
-        if page is not None:
-            qs = qs.skip(page * self.list_per_page)
-        qs = qs.limit(self.list_per_page)
+        # Load the references shown in the list along with the documents
+        select_related = self.get_select_related()
+        if select_related:
+            qs = self.apply_select_related(qs, select_related)
 
-        if execute:
-            qs = qs.all()
+        if execute or count.concurrent:
+            qs = list(qs)
 
-        return count, qs
+        return count.get(), qs
 
@@ -1,14 +1,18 @@
+import decimal
+
 from flask_superadmin.babel import gettext
 
 from flask_superadmin.model import filters
-from flask_superadmin.contrib.sqlamodel import tools
+
+import tools
 
 
 class BaseSQLAFilter(filters.BaseFilter):
     """
         Base SQLAlchemy filter.
     """
-    def __init__(self, column, name, options=None, data_type=None):
+    def __init__(self, column, name, options=None, data_type=None,
+                 coerce=None):
         """
             Constructor.
 
@@ -20,8 +24,10 @@ class BaseSQLAFilter(filters.BaseFilter):
                 Fixed set of options
             `data_type`
                 Client data type
+            `coerce`
+                Converts the value from the URL
         """
-        super(BaseSQLAFilter, self).__init__(name, options, data_type)
+        super(BaseSQLAFilter, self).__init__(name, options, data_type, coerce)
 
         self.column = column
 
@@ -79,11 +85,29 @@ class FilterSmaller(BaseSQLAFilter):
 
 # Customized type filters
 class BooleanEqualFilter(FilterEqual, filters.BaseBooleanFilter):
-    pass
+    def __init__(self, column, name):
+        filters.BaseBooleanFilter.__init__(self, name)
+        self.column = column
 
 
 class BooleanNotEqualFilter(FilterNotEqual, filters.BaseBooleanFilter):
-    pass
+    def __init__(self, column, name):
+        filters.BaseBooleanFilter.__init__(self, name)
+        self.column = column
+
+
+class FilterDateRange(BaseSQLAFilter, filters.BaseDateRangeFilter):
+    """
+        Filter of the date hierarchy, see
+        `flask_superadmin.model.filters.BaseDateRangeFilter`.
+    """
+    def __init__(self, column, name, datetimes=False):
+        filters.BaseDateRangeFilter.__init__(self, name, datetimes)
+        self.column = column
+
+    def apply(self, query, value):
+        start, end = value
+        return query.filter(self.column >= start, self.column < end)
 
 
 # Base SQLA filter field converter
@@ -95,6 +119,11 @@ class FilterConverter(filters.BaseFilterConverter):
         if type_name in self.converters:
             return self.converters[type_name](column, name)
 
+        # Subclasses of the known types, e.g. Enum of String
+        for cls in type(column.type).__mro__[1:]:
+            if cls.__name__ in self.converters:
+                return self.converters[cls.__name__](column, name)
+
         return None
 
     @filters.convert('String', 'Unicode', 'Text', 'UnicodeText')
@@ -106,14 +135,24 @@ class FilterConverter(filters.BaseFilterConverter):
         return [BooleanEqualFilter(column, name),
                 BooleanNotEqualFilter(column, name)]
 
-    @filters.convert('Integer', 'SmallInteger', 'Numeric', 'Float')
+    @filters.convert('Integer', 'SmallInteger', 'BigInteger')
     def conv_int(self, column, name):
-        return [f(column, name) for f in self.numeric]
+        return [f(column, name, coerce=int) for f in self.numeric]
+
+    @filters.convert('Numeric')
+    def conv_numeric(self, column, name):
+        return [f(column, name, coerce=decimal.Decimal) for f in self.numeric]
+
+    @filters.convert('Float')
+    def conv_float(self, column, name):
+        return [f(column, name, coerce=float) for f in self.numeric]
 
     @filters.convert('Date')
     def conv_date(self, column, name):
-        return [f(column, name, data_type='datepicker') for f in self.numeric]
+        return [f(column, name, data_type='datepicker',
+                  coerce=filters.parse_date) for f in self.numeric]
 
     @filters.convert('DateTime')
     def conv_datetime(self, column, name):
-        return [f(column, name, data_type='datetimepicker') for f in self.numeric]
+        return [f(column, name, data_type='datetimepicker',
+                  coerce=filters.parse_datetime) for f in self.numeric]
@@ -2,7 +2,10 @@
 Tools for generating forms based on SQLAlchemy Model schemas.
 """
 
+import operator
+
 from sqlalchemy import Column
+from sqlalchemy.orm import class_mapper
 from sqlalchemy.orm.exc import NoResultFound
 
 from wtforms import Form, ValidationError, fields, validators
@@ -15,6 +18,9 @@ from flask.ext.superadmin import form
 class Unique(object):
     """Checks field value unicity against specified table field.
 
+    The admin forms don't use it: `ModelAdmin.validate_unique` checks all
+    unique columns of a model in one query.
+
     :param get_session:
         A function that return a SQAlchemy Session.
     :param model:
@@ -67,6 +73,32 @@ class AdminModelConverter(ModelConverter):
         if self.view.field_overrides:
             return self.view.field_overrides.get(name)
 
+    def _get_autocomplete_field(self, remote_model, multiple, kwargs):
+        session = self.view.session
+        mapper = class_mapper(remote_model)
+        pk = mapper.primary_key[0]
+
+        try:
+            coerce = pk.type.python_type
+        except NotImplementedError:
+            coerce = None
+
+        def get_objects(pks):
+            if coerce is not None:
+                pks = [coerce(pk_value) for pk_value in pks]
+            return session.query(remote_model).filter(pk.in_(pks))
+
+        del kwargs['query_factory']
+        kwargs.update({
+            'get_objects': get_objects,
+            'get_pk': operator.attrgetter(mapper.get_property_by_column(pk).key),
+            'url': lambda: self.view.get_autocomplete_url(remote_model)
+        })
+
+        if multiple:
+            return form.AutocompleteSelectMultipleField(**kwargs)
+        return form.AutocompleteSelectField(**kwargs)
+
     def convert(self, model, mapper, prop, field_args, *args):
         kwargs = {
             'validators': [],
@@ -95,6 +127,11 @@ class AdminModelConverter(ModelConverter):
             if override:
                 return override(**kwargs)
 
+            if prop.key in self.view.autocomplete_fields:
+                multiple = prop.direction.name != 'MANYTOONE'
+                return self._get_autocomplete_field(remote_model, multiple,
+                                                    kwargs)
+
             if prop.direction.name == 'MANYTOONE':
                 return QuerySelectField(widget=form.ChosenSelectWidget(),
                                         **kwargs)
@@ -124,8 +161,6 @@ class AdminModelConverter(ModelConverter):
                 if column.foreign_keys:
                     return None
 
-                unique = False
-
                 if column.primary_key:
                     # By default, don't show primary keys either
                     if self.view.fields is None:
@@ -135,16 +170,8 @@ class AdminModelConverter(ModelConverter):
                     if prop.key not in self.view.fields:
                         return None
 
-                    kwargs['validators'].append(Unique(self.view.session,
-                                                       model,
-                                                       column))
-                    unique = True
-
-                # If field is unique, validate it
-                if column.unique and not unique:
-                    kwargs['validators'].append(Unique(self.view.session,
-                                                       model,
-                                                       column))
+                # Unique columns are checked together by the view, see
+                # `ModelAdmin.validate_unique`
 
                 if column.nullable:
                     kwargs['validators'].append(validators.Optional())
@@ -0,0 +1,130 @@
+"""
+Full-text search engines for SQLAlchemy models.
+"""
+import re
+
+from sqlalchemy import func
+from sqlalchemy.sql.expression import column, false, literal_column, or_, \
+    select, table
+
+from flask_superadmin.model.search import (BaseSearchEngine,
+                                           parse_search_query, split_words)
+
+
+_identifier_re = re.compile(r'^\w+$')
+
+
+def _check_identifier(name):
+    # Names end up in the SQL as they are
+    if not _identifier_re.match(name):
+        raise ValueError('Invalid identifier %r' % name)
+    return name
+
+
+def equality_clauses(view, terms):
+    """ ``=word`` terms match the search fields equal to the word, which
+    a plain index on the column can answer. """
+    columns = [getattr(view.model, name) for name in view.search_fields]
+    return [c == term.word for term in terms if term.op == '='
+            for c in columns]
+
+
+def no_match(qs, search_query):
+    """ `qs` for a search without usable words: unchanged when it's blank,
+    empty otherwise. """
+    if search_query.split():
+        return qs.filter(false())
+    return qs
+
+
+class PostgresSearch(BaseSearchEngine):
+    """
+        PostgreSQL full-text search. Words are OR'ed, like the default
+        search does.
+
+        `config`
+            Text search configuration, e.g. ``'english'`` to match word stems
+        `vector`
+            Name of a ``tsvector`` column of the model covering the search
+            fields, kept up to date by the application or a trigger and
+            GIN-indexed. Without it, the vector is computed as
+            ``to_tsvector(config, coalesce(field, '') || ' ' || ...)``, which
+            needs an expression index on that same expression to be fast.
+    """
+    def __init__(self, config='simple', vector=None):
+        self.config = config
+        self.vector = vector
+
+    def get_vector(self, view):
+        if self.vector:
+            return getattr(view.model, self.vector)
+
+        document = None
+        for name in view.search_fields:
+            value = func.coalesce(getattr(view.model, name), '')
+            if document is None:
+                document = value
+            else:
+                document = document.op('||')(' ').op('||')(value)
+        return func.to_tsvector(self.config, document)
+
+    def apply(self, view, qs, search_query):
+        terms = parse_search_query(search_query)
+        clauses = equality_clauses(view, terms)
+
+        lexemes = []
+        for term in terms:
+            if term.op == '=':
+                continue
+            suffix = ':*' if term.op == '^' else ''
+            lexemes.extend(word + suffix for word in split_words(term.word))
+        if lexemes:
+            query = func.to_tsquery(self.config, ' | '.join(lexemes))
+            clauses.append(self.get_vector(view).op('@@')(query))
+
+        if not clauses:
+            return no_match(qs, search_query)
+        return qs.filter(or_(*clauses))
+
+
+class SQLiteFTSSearch(BaseSearchEngine):
+    """
+        SQLite FTS5 search. Needs an FTS5 table over the search fields whose
+        rowid is the primary key of the model, for instance an external
+        content table::
+
+            CREATE VIRTUAL TABLE book_fts
+                USING fts5(title, content='book', content_rowid='id');
+
+        Words are OR'ed, like the default search does.
+
+        `table`
+            Name of the FTS5 table, ``<model table>_fts`` by default
+    """
+    def __init__(self, table=None):
+        self.table = table
+
+    def get_table(self, view):
+        name = self.table or '%s_fts' % view.model.__table__.name
+        return table(_check_identifier(name), column('rowid'))
+
+    def apply(self, view, qs, search_query):
+        terms = parse_search_query(search_query)
+        clauses = equality_clauses(view, terms)
+
+        phrases = []
+        for term in terms:
+            if term.op == '=':
+                continue
+            suffix = '*' if term.op == '^' else ''
+            phrases.extend('"%s"%s' % (word, suffix)
+                           for word in split_words(term.word))
+        if phrases:
+            fts = self.get_table(view)
+            matches = select([fts.c.rowid]).where(
+                literal_column(fts.name).op('MATCH')(' OR '.join(phrases)))
+            clauses.append(view.get_pk(view.model).in_(matches))
+
+        if not clauses:
+            return no_match(qs, search_query)
+        return qs.filter(or_(*clauses))
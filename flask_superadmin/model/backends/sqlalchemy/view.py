@@ -1,14 +1,49 @@
-from sqlalchemy.sql.expression import desc, literal_column, or_
+import decimal
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.sql.expression import (and_, desc, false, literal_column,
+                                       not_, or_, select)
 
 from orm import model_form, AdminModelConverter
+from filters import FilterConverter, FilterDateRange
+from search import PostgresSearch, SQLiteFTSSearch
+
+from flask_superadmin import instrumentation
+from flask_superadmin.model import pagination
+from flask_superadmin.model.base import BaseModelAdmin, SortColumn, chunked
+from sqlalchemy import event, extract, func, orm, pool, schema, text, types
+from sqlalchemy.orm import class_mapper, interfaces
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('superadmin_query_start', []).append(time.time())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    start = conn.info['superadmin_query_start'].pop()
+    instrumentation.record_query(time.time() - start)
 
-from flask_superadmin.model.base import BaseModelAdmin
-from sqlalchemy import schema
+
+def _has_listeners(mapper, *names):
+    # Only the model's own listeners: the ones of every mapper, like
+    # Flask-SQLAlchemy's modification tracking, would rule out any
+    # statement bypassing the session
+    return any(getattr(mapper.dispatch, name).listeners for name in names)
 
 
 class ModelAdmin(BaseModelAdmin):
     hide_backrefs = False
 
+    search_engines = dict(BaseModelAdmin.search_engines,
+                          postgres=PostgresSearch,
+                          sqlite_fts=SQLiteFTSSearch)
+
+    # Turns the columns of `list_filters` into filters
+    filter_converter = FilterConverter()
+
     def __init__(self, model, session=None,
                  *args, **kwargs):
         super(ModelAdmin, self).__init__(model, *args, **kwargs)
@@ -46,6 +81,10 @@ class ModelAdmin(BaseModelAdmin):
     def get_converter(self):
         return AdminModelConverter(self)
 
+    def get_form_cache_key(self):
+        return (super(ModelAdmin, self).get_form_cache_key(),
+                self.hide_backrefs)
+
     @property
     def query(self):
         return self.get_queryset()  # TODO remove eventually (kept for backwards compatibility)
@@ -57,6 +96,9 @@ class ModelAdmin(BaseModelAdmin):
         id = self.get_pk(self.model)
         return self.get_queryset().filter(id.in_(pks))
 
+    def apply_pk_order(self, qs):
+        return qs.order_by(self.get_pk(self.model))
+
     def get_object(self, pk):
         return self.get_queryset().get(pk)
 
@@ -68,59 +110,516 @@ class ModelAdmin(BaseModelAdmin):
         if adding:
             self.session.add(instance)
         self.session.commit()
+        self.invalidate_list_cache()
         return instance
 
+    def can_bulk_delete(self):
+        # A set-based DELETE bypasses the session, so what the ORM does when
+        # it deletes an object wouldn't happen: delete events, cascades,
+        # removing the rows of association tables and nulling the foreign
+        # keys of one-to-many children it isn't told the database handles
+        if not self.bulk_delete:
+            return False
+        mapper = class_mapper(self.model)
+        if _has_listeners(mapper, 'before_delete', 'after_delete'):
+            return False
+        for rel in mapper.relationships:
+            if rel.cascade.delete or rel.secondary is not None:
+                return False
+            if rel.direction is interfaces.ONETOMANY and \
+                    not rel.passive_deletes:
+                return False
+        return True
+
     def delete_models(self, *pks):
-        objs = self.get_objects(*pks)
-        [self.session.delete(x) for x in objs]
+        id = self.get_pk(self.model)
+        bulk = self.can_bulk_delete()
+        for chunk in chunked(pks, self.delete_chunk_size):
+            objs = self.get_queryset().filter(id.in_(chunk))
+            if bulk:
+                objs.delete(synchronize_session=False)
+            else:
+                [self.session.delete(x) for x in objs]
         self.session.commit()
+        self.invalidate_list_cache()
         return True
 
+    def delete_matching_models(self, search_query=None, filters=None):
+        if not self.can_bulk_delete():
+            return super(ModelAdmin, self).delete_matching_models(
+                search_query, filters)
+        id = self.get_pk(self.model)
+        qs = self.get_action_queryset(None, search_query, filters)
+        # Selected through a derived table, MySQL can't read the table it
+        # deletes from in a subquery
+        matching = qs.with_entities(id).subquery()
+        count = self.get_queryset().filter(
+            id.in_(select([list(matching.c)[0]]))
+        ).delete(synchronize_session=False)
+        self.session.commit()
+        self.invalidate_list_cache()
+        return count
+
+    def can_bulk_update(self, values):
+        if not self.bulk_update:
+            return False
+        mapper = class_mapper(self.model)
+        # UPDATE statements bypass the session and its flush events
+        if _has_listeners(mapper, 'before_update', 'after_update'):
+            return False
+        # Relations are set through the session
+        return all(name in mapper.column_attrs for name in values)
+
+    def update_models(self, values, *pks):
+        id = self.get_pk(self.model)
+        bulk = self.can_bulk_update(values)
+        count = 0
+        for chunk in chunked(pks, self.update_chunk_size):
+            objs = self.get_queryset().filter(id.in_(chunk))
+            if bulk:
+                count += objs.update(values, synchronize_session=False)
+            else:
+                for obj in objs:
+                    for name, value in values.iteritems():
+                        setattr(obj, name, value)
+                    count += 1
+        self.session.commit()
+        self.invalidate_list_cache()
+        return count
+
+    def update_matching_models(self, values, search_query=None,
+                               filters=None):
+        if not self.can_bulk_update(values):
+            return super(ModelAdmin, self).update_matching_models(
+                values, search_query, filters)
+        id = self.get_pk(self.model)
+        qs = self.get_action_queryset(None, search_query, filters)
+        # Selected through a derived table like in delete_matching_models
+        matching = qs.with_entities(id).subquery()
+        count = self.get_queryset().filter(
+            id.in_(select([list(matching.c)[0]]))
+        ).update(values, synchronize_session=False)
+        self.session.commit()
+        self.invalidate_list_cache()
+        return count
+
+    def get_unique_checks(self):
+        mapper = class_mapper(self.model)
+        table = mapper.local_table
+        names = {}
+        for prop in mapper.iterate_properties:
+            if isinstance(prop, orm.ColumnProperty):
+                for column in prop.columns:
+                    names.setdefault(column, prop.key)
+        for prop in mapper.iterate_properties:
+            # Foreign keys are set through their relation in the form
+            if isinstance(prop, orm.RelationshipProperty) and \
+                    prop.direction.name == 'MANYTOONE' and \
+                    len(prop.local_columns) == 1:
+                names[list(prop.local_columns)[0]] = prop.key
+
+        column_sets = [mapper.primary_key]
+        column_sets.extend((column,) for column in table.columns
+                           if column.unique)
+        column_sets.extend(constraint.columns
+                           for constraint in table.constraints
+                           if isinstance(constraint, schema.UniqueConstraint))
+        column_sets.extend(index.columns for index in table.indexes
+                           if index.unique)
+
+        checks = []
+        for columns in column_sets:
+            if not all(column in names for column in columns):
+                continue
+            check = tuple(names[column] for column in columns)
+            if check not in checks:
+                checks.append(check)
+        return checks
+
+    def find_unique_conflicts(self, checks, instance=None):
+        mapper = class_mapper(self.model)
+        exclude = None
+        if instance is not None:
+            identity = mapper.primary_key_from_instance(instance)
+            exclude = not_(and_(*[column == value for column, value
+                                  in zip(mapper.primary_key, identity)]))
+
+        # Unique indexes cover every row, not only those of get_queryset
+        conditions = []
+        for names, values in checks:
+            qs = self.session.query(self.model).filter(
+                *[getattr(self.model, name) == value
+                  for name, value in zip(names, values)])
+            if exclude is not None:
+                qs = qs.filter(exclude)
+            conditions.append(qs.exists())
+
+        # SELECT EXISTS (...), EXISTS (...), each using its unique index
+        found = self.session.query(*conditions).one()
+        return [names for (names, values), exists in zip(checks, found)
+                if exists]
+
+    def get_matching_pks(self, search_query=None, filters=None):
+        id = self.get_pk(self.model)
+        qs = self.get_queryset()
+        if search_query and self.search_fields:
+            qs = self.apply_search(qs, search_query)
+        if filters:
+            qs = self.apply_filters(qs, filters)
+        return (row[0] for row in qs.with_entities(id).distinct())
+
+    @contextmanager
+    def instrument_queries(self):
+        engine = self.session.get_bind(mapper=class_mapper(self.model))
+        if not event.contains(engine, 'before_cursor_execute',
+                              _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute',
+                         _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute',
+                         _after_cursor_execute)
+        yield
+
+    def get_related_model(self, model, name):
+        relationships = class_mapper(model).relationships
+        if name in relationships:
+            return relationships[name].mapper.class_
+
+    def get_referenced_models(self):
+        return [rel.mapper.class_
+                for rel in class_mapper(self.model).relationships]
+
+    def _is_collection_path(self, path):
+        model = self.model
+        for name in path.split('.'):
+            prop = class_mapper(model).relationships[name]
+            if prop.uselist:
+                return True
+            model = prop.mapper.class_
+        return False
+
+    def apply_select_related(self, qs, paths):
+        # Join many-to-one relations in, load collections with a second
+        # query so the page limit still applies to the rows of the list
+        collection_loader = getattr(orm, 'selectinload', orm.subqueryload)
+        for path in paths:
+            loader = orm
+            model = self.model
+            for name in path.split('.'):
+                prop = class_mapper(model).relationships[name]
+                if prop.uselist:
+                    loader = getattr(loader, collection_loader.__name__)(name)
+                else:
+                    loader = loader.joinedload(name)
+                model = prop.mapper.class_
+            qs = qs.options(loader)
+        return qs
+
+    def get_projection_fields(self, name):
+        mapper = class_mapper(self.model)
+        if name in mapper.column_attrs:
+            return [name]
+        if name in mapper.relationships:
+            # Loading the relation needs its local columns, e.g. the
+            # foreign key of a many-to-one relation
+            return [mapper.get_property_by_column(column).key
+                    for column in mapper.relationships[name].local_columns]
+        return None
+
+    def apply_projection(self, qs, fields):
+        return qs.options(orm.load_only(*fields))
+
+    def estimate_count(self):
+        mapper = class_mapper(self.model)
+        table = mapper.local_table
+        dialect = self.session.get_bind(mapper=mapper).dialect.name
+
+        if dialect == 'postgresql':
+            estimate = self.session.execute(
+                text('SELECT reltuples FROM pg_class '
+                     'WHERE oid = CAST(:name AS regclass)'),
+                {'name': table.fullname}).scalar()
+        elif dialect == 'mysql':
+            estimate = self.session.execute(
+                text('SELECT table_rows FROM information_schema.tables '
+                     'WHERE table_schema = COALESCE(:schema, DATABASE()) '
+                     'AND table_name = :name'),
+                {'schema': table.schema, 'name': table.name}).scalar()
+        else:
+            return None
+
+        # Tables that were never analyzed have no (or a negative) estimate
+        if estimate is None or estimate < 0:
+            return None
+        return int(estimate)
+
+    def can_count_concurrently(self):
+        bind = self.session.get_bind(mapper=class_mapper(self.model))
+        # In-memory SQLite has a database per thread, or one connection
+        # shared by all threads
+        return not isinstance(bind.pool, (pool.SingletonThreadPool,
+                                          pool.StaticPool))
+
+    def count_concurrently(self, qs, search_query=None, filters=None):
+        # Sessions can't be shared between threads
+        factory = getattr(self.session, 'session_factory', None)
+        if factory is not None:
+            session = factory()
+        else:
+            session = orm.Session(
+                bind=self.session.get_bind(mapper=class_mapper(self.model)))
+        try:
+            return self.get_count(qs.with_session(session), search_query,
+                                  filters)
+        finally:
+            session.close()
+
     def construct_search(self, field_name, op=None):
+        # Qualify the model's own columns, joined eager loads would make
+        # a bare name ambiguous
+        column = getattr(self.model, field_name, None)
+        if column is None:
+            column = literal_column(field_name)
         if op == '^':
-            return literal_column(field_name).startswith
+            return column.startswith
         elif op == '=':
-            return literal_column(field_name).op('=')
+            return column.op('=')
         else:
-            return literal_column(field_name).contains
+            return column.contains
+
+    def _get_column(self, field_name):
+        prop = getattr(getattr(self.model, field_name, None), 'property', None)
+        columns = getattr(prop, 'columns', None)
+        if columns and isinstance(columns[0], schema.Column):
+            return columns[0]
+
+    def scaffold_filters(self, name):
+        column = self._get_column(name)
+        if column is None:
+            return None
+        return self.filter_converter.convert(type(column.type).__name__,
+                                             getattr(self.model, name),
+                                             self.field_name(name))
+
+    def get_facet_counts(self, qs, name):
+        column = getattr(self.model, name)
+        count = func.count()
+        qs = qs.with_entities(column, count).group_by(column)
+        qs = qs.order_by(None).order_by(count.desc(), column)
+        return qs.limit(self.list_facet_limit).all()
 
-    def apply_search(self, qs, search_query):
+    def scaffold_date_filter(self, name):
+        column = self._get_column(name)
+        if column is None or \
+                not isinstance(column.type, (types.Date, types.DateTime)):
+            return None
+        return FilterDateRange(getattr(self.model, name),
+                               self.field_name(name),
+                               isinstance(column.type, types.DateTime))
+
+    def get_date_buckets(self, qs, name, level):
+        # EXTRACT on most databases, strftime() on SQLite. The rows are
+        # already restricted to the parent period by a range on the column.
+        bucket = extract(level, getattr(self.model, name))
+        qs = qs.with_entities(bucket, func.count()).group_by(bucket)
+        return [(int(value), count)
+                for value, count in qs.order_by(None).order_by(bucket)
+                if value is not None]
+
+    def get_date_bounds(self, qs, name):
+        column = getattr(self.model, name)
+        return tuple(qs.with_entities(func.min(column), func.max(column))
+                     .order_by(None).one())
+
+    def _is_indexed(self, column):
+        if column.index or column.unique or column.primary_key:
+            return True
+        # Also counts when it's the leading column of a multi-column index
+        # or unique constraint
+        for index in list(column.table.indexes) + \
+                list(column.table.constraints):
+            if (isinstance(index, (schema.Index, schema.UniqueConstraint)) and
+                    list(index.columns)[:1] == [column]):
+                return True
+        return False
+
+    def get_index_match(self, field_name):
+        column = self._get_column(field_name)
+        if column is None or not self._is_indexed(column):
+            return None
+
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return None
+        if issubclass(python_type, basestring):
+            return 'prefix'
+        if (issubclass(python_type, (int, long, float, decimal.Decimal)) and
+                not issubclass(python_type, bool)):
+            return 'exact'
+        return None
+
+    def apply_default_search(self, qs, search_query):
+        plan = self.get_search_plan()
+        ops = {'prefix': '^', 'exact': '='}
         or_queries = []
         # treat spaces as if they were OR operators
         for word in search_query.split():
             op = word[:1]
             if op in ['^', '=']:
                 word = word[1:]
-            orm_lookups = [self.construct_search(str(model_field), op)
-                           for model_field in self.search_fields]
-            or_queries.extend([orm_lookup(word) for orm_lookup in orm_lookups])
+            else:
+                op = None
+            if not word:
+                continue
+            for model_field, match in plan:
+                field_op = op or ops.get(match)
+                value = word
+                if match == 'exact' and not op:
+                    # Compare with a value of the column's type, skip the
+                    # column if the word isn't one
+                    column = self._get_column(str(model_field))
+                    try:
+                        value = column.type.python_type(word)
+                    except (TypeError, ValueError):
+                        continue
+                orm_lookup = self.construct_search(str(model_field), field_op)
+                or_queries.append(orm_lookup(value))
         if or_queries:
             qs = qs.filter(or_(*or_queries))
+        elif search_query.split():
+            # None of the words can match any field
+            qs = qs.filter(false())
+        if self.search_explain:
+            self.explain_search(search_query, plan, qs.statement)
         return qs
 
-    def get_list(self, page=0, sort=None, sort_desc=None, execute=False, search_query=None):
+    def compile_sort(self, name):
+        # Related columns are joined through an alias per relation, so they
+        # can't clash with the joins of the query
+        mapper = class_mapper(self.model)
+        parent = self.model
+        joins = []
+        path = name.split('.')
+        for part in path[:-1]:
+            if part not in mapper.relationships:
+                return None
+            prop = mapper.relationships[part]
+            if prop.uselist:
+                return None
+            target = orm.aliased(prop.mapper.class_)
+            joins.append((target, getattr(parent, part)))
+            mapper, parent = prop.mapper, target
+
+        if path[-1] not in mapper.column_attrs:
+            return None
+        column = mapper.column_attrs[path[-1]].columns[0]
+        indexed = isinstance(column, schema.Column) and \
+            self._is_indexed(column)
+        return SortColumn(getattr(parent, path[-1]), tuple(joins), indexed)
+
+    def join_sort_column(self, qs, sort):
+        """ Returns `qs` with the joins sorting by `sort` needs, and the
+        expression to order by.
+        """
+        column = self.get_sort_column(sort)
+        for target, onclause in column.joins:
+            qs = qs.outerjoin(target, onclause)
+        return qs, column.expression
+
+    def apply_sort(self, qs, sort, sort_desc, columns=()):
+        """ Orders `qs` by the sortable column `sort`, then `columns`. """
+        columns = list(columns)
+        if sort:
+            qs, expression = self.join_sort_column(qs, sort)
+            columns.insert(0, expression)
+        return qs.order_by(*[desc(c) if sort_desc else c for c in columns])
+
+    def apply_keyset(self, qs, sort, sort_desc, cursor):
+        direction, values = cursor or (pagination.NEXT, None)
+        ascending = pagination.is_ascending(sort_desc, direction)
+
+        columns = [getattr(self.model, self._primary_key)]
+        if sort:
+            qs, expression = self.join_sort_column(qs, sort)
+            columns.insert(0, expression)
+
+        # Seek past the cursor row: (c1, c2) > (v1, v2), spelled out so it
+        # works on every database.
+        if values:
+            clauses = []
+            for i, column in enumerate(columns):
+                bound = column > values[i] if ascending else column < values[i]
+                clauses.append(and_(*[c == v for c, v in
+                                      zip(columns[:i], values[:i])] + [bound]))
+            qs = qs.filter(or_(*clauses))
+
+        qs = qs.order_by(*[c if ascending else desc(c) for c in columns])
+
+        return qs.limit(self.list_fetch_size)
+
+    def get_export_list(self, sort=None, sort_desc=None, search_query=None,
+                        filters=None):
+        qs = self.get_queryset()
+        if search_query and self.search_fields:
+            qs = self.apply_search(qs, search_query)
+        if filters:
+            qs = self.apply_filters(qs, filters)
+
+        # yield_per can't be combined with eager loading of collections,
+        # only many-to-one relations are joined in
+        select_related = [path for path in self.get_select_related()
+                          if not self._is_collection_path(path)]
+        if select_related:
+            qs = self.apply_select_related(qs, select_related)
+
+        fields = self.get_list_projection()
+        if fields is not None:
+            qs = self.apply_projection(qs, fields)
+
+        qs = self.apply_sort(qs, sort, sort_desc,
+                             [getattr(self.model, self._primary_key)])
+
+        # Streams results with a server-side cursor where the driver has one
+        return qs.yield_per(self.export_batch_size)
+
+    def get_list(self, page=0, sort=None, sort_desc=None, execute=False,
+                 search_query=None, cursor=None, filters=None):
         qs = self.get_queryset()
 
         # Filter by search query
         if search_query and self.search_fields:
             qs = self.apply_search(qs, search_query)
 
+        if filters:
+            qs = self.apply_filters(qs, filters)
+
         #Calculate number of rows
-        count = qs.count()
+        count = self.start_count(qs, search_query, filters)
 
-        #Order queryset
-        if sort:
-            if sort_desc:
-                sort = desc(sort)
-            qs = qs.order_by(sort)
+        # Only load the fields shown in the list
+        fields = self.get_list_projection(sort)
+        if fields is not None:
+            qs = self.apply_projection(qs, fields)
+
+        # Load the relations shown in the list along with the rows
+        select_related = self.get_select_related()
+        if select_related:
+            qs = self.apply_select_related(qs, select_related)
+
+        if self.keyset_pagination:
+            qs = self.apply_keyset(qs, sort, sort_desc, cursor)
+        else:
+            #Order queryset
+            if sort:
+                qs = self.apply_sort(qs, sort, sort_desc)
 
-        # Pagination
-        if page is not None:
-            qs = qs.offset(page * self.list_per_page)
+            # Pagination
+            if page is not None:
+                qs = qs.offset(page * self.list_per_page)
 
-        qs = qs.limit(self.list_per_page)
+            qs = qs.limit(self.list_fetch_size)
 
-        if execute:
+        if execute or count.concurrent:
             qs = qs.all()
 
-        return count, qs
+        return count.get(), qs
@@ -0,0 +1,76 @@
+"""
+Background queries for the list view.
+
+With `BaseModelAdmin.list_concurrent_count` set, `get_list` counts the rows
+in a thread of a shared pool while it fetches the page, so a list costs the
+slower of the two queries instead of their sum. The count runs in an
+application context and its queries are recorded in the stats of the request
+(see `flask_superadmin.instrumentation`).
+"""
+import threading
+from multiprocessing.pool import ThreadPool
+
+from flask import current_app
+
+from flask_superadmin import instrumentation
+
+
+# Number of threads of the pool, i.e. of counts running at the same time
+POOL_SIZE = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # Started on first use, so that forking servers start it in each worker
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(POOL_SIZE)
+    return _pool
+
+
+class Result(object):
+    """
+        Value computed right away.
+    """
+    concurrent = False
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class BackgroundResult(object):
+    """
+        Value computed in the pool. `get` waits for it, or raises the
+        exception raised while computing it.
+    """
+    concurrent = True
+
+    def __init__(self, async_result):
+        self._async_result = async_result
+
+    def get(self):
+        return self._async_result.get()
+
+
+def run_in_background(view, func, *args):
+    """
+        Call `func(*args)` in the pool and return a `BackgroundResult`.
+    """
+    app = current_app._get_current_object()
+    stats = instrumentation.current_stats()
+
+    def run():
+        with app.app_context():
+            if stats is None:
+                return func(*args)
+            with instrumentation.bound(stats):
+                with view.instrument_queries():
+                    return func(*args)
+
+    return BackgroundResult(get_pool().apply_async(run))
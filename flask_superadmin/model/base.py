@@ -1,13 +1,26 @@
+import calendar
+import datetime
+import hashlib
 import math
 import re
+from collections import OrderedDict, namedtuple
 
 from wtforms import fields, widgets
-from flask import request, url_for, redirect, flash, abort
+from flask import (request, url_for, redirect, flash, abort, jsonify,
+                   current_app, Response, stream_with_context)
 
 from flask_superadmin.babel import gettext
+from flask_superadmin import instrumentation
 from flask_superadmin.base import BaseView, expose
+from flask_superadmin.model import (background, cache, counts, pagination,
+                                    search)
+from flask_superadmin.model.actions import PERMISSIONS
+from flask_superadmin.model.export import EXPORT_FORMATS
+from flask_superadmin.model.filters import (BaseFilter, parse_period,
+                                             format_period)
 from flask_superadmin.form import (BaseForm, ChosenSelectWidget, FileField,
-                                   DatePickerWidget, DateTimePickerWidget)
+                                   DatePickerWidget, DateTimePickerWidget,
+                                   AutocompleteSelectWidget)
 
 import traceback
 
@@ -17,7 +30,9 @@ class AdminModelConverter(object):
         field = super(AdminModelConverter, self).convert(*args, **kwargs)
         if field:
             widget = field.kwargs.get('widget', field.field_class.widget)
-            if isinstance(widget, widgets.Select):
+            if isinstance(widget, AutocompleteSelectWidget):
+                pass
+            elif isinstance(widget, widgets.Select):
                 field.kwargs['widget'] = ChosenSelectWidget(
                     multiple=widget.multiple)
             elif issubclass(field.field_class, fields.DateTimeField):
@@ -29,6 +44,8 @@ class AdminModelConverter(object):
         return field
 
 
+FILTER_ARG_RE = re.compile(r'^flt(\d+)_(\d+)$')
+
 first_cap_re = re.compile('(.)([A-Z][a-z]+)')
 
 
@@ -40,6 +57,57 @@ def prettify(str):
     return str.replace('_', ' ').title()
 
 
+def freeze(value):
+    """ Turns nested lists, tuples, sets and dicts into something hashable
+    so it can be part of a cache key. Unhashable leaves are keyed by identity.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.iteritems()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return ('id', id(value))
+    return value
+
+
+# How the list is sorted by a column, see `BaseModelAdmin.compile_sort`.
+# `expression` is what the backend orders by, `joins` the joins it needs and
+# `indexed` whether an index can serve the sort.
+SortColumn = namedtuple('SortColumn', ('expression', 'joins', 'indexed'))
+
+# Facet of the list view, see `BaseModelAdmin.get_facets`. Every value has a
+# `label`, the number of matching rows, the URL filtering the list by it (or
+# removing that filter when `active`), and is ``None`` for values that can't
+# be filtered by.
+Facet = namedtuple('Facet', ('name', 'label', 'values'))
+FacetValue = namedtuple('FacetValue', ('label', 'count', 'url', 'active'))
+
+# Date hierarchy of the list view, see `BaseModelAdmin.get_date_hierarchy`:
+# the links to the selected period and its parents, and to the years, months
+# or days it's made of. `count` is ``None`` when they weren't counted.
+DateHierarchy = namedtuple('DateHierarchy', ('crumbs', 'buckets'))
+DateLink = namedtuple('DateLink', ('label', 'count', 'url'))
+
+DATE_LEVELS = ('year', 'month', 'day')
+
+
+def chunked(values, size):
+    """ Splits `values` into lists of at most `size` items.
+    """
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 class BaseModelAdmin(BaseView):
     """ BaseModelAdmin provides create/edit/delete functionality for an
     abstract Model. The abstraction is further customized by the
@@ -50,11 +118,62 @@ class BaseModelAdmin(BaseView):
     # Number of objects to display per page in the list view
     list_per_page = 20
 
+    # Use keyset (seek) pagination in the list view. Instead of a page
+    # number, the URL carries a cursor with the sort value and the primary
+    # key of the last row shown, so deep pages are as cheap as the first one.
+    # The sort column should not contain NULL values.
+    keyset_pagination = False
+
+    # Only sort the list by the columns an index can serve, see
+    # `SortColumn`. The others in `sortable_columns` (or `list_display`) are
+    # not offered, sorting a large table by them makes the database sort
+    # every matching row for each page.
+    sort_indexed_only = False
+
+    # How the list view counts the rows matching the current search. Either
+    # one of 'exact', 'cached', 'estimate' and 'none' or an instance of a
+    # `flask_superadmin.model.counts.BaseCountStrategy` subclass.
+    count_strategy = 'exact'
+
+    # Count the rows in a background thread while the page is fetched, see
+    # `flask_superadmin.model.background`. Both queries see the same rows
+    # unless the table changes in between, like with two requests. Backends
+    # count in the foreground when the database can't be used from another
+    # thread, e.g. in-memory SQLite.
+    list_concurrent_count = False
+
+    # Store remembering the count and primary keys of the list pages, an
+    # instance of a `flask_superadmin.model.cache.BaseCache` subclass. Pages
+    # are forgotten once `save_model` or `delete_models` changes the model or
+    # a model it references.
+    list_cache = None
+
+    # Seconds a list page stays in `list_cache`
+    list_cache_timeout = 60
+
     # Columns to display in the list index - can be field names or callables.
     # Admin's methods have higher priority than the fields/methods on
     # the model or document.
     list_display = tuple()
 
+    # Relations to load together with the rows of the list view instead of
+    # one by one while rendering. When `True`, they're detected from the
+    # dotted paths in `list_display` (e.g. 'author.name' loads 'author'). It
+    # can also be a tuple of relation paths, or `False` to disable it.
+    list_select_related = True
+
+    # Load only the fields `list_display` shows (and the primary key) in the
+    # list view and the export, instead of whole rows. Lists showing
+    # admin methods, model methods or properties load whole rows, as those
+    # can use any field.
+    list_projection = True
+
+    # Columns the list can be sorted by, including ones that aren't displayed
+    # and columns of related models (e.g. 'author.name'). By default, the
+    # columns of `list_display` that can be sorted. Sorting by anything else
+    # is ignored.
+    sortable_columns = None
+
     # Only fields with names specified in `fields` will be displayed in the
     # form (minus the ones mentioned in `exclude`). The order is preserved,
     # too. You can also include methods that are on the model admin, or on the
@@ -72,13 +191,96 @@ class BaseModelAdmin(BaseView):
     can_create = True
     can_delete = True
 
+    # Delete rows with set-based statements, `delete_chunk_size` primary keys
+    # at a time, instead of loading and deleting every object. Set to False
+    # when deletes rely on per-object hooks such as ORM cascades or signals.
+    bulk_delete = True
+    delete_chunk_size = 500
+
+    # Mass updates offered in the list view, see
+    # `flask_superadmin.model.actions.UpdateAction`
+    update_actions = ()
+
+    # Update rows with set-based statements, `update_chunk_size` primary keys
+    # at a time. Rows are saved one by one when this is False or when the
+    # backend finds per-object hooks (ORM events, save signals, an
+    # overridden save method) the statements would skip.
+    bulk_update = True
+    update_chunk_size = 500
+
     list_template = 'admin/model/list.html'
     edit_template = 'admin/model/edit.html'
     add_template = 'admin/model/add.html'
     delete_template = 'admin/model/delete.html'
+    update_template = 'admin/model/update.html'
 
     search_fields = tuple()
 
+    # Fields the list can be filtered by, or instances of
+    # `flask_superadmin.model.filters.BaseFilter`. Filters are applied by the
+    # database before counting and paging, so filtering by indexed fields
+    # narrows large lists without a full-text search.
+    list_filters = tuple()
+
+    # Fields whose most frequent values are shown above the list with their
+    # number of rows, e.g. "Status: active (12031) / archived (4000000)".
+    # Every facet is counted with one aggregate query over the rows matching
+    # the search and the other active filters. Its values filter the list
+    # with the first (equality) filter of the field, which is added to the
+    # filters of `list_filters` if needed.
+    list_facets = tuple()
+
+    # Number of values shown per facet
+    list_facet_limit = 10
+
+    # Seconds the facet counts are cached, in `list_cache` when it's set
+    list_facet_timeout = 60
+
+    # Skip the facets of tables with more rows than this: the database's
+    # estimate, or the count of the list without one. ``None`` for no limit.
+    list_facet_max_rows = 1000000
+
+    # Date or datetime field of the year/month/day drill-down shown above the
+    # list. The selected period filters the list with a range on the field
+    # (``field >= start AND field < end``) that an index on it can serve, and
+    # the years, months or days shown are counted with one aggregate query.
+    # Above `list_facet_max_rows` they're not counted: the years are taken
+    # from the bounds of the field.
+    date_hierarchy = None
+
+    # How `search_fields` are searched. Either a key of `search_engines` or an
+    # instance of a `flask_superadmin.model.search.BaseSearchEngine`
+    # subclass. Backends add engines using full-text indexes.
+    search_engine = 'default'
+    search_engines = {'default': search.DefaultSearch}
+
+    # Let the default search match indexed fields by prefix (text) or by
+    # equality (anything else) instead of by substring, so the index can be
+    # used. Unindexed fields are still matched by substring. Prefixes are
+    # matched case-sensitively where that's what the index supports
+    # (Django, MongoEngine), which changes the results of existing searches,
+    # hence off by default.
+    search_use_indexes = False
+
+    # Log how the default search matches every field, and the resulting
+    # query, on each search
+    search_explain = False
+
+    # Formats offered by the `export` view, keys of
+    # `flask_superadmin.model.export.EXPORT_FORMATS`
+    export_formats = ('csv', 'json')
+
+    # Number of rows fetched per database round trip when exporting
+    export_batch_size = 1000
+
+    # Relations with too many rows to list in a select. They are rendered
+    # with an autocomplete widget backed by the `autocomplete` view of the
+    # related model's admin, which should define `search_fields`.
+    autocomplete_fields = tuple()
+
+    # Maximum number of results returned by the `autocomplete` view
+    autocomplete_limit = 20
+
     field_overrides = {}
 
     # A dictionary of field_name: overridden_params_dict, e.g.
@@ -87,10 +289,23 @@ class BaseModelAdmin(BaseView):
     # filters, default
     field_args = None
 
+    # Build form classes once and reuse them while `form`, `fields`,
+    # `readonly_fields`, `exclude`, `field_args` and `field_overrides` stay
+    # the same. Call `invalidate_form_cache` after changing anything else the
+    # form depends on at runtime.
+    cache_forms = True
+
     @staticmethod
     def model_detect(model):
         return False
 
+    @classmethod
+    def prepare_instrumentation(cls):
+        """ Called when an instrumented `Admin` is created, for backends
+        that have to hook into their database driver before connecting.
+        """
+        pass
+
     def __init__(self, model=None, name=None, category=None, endpoint=None,
                  url=None):
         if name is None:
@@ -104,37 +319,203 @@ class BaseModelAdmin(BaseView):
         if model:
             self.model = model
 
+        self._form_cache = {}
+        self._column_accessors = {}
+        self._actions = self.collect_actions()
+
+    def collect_actions(self):
+        """ Returns the methods decorated with
+        `flask_superadmin.model.actions.action`, by action name.
+        """
+        actions = {}
+        cls = type(self)
+        for attr in dir(cls):
+            info = getattr(getattr(cls, attr, None), '_action', None)
+            if info is not None:
+                name, label, permission = info
+                actions[name] = (label, getattr(self, attr), permission)
+        return actions
+
+    def is_action_allowed(self, name):
+        """ Whether the custom action `name` may be run, see the
+        `permission` of `flask_superadmin.model.actions.action`.
+        """
+        label, method, permission = self._actions[name]
+        return permission is None or \
+            bool(getattr(self, PERMISSIONS[permission]))
+
     def get_display_name(self):
         return self.model.__name__
 
     def allow_pk(self):
         return not self.model._meta.auto_increment
 
-    def get_column(self, instance, name):
-        parts = name.split('.')
-        value = instance
-        for p in parts:
-
+    def compile_column(self, name):
+        """ Returns a function that takes an instance and returns the value
+        of the `name` column for it. The lookup of every part of a dotted
+        name is resolved here once instead of for every cell.
+        """
+        steps = []
+        for p in name.split('.'):
             # admin's methods have higher priority than the fields/methods on
             # the model or document. If a callable is found on the admin
             # level, it's also passed an instance object
-            if hasattr(self, p) and callable(getattr(self, p)):
-                value = getattr(self, p)(instance)
+            method = getattr(self, p, None)
+            if callable(method):
+                steps.append((p, method))
             else:
-                value = getattr(value, p, None)
+                steps.append((p, None))
+
+        if len(steps) == 1:
+            p, method = steps[0]
+            if method is not None:
+                return method
+
+            def get_attribute(instance):
+                value = getattr(instance, p, None)
                 if callable(value):
                     value = value()
+                return value
+            return get_attribute
+
+        def get_path(instance):
+            value = instance
+            for p, method in steps:
+                if method is not None:
+                    value = method(instance)
+                else:
+                    value = getattr(value, p, None)
+                    if callable(value):
+                        value = value()
+
+                if not value:
+                    break
+            return value
+        return get_path
+
+    def get_column_accessor(self, name):
+        try:
+            return self._column_accessors[name]
+        except KeyError:
+            accessor = self._column_accessors[name] = self.compile_column(name)
+            return accessor
+
+    def get_list_columns(self):
+        """ Returns ``(name, accessor)`` pairs for the `list_display`
+        columns. """
+        return tuple((name, self.get_column_accessor(name))
+                     for name in self.list_display)
+
+    def get_column(self, instance, name):
+        return self.get_column_accessor(name)(instance)
+
+    def get_related_model(self, model, name):
+        """ Returns the model `name` refers to if it's a relation of
+        `model`, ``None`` otherwise. Should get overridden in
+        backend-specific view.
+        """
+        return None
+
+    def get_select_related(self):
+        """ Returns the relation paths `get_list` loads eagerly. """
+        if self.list_select_related is not True:
+            return tuple(self.list_select_related or ())
+
+        key = freeze(self.list_display)
+        cached = getattr(self, '_select_related', None)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        paths = []
+        for column in self.list_display:
+            parts = column.split('.')
+            # Admin methods get the whole instance, we can't tell what
+            # they use
+            if callable(getattr(self, parts[0], None)):
+                continue
+
+            model = self.model
+            path = []
+            for part in parts:
+                model = self.get_related_model(model, part)
+                if model is None:
+                    break
+                path.append(part)
+
+            path = '.'.join(path)
+            if path and path not in paths:
+                paths.append(path)
+
+        paths = tuple(paths)
+        self._select_related = (key, paths)
+        return paths
+
+    def apply_select_related(self, qs, paths):
+        """ Makes `qs` load the relations in `paths` eagerly. Should get
+        overridden in backend-specific view.
+        """
+        return qs
 
-            if not value:
-                break
+    def get_projection_fields(self, name):
+        """ Returns the names of the fields to load to read the `name`
+        attribute of the model, or ``None`` if it isn't a field (e.g. a
+        method or property). Should get overridden in backend-specific view.
+        """
+        return None
 
-        return value
+    def get_list_projection(self, sort=None):
+        """ Returns the fields `get_list` loads to show `list_display`
+        sorted by `sort`, or ``None`` to load whole rows.
+        """
+        if not self.list_projection or not self.list_display:
+            return None
+
+        select_related = self.get_select_related()
+        key = (freeze(self.list_display), freeze(select_related))
+        cached = getattr(self, '_list_projection', None)
+        if cached and cached[0] == key:
+            fields = cached[1]
+        else:
+            fields = []
+            for column in self.list_display:
+                name = column.split('.')[0]
+                # Admin methods get the whole instance
+                if callable(getattr(self, name, None)):
+                    fields = None
+                    break
+                names = self.get_projection_fields(name)
+                if names is None:
+                    fields = None
+                    break
+                fields.extend(n for n in names if n not in fields)
+            # Relations loaded along with the rows can't be left out
+            for path in select_related if fields is not None else ():
+                names = self.get_projection_fields(path.split('.')[0])
+                if names is None:
+                    fields = None
+                    break
+                fields.extend(n for n in names if n not in fields)
+            self._list_projection = (key, fields)
+
+        # Keyset pagination reads the sort value from the rows
+        if fields is not None and sort:
+            names = self.get_projection_fields(sort.split('.')[0]) or []
+            fields = fields + [n for n in names if n not in fields]
+        return fields
+
+    def apply_projection(self, qs, fields):
+        """ Makes `qs` load only `fields` and the primary key. Should get
+        overridden in backend-specific view.
+        """
+        return qs
 
     def get_reference(self, column_value):
-        for model, model_view in self.admin._models:
-            if type(column_value) == model:
-                return '/admin/%s/%s/' % (model_view.endpoint,
-                                          model_view.get_pk(column_value))
+        if column_value is None:
+            return None
+        model_view = self.admin.get_model_view(type(column_value))
+        if model_view is not None:
+            return url_for(model_view.endpoint + model_view.get_url_name('edit'),
+                           pk=model_view.get_pk(column_value))
 
     def get_readonly_fields(self, instance):
         ret_vals = {}
@@ -169,7 +550,28 @@ class BaseModelAdmin(BaseView):
         """
         raise NotImplemented()
 
+    def get_form_cache_key(self):
+        return freeze((self.form, self.fields, self.readonly_fields,
+                       self.exclude, self.field_args, self.field_overrides,
+                       self.autocomplete_fields))
+
+    def invalidate_form_cache(self):
+        """ Forgets the form classes built so far. """
+        self._form_cache.clear()
+
     def get_form(self):
+        if not self.cache_forms:
+            with instrumentation.timed('form_time'):
+                return self.build_form()
+
+        key = self.get_form_cache_key()
+        form = self._form_cache.get(key)
+        if form is None:
+            with instrumentation.timed('form_time'):
+                form = self._form_cache[key] = self.build_form()
+        return form
+
+    def build_form(self):
         model_form = self.get_model_form()
         converter = self.get_converter()
         if isinstance(converter, type):
@@ -200,8 +602,179 @@ class BaseModelAdmin(BaseView):
     def delete_models(self, *pks):
         raise NotImplemented()
 
+    def update_models(self, values, *pks):
+        """ Sets the fields in the `values` dict on the rows `pks` and
+        returns how many were updated. Should get overridden in
+        backend-specific view.
+        """
+        raise NotImplemented()
+
+    def update_matching_models(self, values, search_query=None,
+                               filters=None):
+        """ Sets the fields in the `values` dict on every row matching
+        `search_query` and `filters` and returns how many were updated.
+        Backends override it to update them with a set-based statement
+        instead of listing their primary keys.
+        """
+        pks = list(self.get_matching_pks(search_query, filters))
+        return self.update_models(values, *pks)
+
+    def get_list_actions(self):
+        """ Returns the (name, label) of the actions offered in the list view.
+        """
+        actions = []
+        if self.can_delete:
+            actions.append(('delete', gettext('Delete selected')))
+        if self.can_edit:
+            actions.extend((action.name, action.label)
+                           for action in self.update_actions)
+        actions.extend((name, self._actions[name][0])
+                       for name in sorted(self._actions)
+                       if self.is_action_allowed(name))
+        return actions
+
+    def get_action_queryset(self, pks=None, search_query=None, filters=None):
+        """ Returns the lazy queryset of the rows `pks`, or of every row
+        matching `search_query` and `filters` if `pks` is ``None``.
+        """
+        if pks is not None:
+            return self.get_objects(*pks)
+        qs = self.get_queryset()
+        if search_query and self.search_fields:
+            qs = self.apply_search(qs, search_query)
+        if filters:
+            qs = self.apply_filters(qs, filters)
+        return qs
+
+    def get_update_action(self, name):
+        for action in self.update_actions:
+            if action.name == name:
+                return action
+        return None
+
+    def get_update_form(self, action):
+        """ Returns the form asking for the fields of the update `action`.
+        """
+        key = ('update', action.name, action.fields)
+        form = self._form_cache.get(key)
+        if form is None:
+            model_form = self.get_model_form()
+            converter = self.get_converter()
+            if isinstance(converter, type):
+                converter = converter()
+            form = self._form_cache[key] = model_form(
+                self.model, base_class=self.form or BaseForm,
+                fields=action.fields, field_args=self.field_args,
+                converter=converter)
+        return form
+
+    def get_unique_checks(self):
+        """ Returns tuples of the fields whose values together have to be
+        unique: unique fields, primary keys and composite unique
+        constraints. Should get overridden in backend-specific view.
+        """
+        return []
+
+    def find_unique_conflicts(self, checks, instance=None):
+        """ Returns the fields of the `checks`, a list of (fields, values)
+        tuples, that another row than `instance` already has the values
+        of, running a single query. Should get overridden in
+        backend-specific view.
+        """
+        raise NotImplemented()
+
+    def validate_unique(self, form, instance=None):
+        """ Checks in one query that the form doesn't repeat the values of
+        the unique fields of another row, adding an error to the form
+        fields in conflict. Fields missing from the form keep the values of
+        `instance`, and checks with missing values (``None``) are skipped,
+        like NULLs in unique indexes.
+        """
+        checks = []
+        for names in self.get_unique_checks():
+            # Only check what the form can change
+            if not any(name in form for name in names):
+                continue
+            values = []
+            for name in names:
+                if name in form:
+                    values.append(form[name].data)
+                else:
+                    values.append(getattr(instance, name, None))
+            if None not in values:
+                checks.append((names, tuple(values)))
+        if not checks:
+            return True
+
+        conflicts = self.find_unique_conflicts(checks, instance)
+        for names in conflicts:
+            fields = [form[name] for name in names if name in form]
+            if len(names) == 1:
+                message = gettext('Already exists.')
+            else:
+                message = gettext('Already exists with the same %(fields)s.',
+                                  fields=', '.join(names))
+            for field in fields:
+                field.errors = list(field.errors) + [message]
+        return not conflicts
+
+    def get_matching_pks(self, search_query=None, filters=None):
+        """ Returns the primary keys of all rows matching `search_query` and
+        `filters`, without loading the objects themselves.
+        """
+        raise NotImplemented()
+
+    def delete_matching_models(self, search_query=None, filters=None):
+        """ Deletes every row matching `search_query` and `filters` and
+        returns how many were deleted. Backends override it to delete them
+        with set-based statements instead of listing their primary keys.
+        """
+        pks = list(self.get_matching_pks(search_query, filters))
+        if pks:
+            self.delete_models(*pks)
+        return len(pks)
+
+    def compile_sort(self, name):
+        """ Returns the `SortColumn` to sort the list by `name`, or
+        ``None`` if it can't be sorted by it. Should get overridden in
+        backend-specific view.
+        """
+        return None
+
+    def get_sortable_columns(self):
+        """ Returns a dict of the columns the list can be sorted by, and
+        their `SortColumn`, compiled once.
+        """
+        key = (freeze(self.sortable_columns), freeze(self.list_display),
+               self.sort_indexed_only)
+        cached = getattr(self, '_sortable_columns', None)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        if self.sortable_columns is None:
+            names = [c for c in self.list_display
+                     if isinstance(c, basestring)]
+        else:
+            names = self.sortable_columns
+
+        columns = {}
+        for name in names:
+            column = self.compile_sort(name)
+            if column is None:
+                if self.sortable_columns is not None:
+                    raise ValueError("Can't sort %s by %r" %
+                                     (self.model.__name__, name))
+            elif column.indexed or not self.sort_indexed_only:
+                columns[name] = column
+
+        self._sortable_columns = (key, columns)
+        return columns
+
+    def get_sort_column(self, name):
+        return self.get_sortable_columns()[name]
+
     def is_sortable(self, column):
-        return False
+        return column in self.get_sortable_columns()
 
     def field_name(self, field):
         return prettify(field)
@@ -209,21 +782,532 @@ class BaseModelAdmin(BaseView):
     def construct_search(self, field_name):
         raise NotImplemented()
 
+    def apply_default_search(self, qs, search_query):
+        raise NotImplemented()
+
+    def get_index_match(self, field_name):
+        """ Returns how the default search can match `field_name` using an
+        index: 'prefix' or 'exact', or ``None`` if the field isn't indexed.
+        Should get overridden in backend-specific view.
+        """
+        return None
+
+    def get_search_plan(self):
+        """ Returns ``(field, match)`` pairs telling how the default search
+        matches every search field: 'contains', 'prefix' or 'exact'.
+        """
+        key = (freeze(self.search_fields), self.search_use_indexes)
+        cached = getattr(self, '_search_plan', None)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        plan = []
+        for field in self.search_fields:
+            match = None
+            if self.search_use_indexes:
+                match = self.get_index_match(str(field))
+            plan.append((field, match or 'contains'))
+
+        plan = tuple(plan)
+        self._search_plan = (key, plan)
+        return plan
+
+    def explain_search(self, search_query, plan, query):
+        current_app.logger.info(
+            'Search %r on %s: %s. Query: %s', search_query, self.endpoint,
+            ', '.join('%s by %s' % (field, match) for field, match in plan),
+            query)
+
+    def get_search_engine(self):
+        engine = self.search_engine
+        if isinstance(engine, basestring):
+            engine = self.search_engines[engine]()
+            self.search_engine = engine
+        return engine
+
+    def apply_search(self, qs, search_query):
+        return self.get_search_engine().apply(self, qs, search_query)
+
+    def scaffold_filters(self, name):
+        """ Returns the filters of the field `name`, one per operation, or
+        ``None`` if it can't be filtered by. Should get overridden in
+        backend-specific view.
+        """
+        return None
+
+    def scaffold_date_filter(self, name):
+        """ Returns the `BaseDateRangeFilter` of the date or datetime field
+        `name`, or ``None`` if it isn't one. Should get overridden in
+        backend-specific view.
+        """
+        return None
+
+    def get_filters(self):
+        """ Returns the list of the filters of `list_filters`,
+        `list_facets` and `date_hierarchy`, built once.
+        """
+        return self._build_filters()[0]
+
+    def get_filter_fields(self):
+        """ Returns the field of every filter of `get_filters`, ``None``
+        for `BaseFilter` instances of `list_filters`.
+        """
+        return self._build_filters()[1]
+
+    def _build_filters(self):
+        key = (freeze(self.list_filters), freeze(self.list_facets),
+               self.date_hierarchy)
+        cached = getattr(self, '_filters', None)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        items = list(self.list_filters)
+        items.extend(name for name in self.list_facets if name not in items)
+
+        filters = []
+        fields = []
+        for item in items:
+            if isinstance(item, BaseFilter):
+                filters.append(item)
+                fields.append(None)
+                continue
+            scaffolded = self.scaffold_filters(item)
+            if not scaffolded:
+                raise ValueError("Can't filter %s by %r" %
+                                 (self.model.__name__, item))
+            filters.extend(scaffolded)
+            fields.extend([item] * len(scaffolded))
+
+        if self.date_hierarchy:
+            flt = self.scaffold_date_filter(self.date_hierarchy)
+            if flt is None:
+                raise ValueError("%s.%s isn't a date" %
+                                 (self.model.__name__, self.date_hierarchy))
+            filters.append(flt)
+            fields.append(self.date_hierarchy)
+
+        self._filters = (key, (filters, fields))
+        return filters, fields
+
+    def get_filter_groups(self):
+        """ Returns the operations of the filters by name, and the options
+        and client data types of the filters by index, for the filter form
+        of the list view.
+        """
+        groups = OrderedDict()
+        options = {}
+        types = {}
+        for index, flt in enumerate(self.get_filters()):
+            groups.setdefault(unicode(flt.name), []).append(
+                (index, unicode(flt.operation())))
+            flt_options = flt.get_options(self)
+            if flt_options:
+                options[index] = [(unicode(value), unicode(label))
+                                  for value, label in flt_options]
+            if flt.data_type:
+                types[index] = flt.data_type
+        return groups, options, types
+
+    def apply_filters(self, qs, filters):
+        """ Returns `qs` filtered by the (index, value) `filters`. """
+        all_filters = self.get_filters()
+        for index, value in filters:
+            flt = all_filters[index]
+            qs = flt.apply(qs, flt.clean(value))
+        return qs
+
+    def is_narrowed(self, search_query=None, filters=None):
+        """ Returns whether `search_query` or `filters` narrow the list
+        down from the whole table. Search engines match no rows at all for
+        searches without a word they can use, so only blank searches don't
+        narrow the list.
+        """
+        if filters:
+            return True
+        return bool(search_query and search_query.split() and
+                    self.search_fields)
+
+    def get_filter_args(self, filters=None):
+        """ Returns the URL arguments of `filters`, the active ones by
+        default.
+        """
+        if filters is None:
+            filters = self.filters
+        return dict(('flt%d_%d' % (position, index), value)
+                    for position, (index, value) in enumerate(filters))
+
     def get_queryset(self):
         raise NotImplemented()
 
     def get_list(self):
         raise NotImplemented()
 
+    def get_export_columns(self):
+        return self.list_display
+
+    def get_export_list(self, sort=None, sort_desc=None, search_query=None,
+                        filters=None):
+        """ Returns an iterator over every row matching `search_query` and
+        `filters`,
+        ordered like the list. Backends stream the rows in batches of
+        `export_batch_size` instead of loading them all.
+        """
+        raise NotImplemented()
+
+    def get_referenced_models(self):
+        """ Returns the models `model` has relations to, whose changes can
+        show in the list. Should get overridden in backend-specific view.
+        """
+        return []
+
+    def get_list_cache_scope(self):
+        """ Returns what the list depends on besides the URL, e.g. the id of
+        the current user when `get_queryset` filters by user. Pages are
+        cached separately for every scope.
+        """
+        return None
+
+    def get_model_versions(self, store):
+        """ Returns the version counters in `store` of `model` and of the
+        models it references.
+        """
+        models = set([self.model]) | set(self.get_referenced_models())
+        names = sorted(cache.model_key(model) for model in models)
+        return zip(names, store.get_counters(names))
+
+    def get_list_cache_key(self, **params):
+        key = (self.endpoint, sorted(params.items()), self.list_fetch_size,
+               self.get_list_cache_scope(),
+               self.get_model_versions(self.list_cache))
+        return 'list:%s' % hashlib.sha1(repr(key)).hexdigest()
+
+    def get_list_by_pks(self, pks, sort=None):
+        """ Returns the rows with primary keys `pks`, in that order. """
+        qs = self.get_objects(*pks)
+        fields = self.get_list_projection(sort)
+        if fields is not None:
+            qs = self.apply_projection(qs, fields)
+        select_related = self.get_select_related()
+        if select_related:
+            qs = self.apply_select_related(qs, select_related)
+        rows = dict((self.get_pk(instance), instance) for instance in qs)
+        return [rows[pk] for pk in pks if pk in rows]
+
+    def get_cached_list(self, **params):
+        """ `get_list`, going through `list_cache` when it's set. """
+        if self.list_cache is None:
+            return self.get_list(**params)
+
+        key = self.get_list_cache_key(**params)
+        cached = self.list_cache.get(key)
+        if cached is not None:
+            count, pks = cached
+            return count, self.get_list_by_pks(pks, params.get('sort'))
+
+        count, data = self.get_list(**params)
+        data = list(data)
+        self.list_cache.set(key, (count, [self.get_pk(x) for x in data]),
+                            self.list_cache_timeout)
+        return count, data
+
+    def invalidate_list_cache(self):
+        """ Forgets the cached list pages of `model` and of the models
+        referencing it, in the stores of all the views of the admin, and
+        the counts their count strategies remember.
+        """
+        views = [self]
+        if self.admin is not None:
+            views.extend(self.admin._views)
+        stores = []
+        strategies = []
+        for view in views:
+            stores.append(getattr(view, 'list_cache', None))
+            stores.append(getattr(view, '_facet_cache', None))
+            strategies.append(getattr(view, 'count_strategy', None))
+
+        key = cache.model_key(self.model)
+        seen = set()
+        for store in stores:
+            if store is not None and id(store) not in seen:
+                seen.add(id(store))
+                store.incr(key)
+        for strategy in strategies:
+            # Names of strategies not used yet have nothing to forget
+            if isinstance(strategy, counts.BaseCountStrategy) and \
+                    id(strategy) not in seen:
+                seen.add(id(strategy))
+                strategy.invalidate()
+
+    def get_facet_counts(self, qs, name):
+        """ Returns the (value, count) of the `list_facet_limit` most
+        frequent values of the field `name` in `qs`, most frequent first,
+        with one aggregate query. Should get overridden in backend-specific
+        view.
+        """
+        raise NotImplemented()
+
+    def get_facet_cache(self):
+        """ Returns the store of the facet counts: `list_cache`, or a store
+        of the view's own.
+        """
+        if self.list_cache is not None:
+            return self.list_cache
+        if getattr(self, '_facet_cache', None) is None:
+            self._facet_cache = cache.LRUCache(timeout=self.list_facet_timeout)
+        return self._facet_cache
+
+    def get_cached_facet_counts(self, name, search_query=None, filters=None):
+        """ `get_facet_counts` of the rows matching `search_query` and
+        `filters`, cached for `list_facet_timeout` seconds.
+        """
+        return self._get_cached_counts(
+            ('facets', name, self.list_facet_limit), search_query, filters,
+            lambda qs: self.get_facet_counts(qs, name))
+
+    def _get_cached_counts(self, kind, search_query, filters, get_counts):
+        store = self.get_facet_cache()
+        key = (self.endpoint, kind, search_query, filters or [],
+               self.get_list_cache_scope(), self.get_model_versions(store))
+        key = '%s:%s' % (kind[0], hashlib.sha1(repr(key)).hexdigest())
+        counts = store.get(key)
+        if counts is None:
+            qs = self.get_queryset()
+            if search_query and self.search_fields:
+                qs = self.apply_search(qs, search_query)
+            if filters:
+                qs = self.apply_filters(qs, filters)
+            counts = list(get_counts(qs))
+            store.set(key, counts, self.list_facet_timeout)
+        return counts
+
+    def can_facet(self, count=None):
+        """ Returns whether the facets are counted, given the `count` of
+        the list. See `list_facet_max_rows`.
+        """
+        if self.list_facet_max_rows is None:
+            return True
+        rows = self.estimate_count()
+        if rows is None:
+            rows = count
+        return rows is not None and rows <= self.list_facet_max_rows
+
+    def get_facet_arg(self, value):
+        """ Returns `value` as the URL value of a filter. """
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        return unicode(value)
+
+    def get_facets(self, search_query=None, filters=None, count=None):
+        """ Returns the `Facet` of every field of `list_facets`. Each one
+        is counted over the rows matching `search_query` and the `filters`
+        on the other fields.
+        """
+        if not self.list_facets or not self.can_facet(count):
+            return []
+
+        filters = filters or []
+        all_filters = self.get_filters()
+        fields = self.get_filter_fields()
+        facets = []
+        for name in self.list_facets:
+            index = fields.index(name)
+            flt = all_filters[index]
+            labels = dict(flt.get_options(self) or ())
+            others = [f for f in filters if fields[f[0]] != name]
+
+            values = []
+            for value, value_count in self.get_cached_facet_counts(
+                    name, search_query, others):
+                arg = self.get_facet_arg(value)
+                if arg is None or not flt.validate(arg):
+                    values.append(FacetValue(unicode(value), value_count,
+                                             None, False))
+                    continue
+                active = (index, arg) in filters
+                if active:
+                    url_filters = others
+                else:
+                    url_filters = others + [(index, arg)]
+                values.append(FacetValue(
+                    unicode(labels.get(arg, value)), value_count,
+                    self.filter_url(url_filters), active))
+            facets.append(Facet(name, self.field_name(name), values))
+        return facets
+
+    def get_date_buckets(self, qs, name, level):
+        """ Returns the (number, count) of the years, months or days
+        (`level`) of the field `name` in `qs`, in order, with one aggregate
+        query. Should get overridden in backend-specific view.
+        """
+        raise NotImplemented()
+
+    def get_date_bounds(self, qs, name):
+        """ Returns the smallest and largest values of the field `name` in
+        `qs`, ``(None, None)`` when it's empty. Should get overridden in
+        backend-specific view.
+        """
+        raise NotImplemented()
+
+    def get_period_label(self, parts, short=False):
+        """ Returns the label of the (year, month, day) `parts`, only the
+        last of them when `short`.
+        """
+        date = datetime.date(*(parts + (1, 1))[:3])
+        if len(parts) == 1:
+            return unicode(parts[0])
+        if len(parts) == 2:
+            return date.strftime('%B' if short else '%B %Y').decode('utf-8')
+        if short:
+            return unicode(parts[2])
+        return date.strftime('%B %d, %Y').decode('utf-8')
+
+    def get_date_hierarchy(self, search_query=None, filters=None, count=None):
+        """ Returns the `DateHierarchy` of `date_hierarchy`, for the rows
+        matching `search_query` and `filters`.
+        """
+        if not self.date_hierarchy:
+            return None
+
+        filters = filters or []
+        index = len(self.get_filters()) - 1
+        others = [f for f in filters if f[0] != index]
+        selected = [value for i, value in filters if i == index]
+        parts = parse_period(selected[-1]) if selected else ()
+
+        def period_url(parts):
+            if not parts:
+                return self.filter_url(others)
+            return self.filter_url(others + [(index, format_period(parts))])
+
+        crumbs = [DateLink(gettext('All dates'), None, period_url(()))]
+        for depth in range(1, len(parts) + 1):
+            crumbs.append(DateLink(self.get_period_label(parts[:depth]),
+                                   None, period_url(parts[:depth])))
+        if len(parts) == len(DATE_LEVELS):
+            return DateHierarchy(crumbs, [])
+
+        level = DATE_LEVELS[len(parts)]
+        period = others + [(index, format_period(parts))] if parts else others
+        if self.can_facet(count):
+            buckets = self._get_cached_counts(
+                ('dates', self.date_hierarchy, level), search_query, period,
+                lambda qs: self.get_date_buckets(qs, self.date_hierarchy,
+                                                 level))
+        elif level == 'year':
+            qs = self.get_queryset()
+            if search_query and self.search_fields:
+                qs = self.apply_search(qs, search_query)
+            if others:
+                qs = self.apply_filters(qs, others)
+            first, last = self.get_date_bounds(qs, self.date_hierarchy)
+            years = range(first.year, last.year + 1) if first else []
+            buckets = [(year, None) for year in years]
+        elif level == 'month':
+            buckets = [(month, None) for month in range(1, 13)]
+        else:
+            days = calendar.monthrange(*parts)[1]
+            buckets = [(day, None) for day in range(1, days + 1)]
+
+        links = [DateLink(self.get_period_label(parts + (value,), True),
+                          bucket_count, period_url(parts + (value,)))
+                 for value, bucket_count in buckets]
+        return DateHierarchy(crumbs, links)
+
+    def get_count_strategy(self):
+        strategy = self.count_strategy
+        if isinstance(strategy, basestring):
+            strategy = counts.COUNT_STRATEGIES[strategy]()
+            # Keep the instance around, some strategies hold state
+            self.count_strategy = strategy
+        return strategy
+
+    def get_count(self, qs, search_query=None, filters=None):
+        """ Returns the number of rows of the filtered queryset `qs`, or
+        ``None`` if the count strategy skips counting.
+        """
+        return self.get_count_strategy().count(self, qs, search_query,
+                                               filters or ())
+
+    def can_count_concurrently(self):
+        """ Returns whether the database can run the count in another
+        thread. Should get overridden in backend-specific view.
+        """
+        return True
+
+    def count_concurrently(self, qs, search_query=None, filters=None):
+        """ `get_count`, run in a background thread. Backends override it
+        to count with their own session or connection.
+        """
+        return self.get_count(qs, search_query, filters)
+
+    def start_count(self, qs, search_query=None, filters=None):
+        """ Starts `get_count`, in the background with
+        `list_concurrent_count`. Returns a result whose `get` method returns
+        the count; its `concurrent` attribute tells whether the page should
+        be fetched right away to run along with it.
+        """
+        if self.list_concurrent_count and self.can_count_concurrently():
+            return background.run_in_background(
+                self, self.count_concurrently, qs, search_query, filters)
+        return background.Result(self.get_count(qs, search_query, filters))
+
+    def estimate_count(self):
+        """ Returns the database's estimate of the number of rows of the
+        model, or ``None`` if there is none. Should get overridden in
+        backend-specific view.
+        """
+        return None
+
+    @property
+    def list_fetch_size(self):
+        """ Number of rows `get_list` fetches for a page. One extra row is
+        fetched when the next page can't be told apart from the count.
+        """
+        if self.keyset_pagination or self.get_count_strategy().lookahead:
+            return self.list_per_page + 1
+        return self.list_per_page
+
     def get_url_name(self, name):
         URLS = {
             'index': '.list',
             'add': '.add',
             'delete': '.delete',
-            'edit': '.edit'
+            'delete_matching': '.delete_matching',
+            'export': '.export',
+            'edit': '.edit',
+            'autocomplete': '.autocomplete'
         }
         return URLS[name]
 
+    def get_autocomplete_url(self, model):
+        """ Returns the autocomplete URL of the view registered for `model`,
+        or ``None`` if it isn't registered.
+        """
+        model_view = self.admin.get_model_view(model) if self.admin else None
+        if model_view is not None:
+            return url_for(model_view.endpoint +
+                           model_view.get_url_name('autocomplete'))
+
+    def apply_pk_order(self, qs):
+        """ Orders `qs` by primary key after its own ordering, if any, so
+        that its slices don't repeat or skip rows. Should get overridden in
+        backend-specific view.
+        """
+        return qs
+
+    def get_autocomplete_list(self, search_query=None, offset=0, limit=None):
+        qs = self.get_queryset()
+        if search_query and search_query.split():
+            # Nothing can match what there are no fields to search in
+            if not self.search_fields:
+                return []
+            qs = self.apply_search(qs, search_query)
+        qs = self.apply_pk_order(qs)
+        limit = limit or self.autocomplete_limit
+        return qs[offset:offset + limit]
+
     def dispatch_save_redirect(self, instance):
         if '_edit' in request.form:
             return redirect(
@@ -242,7 +1326,7 @@ class BaseModelAdmin(BaseView):
         Form = self.get_add_form()
         if request.method == 'POST':
             form = Form()
-            if form.validate_on_submit():
+            if form.validate_on_submit() and self.validate_unique(form):
                 try:
                     instance = self.save_model(self.model(), form, adding=True)
                     flash(gettext('New %(model)s saved successfully',
@@ -269,7 +1353,51 @@ class BaseModelAdmin(BaseView):
     def page(self):
         return request.args.get('page', 0, type=int)
 
+    @property
+    def cursor(self):
+        return pagination.decode_cursor(request.args.get('cursor'))
+
+    def get_keyset(self, instance, sort):
+        """ Returns the values keyset pagination seeks on for `instance`,
+        i.e. ``[sort value, pk]``, or ``[pk]`` when the list is not sorted.
+        """
+        values = [self.get_pk(instance)]
+        if sort:
+            value = instance
+            for name in sort.split('.'):
+                if value is not None:
+                    value = getattr(value, name)
+            values.insert(0, value)
+        return values
+
+    def paginate_keyset(self, data, sort, cursor):
+        """ Trims the ``list_per_page + 1`` rows fetched by `get_list` in
+        keyset mode and builds the cursors of the neighbouring pages.
+        """
+        rows = list(data)
+        has_more = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+
+        direction = cursor[0] if cursor else pagination.NEXT
+        if direction == pagination.PREV:
+            rows.reverse()
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = cursor is not None, has_more
+
+        prev_cursor = next_cursor = None
+        if rows:
+            if has_prev:
+                prev_cursor = pagination.encode_cursor(
+                    pagination.PREV, self.get_keyset(rows[0], sort))
+            if has_next:
+                next_cursor = pagination.encode_cursor(
+                    pagination.NEXT, self.get_keyset(rows[-1], sort))
+        return rows, prev_cursor, next_cursor
+
     def total_pages(self, count):
+        if count is None:
+            return None
         return int(math.ceil(float(count) / self.list_per_page))
 
     @property
@@ -280,27 +1408,67 @@ class BaseModelAdmin(BaseView):
             sort = sort[1:]
         else:
             desc = False
+        if sort and not self.is_sortable(sort):
+            return None, False
         return sort, desc
 
     @property
     def search(self):
         return request.args.get('q', None)
 
-    def page_url(self, page):
+    @property
+    def filters(self):
+        """ The active filters from the URL, as (index, value) tuples in the
+        order they were added. Unknown filters and invalid values are
+        ignored.
+        """
+        all_filters = self.get_filters()
+        if not all_filters:
+            return []
+
+        active = []
+        for arg, value in request.args.iteritems(multi=True):
+            match = FILTER_ARG_RE.match(arg)
+            if match is None:
+                continue
+            position, index = int(match.group(1)), int(match.group(2))
+            if index < len(all_filters) and \
+                    all_filters[index].validate(value):
+                active.append((position, index, value))
+        return [(index, value) for position, index, value in sorted(active)]
+
+    def page_url(self, page=None, cursor=None):
         search_query = self.search
         sort, desc = self.sort
         if sort and desc:
             sort = '-' + sort
         if page == 0:
             page = None
-        return url_for(self.get_url_name('index'), page=page, sort=sort,
-                       q=search_query)
+        return url_for(self.get_url_name('index'), page=page, cursor=cursor,
+                       sort=sort, q=search_query, **self.get_filter_args())
+
+    def filter_url(self, filters):
+        """ Returns the URL of the first page of the list with `filters`.
+        """
+        sort, desc = self.sort
+        if sort and desc:
+            sort = '-' + sort
+        return url_for(self.get_url_name('index'), sort=sort, q=self.search,
+                       **self.get_filter_args(filters))
 
     def sort_url(self, sort, desc=None):
         if sort and desc:
             sort = '-' + sort
         search_query = self.search
-        return url_for(self.get_url_name('index'), sort=sort, q=search_query)
+        return url_for(self.get_url_name('index'), sort=sort, q=search_query,
+                       **self.get_filter_args())
+
+    def export_url(self, format):
+        sort, desc = self.sort
+        if sort and desc:
+            sort = '-' + sort
+        return url_for(self.get_url_name('export'), format=format, sort=sort,
+                       q=self.search, **self.get_filter_args())
 
     @expose('/', methods=('GET', 'POST',))
     def list(self):
@@ -309,21 +1477,94 @@ class BaseModelAdmin(BaseView):
         """
         # Grab parameters from URL
         if request.method == 'POST':
-            id_list = request.form.getlist('_selected_action')
-            if id_list and (request.form.get('action-delete') or
-                            request.form.get('action', None) == 'delete'):
-                return self.delete(*id_list)
+            response = self.dispatch_action()
+            if response is not None:
+                return response
 
         sort, sort_desc = self.sort
         page = self.page
         search_query = self.search
-        count, data = self.get_list(page=page, sort=sort, sort_desc=sort_desc,
-                                    search_query=search_query)
+        filters = self.filters
+        prev_cursor = next_cursor = None
+        total_pages = None
+
+        params = {}
+        if filters:
+            params['filters'] = filters
 
+        if self.keyset_pagination:
+            page = None
+            cursor = self.cursor
+            # A cursor is only valid for the sort it was generated with
+            if cursor and len(cursor[1]) != (2 if sort else 1):
+                cursor = None
+            count, data = self.get_cached_list(page=page, sort=sort,
+                                               sort_desc=sort_desc,
+                                               search_query=search_query,
+                                               cursor=cursor, **params)
+            data, prev_cursor, next_cursor = self.paginate_keyset(data, sort,
+                                                                  cursor)
+        else:
+            count, data = self.get_cached_list(page=page, sort=sort,
+                                               sort_desc=sort_desc,
+                                               search_query=search_query,
+                                               **params)
+            if count is None:
+                # Uncounted list: only offer the pages we know exist
+                data = list(data)
+                has_next = len(data) > self.list_per_page
+                data = data[:self.list_per_page]
+                total_pages = page + (2 if has_next else 1)
+            else:
+                total_pages = self.total_pages(count)
+
+        filter_groups, filter_options, filter_types = self.get_filter_groups()
+        facets = self.get_facets(search_query, filters, count)
+        date_hierarchy = self.get_date_hierarchy(search_query, filters, count)
         return self.render(self.list_template, data=data, page=page,
-                           total_pages=self.total_pages(count), sort=sort,
+                           total_pages=total_pages, sort=sort,
                            sort_desc=sort_desc, count=count, modeladmin=self,
-                           search_query=search_query)
+                           search_query=search_query,
+                           count_approximate=self.get_count_strategy().approximate,
+                           keyset=self.keyset_pagination,
+                           prev_cursor=prev_cursor, next_cursor=next_cursor,
+                           active_filters=filters,
+                           filter_groups=filter_groups,
+                           filter_options=filter_options,
+                           filter_types=filter_types, facets=facets,
+                           date_hierarchy=date_hierarchy)
+
+    @expose('/export/')
+    def export(self):
+        format = request.args.get('format', 'csv')
+        if format not in self.export_formats:
+            abort(404)
+        serializer, mimetype, extension = EXPORT_FORMATS[format]
+
+        sort, sort_desc = self.sort
+        rows = self.get_export_list(sort=sort, sort_desc=sort_desc,
+                                    search_query=self.search,
+                                    filters=self.filters)
+        body = serializer(self, self.get_export_columns(), rows)
+
+        filename = '%s.%s' % (self.endpoint, extension)
+        return Response(stream_with_context(body), mimetype=mimetype,
+                        headers={'Content-Disposition':
+                                 'attachment; filename=%s' % filename})
+
+    @expose('/autocomplete/')
+    def autocomplete(self):
+        search_query = request.args.get('q', None)
+        page = max(request.args.get('page', 0, type=int), 0)
+        limit = request.args.get('limit', self.autocomplete_limit, type=int)
+        limit = min(max(limit, 1), self.autocomplete_limit)
+
+        # One extra object tells whether there are more results
+        objects = list(self.get_autocomplete_list(search_query, page * limit,
+                                                  limit + 1))
+        results = [{'id': unicode(self.get_pk(obj)), 'text': unicode(obj)}
+                   for obj in objects[:limit]]
+        return jsonify(results=results, more=len(objects) > limit)
 
     @expose('/<pk>/', methods=('GET', 'POST'))
     def edit(self, pk):
@@ -336,7 +1577,8 @@ class BaseModelAdmin(BaseView):
 
         if request.method == 'POST':
             form = Form(obj=instance)
-            if form.validate_on_submit():
+            if form.validate_on_submit() and \
+                    self.validate_unique(form, instance):
                 try:
                     self.save_model(instance, form, adding=False)
                     flash(
@@ -354,14 +1596,59 @@ class BaseModelAdmin(BaseView):
         return self.render(self.edit_template, model=self.model, form=form,
                            pk=self.get_pk(instance), instance=instance)
 
+    def dispatch_action(self):
+        """ Runs the action posted from the list view on the selected rows,
+        or on every row matching the search and filters when
+        `select_across` is set. Returns ``None`` when there is nothing to do.
+        """
+        name = request.form.get('action')
+        if request.form.get('action-delete'):
+            name = 'delete'
+        search_query = self.search
+        filters = self.filters
+        # Acting on the whole table is only offered through a search or
+        # filters
+        if request.form.get('select_across') and \
+                self.is_narrowed(search_query, filters):
+            pks = None
+        else:
+            pks = request.form.getlist('_selected_action')
+            if not pks:
+                return None
+
+        if name == 'delete':
+            if pks is None:
+                return redirect(url_for(self.get_url_name('delete_matching'),
+                                        q=search_query,
+                                        **self.get_filter_args(filters)))
+            return self.delete_selected(pks)
+
+        update_action = self.get_update_action(name)
+        if update_action is not None:
+            return self.mass_update(update_action, pks)
+
+        if name not in self._actions:
+            return None
+        if not self.is_action_allowed(name):
+            abort(403)
+        label, method, permission = self._actions[name]
+        response = method(self.get_action_queryset(pks, search_query,
+                                                   filters))
+        self.invalidate_list_cache()
+        if response is None:
+            response = redirect(url_for(self.get_url_name('index'),
+                                        q=search_query,
+                                        **self.get_filter_args(filters)))
+        return response
+
     @expose('/<pk>/delete/', methods=('GET', 'POST'))
-    def delete(self, pk=None, *pks):
+    def delete(self, pk):
+        return self.delete_selected([pk])
+
+    def delete_selected(self, pks):
         if not self.can_delete:
             abort(403)
 
-        if pk:
-            pks += pk,
-
         if request.method == 'POST' and 'confirm_delete' in request.form:
             count = len(pks)
             self.delete_models(*pks)
@@ -376,6 +1663,74 @@ class BaseModelAdmin(BaseView):
 
         return self.render(self.delete_template, instances=instances)
 
+    def mass_update(self, action, pks):
+        """ Runs the update `action` on the rows `pks`, or on every row
+        matching the search and filters if ``None``, after asking for the
+        values of its fields.
+        """
+        if not self.can_edit:
+            abort(403)
+
+        form = None
+        if action.fields:
+            # Prefixed, so model fields can't clash with the list's inputs
+            form = self.get_update_form(action)(prefix='update')
+
+        confirmed = 'confirm_update' in request.form
+        if form is None:
+            # Like deleting them, every matching row is only updated once
+            # confirmed
+            ready = pks is not None or confirmed
+        else:
+            ready = confirmed and form.validate_on_submit()
+
+        if ready:
+            values = dict(action.values)
+            if form is not None:
+                values.update((name, form[name].data)
+                              for name in action.fields)
+            if pks is None:
+                count = self.update_matching_models(values, self.search,
+                                                    self.filters)
+            else:
+                count = self.update_models(values, *pks)
+
+            flash(gettext('Successfully updated %(count)s %(model)ss',
+                          count=count, model=self.get_display_name()),
+                  'success')
+            return redirect(url_for(self.get_url_name('index')))
+
+        count = None
+        if pks is None:
+            count = self.get_action_queryset(None, self.search,
+                                             self.filters).count()
+        return self.render(self.update_template, action=action, form=form,
+                           pks=pks, count=count, search_query=self.search)
+
+    @expose('/delete/', methods=('GET', 'POST'))
+    def delete_matching(self):
+        if not self.can_delete:
+            abort(403)
+
+        # Only offered for searches and filters, never for the whole table
+        search_query = self.search
+        filters = self.filters
+        if not self.is_narrowed(search_query, filters):
+            return redirect(url_for(self.get_url_name('index')))
+
+        if request.method == 'POST' and 'confirm_delete' in request.form:
+            count = self.delete_matching_models(search_query, filters)
+
+            flash(
+                'Successfully deleted %s %ss' % (count, self.get_display_name()),
+                'success'
+            )
+            return redirect(url_for(self.get_url_name('index')))
+
+        count = self.get_action_queryset(None, search_query, filters).count()
+        return self.render(self.delete_template, instances=None, count=count,
+                           search_query=search_query)
+
 
 class ModelAdmin(BaseModelAdmin):
     pass
@@ -0,0 +1,153 @@
+"""
+Stores for the list result cache.
+
+When `BaseModelAdmin.list_cache` is set, the list view remembers the count
+and the primary keys of every page it renders, keyed on the page, sort,
+search and `BaseModelAdmin.get_list_cache_scope`. Asking for the same page
+again loads its rows by primary key instead of counting and running the
+page query.
+
+Every model has a version counter in the store, and the key of a page
+includes the versions of the listed model and of the models it references.
+`save_model` and `delete_models` bump the version of their model, so the
+pages showing it are never read again and expire on their own::
+
+    from flask_superadmin.model.cache import LRUCache, RedisCache
+
+    class BookAdmin(ModelAdmin):
+        list_cache = LRUCache(max_entries=500)
+
+    # shared between processes
+    class AuthorAdmin(ModelAdmin):
+        list_cache = RedisCache(redis.StrictRedis())
+"""
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+def model_key(model):
+    """
+        Key of the version counter of `model`.
+    """
+    return 'version:%s.%s' % (model.__module__, model.__name__)
+
+
+class BaseCache(object):
+    """
+        Base store.
+    """
+    def get(self, key):
+        """
+            Return the value of `key`, or ``None`` if missing or expired.
+        """
+        raise NotImplementedError()
+
+    def set(self, key, value, timeout=None):
+        """
+            Store `value` under `key` for `timeout` seconds.
+        """
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+    def get_counters(self, keys):
+        """
+            Return the values of the counters `keys`, 0 for missing ones.
+        """
+        raise NotImplementedError()
+
+    def incr(self, key):
+        """
+            Increment the counter `key`. Counters don't expire.
+        """
+        raise NotImplementedError()
+
+
+class LRUCache(BaseCache):
+    """
+        In-process store keeping the `max_entries` most recently used values
+        for `timeout` seconds by default.
+    """
+    def __init__(self, max_entries=1000, timeout=60):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= time.time():
+                return None
+            # Most recently used entries go last
+            self._entries[key] = entry
+            return entry[1]
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + (timeout or self.timeout)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_counters(self, keys):
+        return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(BaseCache):
+    """
+        Store backed by a Redis client, or anything with the same `get`,
+        `set` (with ``ex``), `delete`, `mget` and `incr` methods. Values are
+        pickled.
+
+        `prefix`
+            Prepended to every key, to share a Redis database
+    """
+    def __init__(self, client, prefix='superadmin:', timeout=60):
+        self.client = client
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key,
+                        pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        ex=int(timeout or self.timeout))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def get_counters(self, keys):
+        if not keys:
+            return []
+        values = self.client.mget([self.prefix + key for key in keys])
+        return [int(value or 0) for value in values]
+
+    def incr(self, key):
+        self.client.incr(self.prefix + key)
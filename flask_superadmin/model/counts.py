@@ -0,0 +1,125 @@
+"""
+Count strategies for the list view.
+
+Counting the rows matching the current search can cost more than fetching
+the page itself, so the way `BaseModelAdmin` counts is pluggable through its
+`count_strategy` attribute.
+"""
+import time
+
+
+class BaseCountStrategy(object):
+    """
+        Base count strategy.
+    """
+    # The returned count is only an estimate
+    approximate = False
+
+    # No count is returned, `get_list` fetches one extra row instead to find
+    # out whether there is a next page
+    lookahead = False
+
+    def count(self, view, qs, search_query, filters):
+        """
+            Return the number of rows of `qs`, or ``None`` if unknown.
+
+            `view`
+                Model admin the list belongs to
+            `qs`
+                Filtered backend queryset, before ordering and pagination
+            `search_query`
+                Current search query, ``None`` without one
+            `filters`
+                Active (index, value) filters, empty without any
+        """
+        raise NotImplementedError()
+
+    def invalidate(self):
+        """
+            Forget what is remembered about the counts, called when rows
+            are saved or deleted through the admin.
+        """
+        pass
+
+
+class ExactCount(BaseCountStrategy):
+    """
+        Run ``count()`` on every request.
+    """
+    def count(self, view, qs, search_query, filters):
+        return qs.count()
+
+
+class CachedCount(BaseCountStrategy):
+    """
+        Remember exact counts for `timeout` seconds, per view, list cache
+        scope (see `BaseModelAdmin.get_list_cache_scope`), search and
+        filters. Saving or deleting rows through the admin forgets them.
+    """
+    def __init__(self, timeout=60, max_entries=1000):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._cache = {}
+
+    def count(self, view, qs, search_query, filters):
+        key = (view.endpoint, view.get_list_cache_scope(), search_query,
+               tuple(filters))
+        now = time.time()
+
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        value = qs.count()
+        if len(self._cache) >= self.max_entries:
+            self._prune(now)
+        self._cache[key] = (now + self.timeout, value)
+        return value
+
+    def _prune(self, now):
+        for key, (expires, value) in self._cache.items():
+            if expires <= now:
+                del self._cache[key]
+        if len(self._cache) >= self.max_entries:
+            self._cache.clear()
+
+    def invalidate(self):
+        """
+            Forget all cached counts.
+        """
+        self._cache.clear()
+
+
+class EstimatedCount(BaseCountStrategy):
+    """
+        Use the database's own row estimate (see
+        `BaseModelAdmin.estimate_count`) for unfiltered lists and fall back
+        to an exact count when searching, filtering or when there is no
+        estimate.
+    """
+    approximate = True
+
+    def count(self, view, qs, search_query, filters):
+        if not search_query and not filters:
+            estimate = view.estimate_count()
+            if estimate is not None:
+                return estimate
+        return qs.count()
+
+
+class NoCount(BaseCountStrategy):
+    """
+        Skip counting altogether and only tell whether there is a next page.
+    """
+    lookahead = True
+
+    def count(self, view, qs, search_query, filters):
+        return None
+
+
+COUNT_STRATEGIES = {
+    'exact': ExactCount,
+    'cached': CachedCount,
+    'estimate': EstimatedCount,
+    'none': NoCount,
+}
@@ -0,0 +1,97 @@
+"""
+Serializers for the `export` view of `BaseModelAdmin`.
+
+Each serializer takes the view, the exported column names and an iterator
+over the rows. Values are read with the view's column accessors and the
+response body is yielded in chunks, so rows are written out as they come
+from the database and never all held in memory.
+"""
+import csv
+import datetime
+import decimal
+import json
+
+
+# Number of rows written per chunk of the response
+CHUNK_SIZE = 100
+
+
+def _format_value(value):
+    if value is None:
+        return u''
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, basestring):
+        return value
+    return unicode(value)
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, long, float)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return _format_value(value)
+
+
+def _iter_values(view, columns, rows):
+    accessors = [view.get_column_accessor(c) for c in columns] or [unicode]
+    for instance in rows:
+        yield [accessor(instance) for accessor in accessors]
+
+
+def _chunked_lines(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+class _LineBuffer(object):
+    # csv writers write each row with a single call, keep it to yield it
+    def write(self, line):
+        self.line = line
+
+
+def export_csv(view, columns, rows):
+    """
+        CSV with a header row, encoded in UTF-8.
+    """
+    buf = _LineBuffer()
+    writer = csv.writer(buf)
+
+    def lines():
+        header = [view.field_name(c) for c in columns] or \
+            [view.get_display_name()]
+        writer.writerow([unicode(h).encode('utf-8') for h in header])
+        yield buf.line
+        for values in _iter_values(view, columns, rows):
+            writer.writerow([_format_value(v).encode('utf-8')
+                             for v in values])
+            yield buf.line
+
+    return _chunked_lines(lines())
+
+
+def export_json(view, columns, rows):
+    """
+        JSON lines: one object per row, keyed by column name.
+    """
+    keys = list(columns) or ['name']
+
+    def lines():
+        for values in _iter_values(view, columns, rows):
+            data = dict(zip(keys, [_json_value(v) for v in values]))
+            yield json.dumps(data) + '\n'
+
+    return _chunked_lines(lines())
+
+
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv', 'csv'),
+    'json': (export_json, 'application/x-ndjson', 'jsonl'),
+}
@@ -0,0 +1,214 @@
+"""
+Filters of the list view.
+
+`BaseModelAdmin.list_filters` names the fields the list can be filtered by.
+Backends turn every field into filters, one per operation (equals, greater
+than...), with the `BaseFilterConverter` of their `filter_converter`.
+Instances of `BaseFilter` can be listed as well::
+
+    class ArticleAdmin(ModelAdmin):
+        list_filters = ('published', 'created', MyFilter('Author'))
+
+The active filters are part of the URL: ``flt<position>_<index>=<value>``,
+where `index` is the position of the filter in
+`BaseModelAdmin.get_filters`. They're applied by the database before
+counting and paging, so filtering indexed fields narrows large lists
+cheaply.
+
+The date hierarchy of the list (`BaseModelAdmin.date_hierarchy`) is a
+`BaseDateRangeFilter` on its field, added after the others.
+"""
+import datetime
+
+from flask_superadmin.babel import gettext
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_datetime(value):
+    for format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, format)
+        except ValueError:
+            pass
+    raise ValueError('Invalid date and time %r' % value)
+
+
+def parse_period(value):
+    """
+        Return the (year, month, day) parts of 'YYYY', 'YYYY-MM' or
+        'YYYY-MM-DD'.
+    """
+    parts = tuple(int(part) for part in value.split('-'))
+    if not 1 <= len(parts) <= 3:
+        raise ValueError('Invalid period %r' % value)
+    # Check the month and day
+    datetime.date(*(parts + (1, 1))[:3])
+    return parts
+
+
+def format_period(parts):
+    """
+        Return the (year, month, day) `parts` as 'YYYY-MM-DD'.
+    """
+    return '-'.join(['%04d' % parts[0]] + ['%02d' % part
+                                           for part in parts[1:]])
+
+
+def get_period_range(parts):
+    """
+        Return the first day of the period `parts` and the first day after
+        it.
+    """
+    if len(parts) == 1:
+        return (datetime.date(parts[0], 1, 1),
+                datetime.date(parts[0] + 1, 1, 1))
+    if len(parts) == 2:
+        year, month = parts
+        start = datetime.date(year, month, 1)
+        if month == 12:
+            return start, datetime.date(year + 1, 1, 1)
+        return start, datetime.date(year, month + 1, 1)
+    start = datetime.date(*parts)
+    return start, start + datetime.timedelta(days=1)
+
+
+class BaseFilter(object):
+    """
+        Base filter.
+    """
+    def __init__(self, name, options=None, data_type=None, coerce=None):
+        """
+            Constructor.
+
+            `name`
+                Displayed name
+            `options`
+                Fixed set of (value, label) options
+            `data_type`
+                Client data type, e.g. 'datepicker'
+            `coerce`
+                Converts the value from the URL, values it can't convert
+                are ignored
+        """
+        self.name = name
+        self.options = options
+        self.data_type = data_type
+        self.coerce = coerce
+
+    def get_options(self, view):
+        """
+            Return the list of (value, label) options, or ``None`` for free
+            input.
+        """
+        return self.options
+
+    def validate(self, value):
+        """
+            Tell whether `value` from the URL can be used.
+        """
+        try:
+            self.clean(value)
+        except (TypeError, ValueError, ArithmeticError):
+            return False
+        return True
+
+    def clean(self, value):
+        """
+            Convert `value` from the URL to the value to filter by.
+        """
+        if self.coerce is not None:
+            return self.coerce(value)
+        return value
+
+    def apply(self, query, value):
+        """
+            Return `query` filtered by the cleaned `value`.
+        """
+        raise NotImplementedError()
+
+    def operation(self):
+        """
+            Return the displayed name of the operation, e.g. 'equals'.
+        """
+        raise NotImplementedError()
+
+    def __unicode__(self):
+        return self.name
+
+
+class BaseBooleanFilter(BaseFilter):
+    """
+        Filter with a yes/no choice.
+    """
+    def __init__(self, name, data_type=None):
+        super(BaseBooleanFilter, self).__init__(name,
+                                                (('1', gettext('Yes')),
+                                                 ('0', gettext('No'))),
+                                                data_type)
+
+    def validate(self, value):
+        return value in ('0', '1')
+
+    def clean(self, value):
+        return value == '1'
+
+
+class BaseDateRangeFilter(BaseFilter):
+    """
+        Filter by a year, month or day ('YYYY', 'YYYY-MM' or 'YYYY-MM-DD').
+        The value is cleaned into the half-open range ``[start, end)``,
+        which backends compare the field with directly so that an index on
+        it is used.
+    """
+    def __init__(self, name, datetimes=False):
+        """
+            Constructor.
+
+            `name`
+                Displayed name
+            `datetimes`
+                Whether the range is made of datetimes instead of dates
+        """
+        super(BaseDateRangeFilter, self).__init__(name)
+
+        self.datetimes = datetimes
+
+    def clean(self, value):
+        start, end = get_period_range(parse_period(value))
+        if self.datetimes:
+            start = datetime.datetime.combine(start, datetime.time())
+            end = datetime.datetime.combine(end, datetime.time())
+        return start, end
+
+    def operation(self):
+        return gettext('in period')
+
+
+def convert(*args):
+    """
+        Registers the decorated converter method for the field types `args`.
+    """
+    def _inner(func):
+        func._converter_for = args
+        return func
+
+    return _inner
+
+
+class BaseFilterConverter(object):
+    """
+        Turns model fields into filters. Methods decorated with `convert`
+        return the filters of the field types they're registered for.
+    """
+    def __init__(self):
+        self.converters = dict()
+
+        for p in dir(self):
+            attr = getattr(self, p)
+
+            if hasattr(attr, '_converter_for'):
+                for p in attr._converter_for:
+                    self.converters[p] = attr
@@ -0,0 +1,93 @@
+"""
+Helpers for keyset (seek) pagination.
+
+A keyset cursor remembers the sort value and the primary key of the row at
+the edge of the current page, plus the direction to move in. Backends use it
+to filter on ``(sort column, pk)`` instead of skipping rows with an offset.
+"""
+import base64
+import datetime
+import decimal
+import json
+
+
+NEXT = 'n'
+PREV = 'p'
+
+
+def _dump_value(value):
+    if value is None or isinstance(value, (bool, int, long, float)):
+        return value
+    if isinstance(value, datetime.datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'d': value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {'dec': str(value)}
+    if isinstance(value, basestring):
+        return value
+    return unicode(value)
+
+
+def _parse_datetime(value):
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError('Invalid datetime in cursor: %r' % value)
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return _parse_datetime(value['dt'])
+        if 'd' in value:
+            return datetime.datetime.strptime(value['d'], '%Y-%m-%d').date()
+        if 'dec' in value:
+            return decimal.Decimal(value['dec'])
+        raise ValueError('Unknown cursor value %r' % value)
+    return value
+
+
+def encode_cursor(direction, values):
+    """
+        Encode a cursor into an URL-safe string.
+
+        `direction`
+            Either ``NEXT`` or ``PREV``
+        `values`
+            The keyset of the edge row, i.e. ``[sort value, pk]``
+    """
+    data = {'d': direction, 'k': [_dump_value(v) for v in values]}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')))
+
+
+def decode_cursor(token):
+    """
+        Decode a cursor produced by `encode_cursor`. Returns a
+        ``(direction, values)`` tuple or ``None`` when the token is missing
+        or malformed.
+    """
+    if not token:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(str(token)))
+        direction = data['d']
+        values = [_load_value(v) for v in data['k']]
+    except (TypeError, ValueError, KeyError):
+        return None
+    if direction not in (NEXT, PREV):
+        return None
+    return direction, values
+
+
+def is_ascending(sort_desc, direction):
+    """
+        Whether rows should be fetched in ascending order when moving in
+        `direction` over a list sorted with `sort_desc`.
+    """
+    ascending = not sort_desc
+    if direction == PREV:
+        ascending = not ascending
+    return ascending
@@ -0,0 +1,83 @@
+"""
+Search engines for the list view.
+
+How `BaseModelAdmin.search_fields` are searched is pluggable through its
+`search_engine` attribute. The default engine matches substrings of every
+field, which works everywhere but can't use an index. Backends offer
+engines built on the database's full-text indexes in `search_engines`.
+
+Full-text engines understand two operators in front of a search word:
+
+``^word``
+    Words starting with ``word``
+``=word``
+    Fields equal to ``word``
+
+Words without an operator are matched as full words.
+"""
+import re
+from collections import namedtuple
+
+
+OPERATORS = ('^', '=')
+
+_split_words_re = re.compile(r'\w+', re.UNICODE)
+
+
+# A word of the search query and the operator in front of it, if any
+SearchTerm = namedtuple('SearchTerm', ('op', 'word'))
+
+
+def parse_search_query(search_query):
+    """
+        Split a search query into `SearchTerm` tuples.
+    """
+    terms = []
+    for word in search_query.split():
+        op = word[:1]
+        if op in OPERATORS:
+            word = word[1:]
+        else:
+            op = ''
+        if word:
+            terms.append(SearchTerm(op, word))
+    return terms
+
+
+def split_words(text):
+    """
+        Return the alphanumeric words of `text`, so user input can be put in
+        full-text query syntax without escaping.
+    """
+    return _split_words_re.findall(text)
+
+
+class BaseSearchEngine(object):
+    """
+        Base search engine.
+    """
+    def apply(self, view, qs, search_query):
+        """
+            Return `qs` filtered by `search_query`.
+
+            `view`
+                Model admin being searched
+            `qs`
+                Backend queryset, before ordering and pagination
+            `search_query`
+                Search query typed by the user
+
+            Searches that aren't blank but have no word the engine can use
+            have to match no rows rather than all of them, since the view
+            treats them as narrowing the list.
+        """
+        raise NotImplementedError()
+
+
+class DefaultSearch(BaseSearchEngine):
+    """
+        Substring matching of every search field, through the view's
+        `apply_default_search`.
+    """
+    def apply(self, view, qs, search_query):
+        return view.apply_default_search(qs, search_query)
@@ -102,13 +102,16 @@ var AdminFilters = function(element, filters_element, adminForm, operations, opt
     all_checkboxes = $( ':checkbox[name="_selected_action"]' ).not(checker);
     actions = $('.actions').change(function() {this.form.submit();});
     actions = actions.chosen().data('chosen').container.addClass(actions.attr('class'));
+    select_across = $( ':checkbox[name="select_across"]' ).change(function() {
+        all_checkboxes.first().change();
+    });
     all_checkboxes.change(function(e) {
         _this = $(this);
         checked = $.grep(all_checkboxes, function (a) { return $(a).is( ':checked' ); });
         all_selected = checked.length === all_checkboxes.length;
         opacity = (all_selected || checked.length === 0) ? 1 : 0.5;
         checker.attr('checked',checked.length > 0).css('opacity', opacity);
-        actions.toggleClass('hidden', checked.length === 0);
+        actions.toggleClass('hidden', checked.length === 0 && !select_across.is(':checked'));
         // $('.action_delete').stop().animate({'opacity':checked.length>0?1:0},200)
         if (_this.is(':checked')) _this.parent().parent().addClass('checked');
         else _this.parent().parent().removeClass('checked');
@@ -13,10 +13,54 @@ var AdminForm = function() {
             case 'datetimepicker':
                 $(el).datepicker({displayTime: true});
                 break;
+            case 'autocomplete':
+                autocomplete(el);
+                break;
         }
     };
 };
 
+// Chosen select that fetches its options from the server as the user types
+function autocomplete(el) {
+    var $select = $(el);
+    var url = $select.data('url');
+    var timer = null;
+    var last = null;
+
+    $select.chosen({allow_single_deselect: !!$select.data('allow-blank')});
+
+    if (!url) {
+        return;
+    }
+
+    var $input = $select.next('.chzn-container').find('input');
+
+    $input.on('keyup', function() {
+        var term = $.trim($input.val());
+        if (term === last) {
+            return;
+        }
+
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            last = term;
+            $.getJSON(url, {q: term}, function(data) {
+                // Keep the selected options, replace everything else
+                $select.find('option').not(':selected').not('[value=__None]').remove();
+                $.each(data.results, function(i, item) {
+                    if (!$select.find('option[value="' + item.id + '"]').length) {
+                        $('<option />').attr('value', item.id).text(item.text).appendTo($select);
+                    }
+                });
+                $select.trigger('liszt:updated');
+
+                // Chosen resets the search box when updating
+                $input.val(term).trigger('keyup');
+            });
+        }, 250);
+    });
+}
+
 $(document).on('click', '.append', function(e) {
     e.preventDefault();
     _this = $(this);
@@ -55,10 +99,21 @@ $(document).on('click', 'legend > .delete',function() {
     $(this).parent().parent().remove();  
 });
 
+// List URL searching `q`, keeping the active filters
+function searchUrl(q) {
+    var params = $.grep(window.location.search.substr(1).split('&'), function(param) {
+        return /^flt\d+_\d+=/.test(param);
+    });
+    if (q) {
+        params.unshift('q=' + encodeURIComponent(q));
+    }
+    return window.location.pathname + (params.length ? '?' + params.join('&') : '');
+}
+
 $('.search-input').keydown(function(ev) {
     if (ev.keyCode === 13) {
         ev.preventDefault();
-        window.location.href = window.location.pathname + '?q=' + encodeURIComponent($(this).val());
+        window.location.href = searchUrl($(this).val());
     }
 });
 
@@ -73,7 +128,7 @@ $('.search-input').on('input', function() {
 $('.search .clear-btn').click(function() {
     $('.search .search-input').val('').focus();
     $(this).hide();
-    window.location.href = window.location.pathname;
+    window.location.href = searchUrl('');
 });
 
 // Apply automatic styles
@@ -82,6 +137,9 @@ function auto_apply(el) {
     el.find('[data-role=chosenblank]:visible').chosen({allow_single_deselect: true});
     el.find('[data-role=datepicker]:visible').datepicker();
     el.find('[data-role=datetimepicker]:visible').datepicker({displayTime: true});
+    el.find('[data-role=autocomplete]:visible').each(function() {
+        autocomplete(this);
+    });
 }
 
 auto_apply($(document));
@@ -1,3 +1,7 @@
+import datetime
+import json
+import re
+
 from nose.tools import eq_, ok_, raises
 
 import wtforms
@@ -25,7 +29,8 @@ app.config['WTF_CSRF_ENABLED'] = False
 admin = Admin(app)
 
 from flask_superadmin.model.backends.django.view import ModelAdmin
-from django.db import models, DatabaseError
+from django.db import connection, models, DatabaseError
+from django.test.utils import CaptureQueriesContext
 from examples.django.utils import install_models
 
 
@@ -38,6 +43,17 @@ class CustomModelView(ModelAdmin):
         super(CustomModelView, self).__init__(model, name, category, endpoint,
                                               url)
 
+def install(*all_models):
+    # Create tables in the database if they don't exists
+    try:
+        install_models(*all_models)
+    except DatabaseError, e:
+        if 'already exists' not in e.message:
+            raise
+    for model in all_models:
+        model.objects.all().delete()
+
+
 def test_list():
     class Person(models.Model):
         name = models.CharField(max_length=255)
@@ -108,3 +124,337 @@ def test_list():
     eq_(resp.status_code, 302)
     eq_(Person.objects.count(), 0)
 
+
+
+def test_autocomplete():
+    class Author(models.Model):
+        name = models.CharField(max_length=255)
+
+        def __unicode__(self):
+            return self.name
+
+    install(Author)
+    for name in ('Anna', 'Alice', 'Bob'):
+        Author.objects.create(name=name)
+
+    view = CustomModelView(Author, autocomplete_limit=2)
+    admin.add_view(view)
+    client = app.test_client()
+
+    def autocomplete(url):
+        resp = client.get(url)
+        eq_(resp.status_code, 200)
+        data = json.loads(resp.data)
+        return [r['text'] for r in data['results']], data['more']
+
+    # Without search fields nothing matches a query
+    eq_(autocomplete('/admin/author/autocomplete/?q=A'), ([], False))
+    eq_(autocomplete('/admin/author/autocomplete/'),
+        (['Anna', 'Alice'], True))
+    eq_(autocomplete('/admin/author/autocomplete/?page=1'), (['Bob'], False))
+
+    # Pages are sliced from rows in primary key order
+    ok_('ORDER BY' in str(view.get_autocomplete_list().query))
+
+    view.search_fields = ('name',)
+    eq_(autocomplete('/admin/author/autocomplete/?q=Al'), (['Alice'], False))
+    eq_(autocomplete('/admin/author/autocomplete/?q='),
+        (['Anna', 'Alice'], True))
+
+
+def test_list_filters():
+    from flask_superadmin.model.backends.django.filters import FilterEqual
+
+    class Order(models.Model):
+        customer = models.CharField(max_length=20, db_index=True)
+        total = models.IntegerField()
+        paid = models.BooleanField(default=False)
+        created = models.DateField()
+
+    install(Order)
+    for i in range(10):
+        Order.objects.create(customer='cust%d' % (i % 3), total=i * 10,
+                             paid=i % 2 == 0,
+                             created=datetime.date(2013, 1, i + 1))
+
+    view = CustomModelView(Order, list_display=('customer',),
+                           search_fields=('customer',),
+                           list_filters=('customer', 'total', 'paid',
+                                         'created',
+                                         FilterEqual('id', 'Number')))
+    admin.add_view(view)
+    client = app.test_client()
+
+    names = [(unicode(f.name), unicode(f.operation()))
+             for f in view.get_filters()]
+    eq_(names[:4], [('Customer', 'equals'), ('Customer', 'not equal'),
+                    ('Customer', 'contains'), ('Customer', 'not contains')])
+    eq_(names[8:10], [('Paid', 'equals'), ('Paid', 'not equal')])
+    eq_(names[-1], ('Number', 'equals'))
+
+    # Applied by the database, to the count too
+    with CaptureQueriesContext(connection) as queries:
+        rv = client.get('/admin/order/?flt0_0=cust1&flt1_8=0')
+    eq_(rv.status_code, 200)
+    ok_('Total count: 2' in rv.data)
+    eq_(len([q for q in queries if 'COUNT(' in q['sql'] and
+             '"customer" = ' in q['sql']]), 1)
+
+    eq_(view.get_list(filters=[(7, '20')], execute=True)[0], 2)
+    eq_(view.get_list(filters=[(13, '2013-01-05')], execute=True)[0], 4)
+    eq_(view.get_list(filters=[(14, '3')], execute=True)[1][0].total, 20)
+
+    # Actions on every matching row only need filters
+    rv = client.post('/admin/order/delete/?flt0_8=1',
+                     data={'confirm_delete': 'Confirm'})
+    eq_(rv.status_code, 302)
+    eq_(Order.objects.count(), 5)
+    eq_(Order.objects.filter(paid=True).count(), 0)
+
+
+def test_list_facets():
+    class Ticket(models.Model):
+        title = models.CharField(max_length=20)
+        status = models.CharField(max_length=20, null=True)
+        urgent = models.BooleanField(default=False)
+
+    install(Ticket)
+    for i, status in enumerate(['open', 'open', 'open', 'closed', 'closed',
+                                'spam', None]):
+        Ticket.objects.create(title='ticket%d' % i, status=status,
+                              urgent=i % 3 == 0)
+
+    view = CustomModelView(Ticket, search_fields=('title',),
+                           list_filters=('title',),
+                           list_facets=('status', 'urgent'),
+                           list_facet_limit=3)
+    admin.add_view(view)
+    client = app.test_client()
+
+    with CaptureQueriesContext(connection) as queries:
+        with app.test_request_context('/admin/ticket/?flt0_4=open'):
+            status, urgent = view.get_facets(filters=view.filters, count=3)
+    eq_([(v.label, v.count, v.active) for v in status.values],
+        [('open', 3, True), ('closed', 2, False), ('None', 1, False)])
+    eq_(status.values[2].url, None)
+    ok_('flt0_4=closed' in status.values[1].url)
+    eq_([(v.label, v.count) for v in urgent.values], [('No', 2), ('Yes', 1)])
+    eq_(len([q for q in queries if 'GROUP BY' in q['sql']]), 2)
+
+    rv = client.get('/admin/ticket/?q=ticket1')
+    ok_('<strong>Status:</strong>' in rv.data)
+
+
+def test_date_hierarchy():
+    class Event(models.Model):
+        name = models.CharField(max_length=20)
+        start = models.DateTimeField(null=True, db_index=True)
+
+    install(Event)
+    for i, start in enumerate([(2012, 12, 31, 23), (2013, 1, 1, 0),
+                               (2013, 1, 15, 12), (2013, 3, 1, 8)]):
+        Event.objects.create(name='event%d' % i,
+                             start=datetime.datetime(*start))
+    Event.objects.create(name='undated')
+
+    view = CustomModelView(Event, list_display=('name',),
+                           list_filters=('name',), date_hierarchy='start')
+    admin.add_view(view)
+    client = app.test_client()
+
+    eq_(len(view.get_filters()) - 1, 4)
+
+    with app.test_request_context('/admin/event/'):
+        hierarchy = view.get_date_hierarchy(count=5)
+        eq_([(b.label, b.count) for b in hierarchy.buckets],
+            [('2012', 1), ('2013', 3)])
+        ok_('flt0_4=2013' in hierarchy.buckets[1].url)
+
+    with app.test_request_context('/admin/event/?flt0_4=2013'):
+        hierarchy = view.get_date_hierarchy(filters=view.filters, count=3)
+        eq_([c.label for c in hierarchy.crumbs], ['All dates', '2013'])
+        eq_([(b.label, b.count) for b in hierarchy.buckets],
+            [('January', 2), ('March', 1)])
+        eq_(view.get_list(filters=view.filters)[0], 3)
+
+    rv = client.get('/admin/event/?flt0_4=2013-01')
+    eq_(rv.status_code, 200)
+    ok_('event2' in rv.data)
+    ok_('event0' not in rv.data)
+
+
+def test_keyset_pagination():
+    class Member(models.Model):
+        name = models.CharField(max_length=20)
+        age = models.IntegerField()
+
+    install(Member)
+    for name, age in (('John', 18), ('Michael', 21), ('Steve', 15),
+                      ('Ron', 59)):
+        Member.objects.create(name=name, age=age)
+
+    view = CustomModelView(Member, list_per_page=2, keyset_pagination=True,
+                           list_display=('name', 'age'))
+    admin.add_view(view)
+    client = app.test_client()
+
+    rv = client.get('/admin/member/?sort=age')
+    ok_('Steve' in rv.data and 'John' in rv.data)
+    ok_('Michael' not in rv.data)
+
+    next_url = re.search(r'href="([^"]*cursor=[^"]*)">&gt;', rv.data)
+    rv = client.get(next_url.group(1).replace('&amp;', '&'))
+    ok_('Michael' in rv.data and 'Ron' in rv.data)
+    ok_('Steve' not in rv.data)
+
+    # Descending
+    rv = client.get('/admin/member/?sort=-age')
+    ok_('Ron' in rv.data and 'Michael' in rv.data)
+    ok_('John' not in rv.data)
+
+
+def test_unique_validation():
+    class Team(models.Model):
+        name = models.CharField(max_length=20)
+
+        def __unicode__(self):
+            return self.name
+
+    class Player(models.Model):
+        email = models.CharField(max_length=20, unique=True)
+        number = models.IntegerField()
+        team = models.ForeignKey(Team)
+
+        class Meta:
+            unique_together = (('team', 'number'),)
+
+    install(Team, Player)
+    red = Team.objects.create(name='red')
+    blue = Team.objects.create(name='blue')
+    Player.objects.create(email='a@x', number=1, team=red)
+
+    view = CustomModelView(Player)
+    admin.add_view(view)
+    client = app.test_client()
+
+    # Both checks in one query
+    with CaptureQueriesContext(connection) as queries:
+        rv = client.post('/admin/player/add/',
+                         data={'email': 'a@x', 'number': '1',
+                               'team': str(red.pk)})
+    eq_(rv.status_code, 200)
+    ok_('Already exists.' in rv.data)
+    ok_('Already exists with the same team, number.' in rv.data)
+    eq_(len([q for q in queries if 'SELECT' in q['sql'] and
+             '"tests_player"' in q['sql']]), 1)
+    eq_(Player.objects.count(), 1)
+
+    rv = client.post('/admin/player/add/',
+                     data={'email': 'b@x', 'number': '1',
+                           'team': str(blue.pk)})
+    eq_(rv.status_code, 302)
+
+    # Rows the view doesn't list still conflict
+    view.get_queryset = lambda: Player.objects.filter(team=blue)
+    rv = client.post('/admin/player/add/',
+                     data={'email': 'a@x', 'number': '2',
+                           'team': str(blue.pk)})
+    eq_(rv.status_code, 200)
+    ok_('Already exists.' in rv.data)
+    eq_(Player.objects.count(), 2)
+
+
+def test_update_actions():
+    from django.db.models import signals
+    from flask_superadmin.model.actions import UpdateAction
+
+    class Task(models.Model):
+        title = models.CharField(max_length=20)
+        status = models.CharField(max_length=20)
+        done = models.BooleanField(default=False)
+
+    install(Task)
+    pks = [Task.objects.create(title='task%d' % i, status='new').pk
+           for i in range(5)]
+
+    view = CustomModelView(Task, update_chunk_size=2,
+                           update_actions=(
+                               UpdateAction('finish', values={'done': True}),
+                               UpdateAction('set_status', 'Change status',
+                                            fields=('status',))))
+    admin.add_view(view)
+    client = app.test_client()
+
+    # Values set right away, with an UPDATE per chunk of primary keys
+    ok_(view.can_bulk_update({'done': True}))
+    with CaptureQueriesContext(connection) as queries:
+        rv = client.post('/admin/task/',
+                         data={'action': 'finish',
+                               '_selected_action': map(str, pks[:3])})
+    eq_(rv.status_code, 302)
+    eq_(len([q for q in queries if 'UPDATE' in q['sql']]), 2)
+    eq_(Task.objects.filter(done=True).count(), 3)
+
+    rv = client.post('/admin/task/', data={'action': 'set_status',
+                                           '_selected_action': map(str,
+                                                                   pks[3:]),
+                                           'update-status': 'closed',
+                                           'confirm_update': '1'})
+    eq_(rv.status_code, 302)
+    eq_(sorted(Task.objects.filter(status='closed')
+               .values_list('pk', flat=True)), pks[3:])
+
+    # Saved one by one for the save signals
+    saved = []
+
+    def on_save(sender, instance, **kwargs):
+        saved.append(instance.pk)
+
+    signals.post_save.connect(on_save, sender=Task)
+    try:
+        ok_(not view.can_bulk_update({'done': False}))
+        eq_(view.update_models({'done': False}, *pks[:2]), 2)
+    finally:
+        signals.post_save.disconnect(on_save, sender=Task)
+    eq_(sorted(saved), pks[:2])
+    eq_(Task.objects.filter(done=True).count(), 1)
+
+    # Every matching row in one statement, once confirmed
+    view.search_fields = ('title',)
+    rv = client.post('/admin/task/?q=task', data={'action': 'finish',
+                                                  'select_across': '1'})
+    ok_('name="confirm_update"' in rv.data)
+    eq_(Task.objects.filter(done=True).count(), 1)
+    with CaptureQueriesContext(connection) as queries:
+        rv = client.post('/admin/task/?q=task', data={'action': 'finish',
+                                                      'select_across': '1',
+                                                      'confirm_update': '1'})
+    eq_(rv.status_code, 302)
+    eq_(len([q for q in queries if 'UPDATE' in q['sql']]), 1)
+    eq_(Task.objects.filter(done=True).count(), 5)
+
+
+def test_list_projection_select_related():
+    class Category(models.Model):
+        name = models.CharField(max_length=20)
+
+    class Item(models.Model):
+        title = models.CharField(max_length=20)
+        cat = models.ForeignKey(Category)
+
+    install(Category, Item)
+    cat = Category.objects.create(name='tools')
+    Item.objects.create(title='hammer', cat=cat)
+
+    view = CustomModelView(Item, list_display=('title',),
+                           list_select_related=('cat',))
+    admin.add_view(view)
+    client = app.test_client()
+
+    # The foreign key joined in is loaded along with the listed fields
+    eq_(view.get_list_projection(), ['title', 'cat'])
+    rv = client.get('/admin/item/')
+    eq_(rv.status_code, 200)
+    ok_('hammer' in rv.data)
+    count, data = view.get_list(execute=True)
+    eq_(data[0].cat.name, 'tools')
@@ -282,6 +282,37 @@ def test_list_display_header():
     ok_('Test Header' in rv.data)
 
 
+def test_get_column():
+    app, admin = setup()
+
+    class ColumnsView(MockModelView):
+        def double(self, instance):
+            return instance.col1 * 2
+
+    view = ColumnsView(Model, list_display=['col1', 'double', 'child.col2',
+                                            'child.col3.real', 'missing.col1',
+                                            'child.describe'])
+    admin.add_view(view)
+
+    instance = Model(1, c1=21)
+    instance.child = Model(2, c2=5)
+    instance.child.describe = lambda: 'child'
+
+    eq_(view.get_column(instance, 'col1'), 21)
+    eq_(view.get_column(instance, 'double'), 42)
+    eq_(view.get_column(instance, 'child.col2'), 5)
+    eq_(view.get_column(instance, 'child.col3.real'), 3)
+    eq_(view.get_column(instance, 'missing.col1'), None)
+    eq_(view.get_column(instance, 'child.describe'), 'child')
+
+    # Accessors are compiled once and reused
+    columns = view.get_list_columns()
+    eq_([name for name, accessor in columns], view.list_display)
+    ok_(columns[0][1] is view.get_column_accessor('col1'))
+    eq_([accessor(instance) for name, accessor in columns],
+        [21, 42, 5, 3, None, 'child'])
+
+
 def test_search_fields():
     app, admin = setup()
 
@@ -1,3 +1,6 @@
+import datetime
+import re
+
 from nose.tools import eq_, ok_, raises
 
 import wtforms
@@ -280,6 +283,37 @@ def test_sort():
     ok_('Ron' in resp.data)
     ok_('Steve' not in resp.data)
 
+def test_keyset_pagination():
+    app, admin = setup()
+
+    class Person(Document):
+        name = StringField()
+        age = IntField()
+
+    Person.drop_collection()
+    Person.objects.create(name='John', age=18)
+    Person.objects.create(name='Michael', age=21)
+    Person.objects.create(name='Steve', age=15)
+    Person.objects.create(name='Ron', age=59)
+
+    view = CustomModelView(Person, list_per_page=2, keyset_pagination=True,
+                           list_display=['name', 'age'])
+    admin.add_view(view)
+
+    client = app.test_client()
+
+    resp = client.get('/admin/person/?sort=age')
+    ok_('Steve' in resp.data)
+    ok_('John' in resp.data)
+    ok_('Michael' not in resp.data)
+
+    next_url = re.search(r'href="([^"]*cursor=[^"]*)">&gt;', resp.data)
+    resp = client.get(next_url.group(1).replace('&amp;', '&'))
+    ok_('Michael' in resp.data)
+    ok_('Ron' in resp.data)
+    ok_('Steve' not in resp.data)
+    ok_('cursor=' in resp.data)
+
 def test_reference_linking():
     app, admin = setup()
 
@@ -362,3 +396,242 @@ def test_requred_int_field():
     ok_('This field is required.' not in resp.data)
     ok_('error.' not in resp.data)
 
+
+def test_reference_select_fields():
+    from werkzeug.datastructures import MultiDict
+    from flask_superadmin.model.backends.mongoengine.fields import \
+        ModelSelectField, ModelSelectMultipleField
+
+    setup()
+
+    class Dog(Document):
+        name = StringField()
+        age = IntField()
+
+    Dog.drop_collection()
+    dogs = [Dog.objects.create(name='dog%d' % i, age=i) for i in range(4)]
+
+    class DogForm(wtforms.Form):
+        dog = ModelSelectField(model=Dog, get_label='name')
+        dogs = ModelSelectMultipleField(model=Dog, get_label='name')
+
+    form = DogForm(MultiDict([('dog', str(dogs[1].pk)),
+                              ('dogs', str(dogs[2].pk)),
+                              ('dogs', str(dogs[0].pk))]))
+    ok_(form.validate())
+    eq_(form.dog.data.age, 1)
+    eq_([dog.age for dog in form.dogs.data], [2, 0])
+    # Submitted choices are looked up by pk, not by listing the choices
+    eq_(form.dog._object_list, None)
+    eq_(form.dogs._object_list, None)
+
+    form = DogForm(MultiDict([('dog', 'invalid'),
+                              ('dogs', str(dogs[2].pk)),
+                              ('dogs', '5' * 24)]))
+    ok_(not form.validate())
+    eq_(sorted(form.errors), ['dog', 'dogs'])
+
+    # Choices only load the label
+    form = DogForm(dog=dogs[3], dogs=[dogs[0]])
+    ok_('selected value="%s">dog3' % dogs[3].pk in form.dog())
+    ok_('selected value="%s">dog0' % dogs[0].pk in form.dogs())
+    eq_(form.dog._object_list[0][1].age, None)
+
+
+def test_list_filters():
+    app, admin = setup()
+
+    class Order(Document):
+        customer = StringField()
+        total = IntField()
+        paid = BooleanField()
+        created = DateTimeField()
+
+    Order.drop_collection()
+    for i in range(10):
+        Order.objects.create(customer='cust%d' % (i % 3), total=i * 10,
+                             paid=i % 2 == 0,
+                             created=datetime.datetime(2013, 1, i + 1))
+
+    view = CustomModelView(Order, list_display=('customer',),
+                           list_filters=('customer', 'total', 'paid',
+                                         'created'))
+    admin.add_view(view)
+    client = app.test_client()
+
+    names = [(unicode(f.name), unicode(f.operation()))
+             for f in view.get_filters()]
+    eq_(names[:4], [('Customer', 'equals'), ('Customer', 'not equal'),
+                    ('Customer', 'contains'), ('Customer', 'not contains')])
+    eq_(names[8:10], [('Paid', 'equals'), ('Paid', 'not equal')])
+
+    rv = client.get('/admin/order/?flt0_0=cust1&flt1_8=0')
+    eq_(rv.status_code, 200)
+    ok_('Total count: 2' in rv.data)
+
+    eq_(view.get_list(filters=[(7, '20')], execute=True)[0], 2)
+    eq_(view.get_list(filters=[(13, '2013-01-05')], execute=True)[0], 4)
+    eq_(view.get_list(filters=[(2, 'ust2')], execute=True)[0], 3)
+
+
+def test_list_facets():
+    app, admin = setup()
+
+    class Ticket(Document):
+        title = StringField()
+        status = StringField()
+        urgent = BooleanField()
+
+    Ticket.drop_collection()
+    for i, status in enumerate(['open', 'open', 'open', 'closed', 'closed',
+                                'spam', None]):
+        Ticket.objects.create(title='ticket%d' % i, status=status,
+                              urgent=i % 3 == 0)
+
+    view = CustomModelView(Ticket, list_filters=('title',),
+                           list_facets=('status', 'urgent'),
+                           list_facet_limit=3)
+    admin.add_view(view)
+
+    with app.test_request_context('/admin/ticket/?flt0_4=open'):
+        status, urgent = view.get_facets(filters=view.filters, count=3)
+        eq_([(v.label, v.count, v.active) for v in status.values],
+            [('open', 3, True), ('closed', 2, False), ('None', 1, False)])
+        eq_(status.values[2].url, None)
+        ok_('flt0_4=closed' in status.values[1].url)
+        eq_([(v.label, v.count) for v in urgent.values],
+            [('No', 2), ('Yes', 1)])
+
+
+def test_date_hierarchy():
+    app, admin = setup()
+
+    class Event(Document):
+        name = StringField()
+        start = DateTimeField()
+
+    Event.drop_collection()
+    for i, start in enumerate([(2012, 12, 31, 23), (2013, 1, 1, 0),
+                               (2013, 1, 15, 12), (2013, 3, 1, 8)]):
+        Event.objects.create(name='event%d' % i,
+                             start=datetime.datetime(*start))
+    Event.objects.create(name='undated')
+
+    view = CustomModelView(Event, list_display=('name',),
+                           list_filters=('name',), date_hierarchy='start')
+    admin.add_view(view)
+    client = app.test_client()
+
+    eq_(len(view.get_filters()) - 1, 4)
+
+    with app.test_request_context('/admin/event/'):
+        hierarchy = view.get_date_hierarchy(count=5)
+        eq_([(b.label, b.count) for b in hierarchy.buckets],
+            [('2012', 1), ('2013', 3)])
+
+    with app.test_request_context('/admin/event/?flt0_4=2013'):
+        hierarchy = view.get_date_hierarchy(filters=view.filters, count=3)
+        eq_([c.label for c in hierarchy.crumbs], ['All dates', '2013'])
+        eq_([(b.label, b.count) for b in hierarchy.buckets],
+            [('January', 2), ('March', 1)])
+
+    rv = client.get('/admin/event/?flt0_4=2013-01')
+    eq_(rv.status_code, 200)
+    ok_('event2' in rv.data)
+    ok_('event0' not in rv.data)
+
+
+def test_unique_validation():
+    app, admin = setup()
+
+    class Team(Document):
+        name = StringField()
+
+        def __unicode__(self):
+            return self.name
+
+    class Player(Document):
+        email = StringField(unique=True)
+        number = IntField(unique_with='team')
+        team = ReferenceField(Team)
+
+    Team.drop_collection()
+    Player.drop_collection()
+    red = Team.objects.create(name='red')
+    blue = Team.objects.create(name='blue')
+    Player.objects.create(email='a@x', number=1, team=red)
+
+    view = CustomModelView(Player)
+    admin.add_view(view)
+    client = app.test_client()
+
+    rv = client.post('/admin/player/add/', data={'email': 'a@x',
+                                                 'number': '1',
+                                                 'team': str(red.pk)})
+    eq_(rv.status_code, 200)
+    ok_('Already exists.' in rv.data)
+    ok_('Already exists with the same number, team.' in rv.data)
+    eq_(Player.objects.count(), 1)
+
+    rv = client.post('/admin/player/add/', data={'email': 'b@x',
+                                                 'number': '1',
+                                                 'team': str(blue.pk)})
+    eq_(rv.status_code, 302)
+
+    # Documents the view doesn't list still conflict
+    view.get_queryset = lambda: Player.objects(team=blue)
+    rv = client.post('/admin/player/add/', data={'email': 'a@x',
+                                                 'number': '2',
+                                                 'team': str(blue.pk)})
+    eq_(rv.status_code, 200)
+    ok_('Already exists.' in rv.data)
+    eq_(Player.objects.count(), 2)
+
+
+def test_update_actions():
+    from flask_superadmin.model.actions import UpdateAction
+
+    app, admin = setup()
+
+    class Task(Document):
+        title = StringField()
+        status = StringField()
+        done = BooleanField(default=False)
+
+    Task.drop_collection()
+    pks = [str(Task.objects.create(title='task%d' % i, status='new').pk)
+           for i in range(5)]
+
+    view = CustomModelView(Task, update_chunk_size=2,
+                           update_actions=(
+                               UpdateAction('finish', values={'done': True}),
+                               UpdateAction('set_status', 'Change status',
+                                            fields=('status',))))
+    admin.add_view(view)
+    client = app.test_client()
+
+    ok_(view.can_bulk_update({'done': True}))
+    ok_(not view.can_bulk_update({'missing': 1}))
+    rv = client.post('/admin/task/', data={'action': 'finish',
+                                           '_selected_action': pks[:3]})
+    eq_(rv.status_code, 302)
+    eq_(Task.objects(done=True).count(), 3)
+
+    rv = client.post('/admin/task/', data={'action': 'set_status',
+                                           '_selected_action': pks[3:],
+                                           'update-status': 'closed',
+                                           'confirm_update': '1'})
+    eq_(rv.status_code, 302)
+    eq_(sorted(str(t.pk) for t in Task.objects(status='closed')), pks[3:])
+
+    # Every matching document, once confirmed
+    view.search_fields = ('title',)
+    rv = client.post('/admin/task/?q=task', data={'action': 'finish',
+                                                  'select_across': '1'})
+    ok_('name="confirm_update"' in rv.data)
+    eq_(Task.objects(done=True).count(), 3)
+    rv = client.post('/admin/task/?q=task', data={'action': 'finish',
+                                                  'select_across': '1',
+                                                  'confirm_update': '1'})
+    eq_(rv.status_code, 302)
+    eq_(Task.objects(done=True).count(), 5)
@@ -1,10 +1,15 @@
-from nose.tools import eq_, ok_, raises
+import datetime
+import json
+import re
+
+from nose.tools import assert_raises, eq_, ok_, raises
 
 import wtforms
 
 from flask import Flask
 
 from flask.ext.sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from sqlalchemy.exc import InvalidRequestError
 from flask_superadmin import Admin
 from flask_superadmin.model.backends.sqlalchemy.view import ModelAdmin
@@ -125,6 +130,33 @@ def test_model():
     eq_(db.session.query(Model1).count(), 0)
 
 
+def test_form_cache():
+    app, db, admin = setup()
+    Model1, Model2 = create_models(db)
+
+    view = CustomModelView(Model1, db.session)
+    admin.add_view(view)
+
+    with app.test_request_context():
+        Form = view.get_form()
+        ok_(view.get_form() is Form)
+        ok_('test2' in Form()._fields)
+
+        # Changing the form settings builds a new form
+        view.exclude = ('test2',)
+        ok_(view.get_form() is not Form)
+        ok_('test2' not in view.get_form()()._fields)
+
+        view.field_args = {'test1': {'label': 'First'}}
+        eq_(view.get_form()().test1.label.text, 'First')
+        view.field_args['test1']['label'] = 'Second'
+        eq_(view.get_form()().test1.label.text, 'Second')
+
+        Form = view.get_form()
+        view.invalidate_form_cache()
+        ok_(view.get_form() is not Form)
+
+
 @raises(InvalidRequestError)
 def test_no_pk():
     app, db, admin = setup()
@@ -344,3 +376,1419 @@ def test_reference_linking():
     ok_('<input class="" id="name" name="name" type="text" value="Stan">' in resp.data)
     ok_(dog_link in resp.data)
 
+
+
+def test_keyset_pagination():
+    app, db, admin = setup()
+
+    Model1, Model2 = create_models(db)
+
+    view = CustomModelView(Model1, db.session, list_per_page=2,
+                           keyset_pagination=True, list_display=['test1'])
+    admin.add_view(view)
+
+    for name in ('data1', 'data2', 'data3', 'data4', 'data5'):
+        db.session.add(Model1(name))
+    db.session.commit()
+
+    client = app.test_client()
+
+    def next_url(data):
+        return re.search(r'href="([^"]*cursor=[^"]*)">&gt;', data)
+
+    def prev_url(data):
+        return re.search(r'href="([^"]*cursor=[^"]*)">&lt;', data)
+
+    resp = client.get('/admin/model1/?sort=-test1')
+    ok_('data5' in resp.data)
+    ok_('data4' in resp.data)
+    ok_('data3' not in resp.data)
+    ok_(prev_url(resp.data) is None)
+
+    resp = client.get(next_url(resp.data).group(1).replace('&amp;', '&'))
+    ok_('data3' in resp.data)
+    ok_('data2' in resp.data)
+    ok_('data4' not in resp.data)
+
+    resp = client.get(next_url(resp.data).group(1).replace('&amp;', '&'))
+    ok_('data1' in resp.data)
+    ok_('data2' not in resp.data)
+    ok_(next_url(resp.data) is None)
+
+    resp = client.get(prev_url(resp.data).group(1).replace('&amp;', '&'))
+    ok_('data3' in resp.data)
+    ok_('data2' in resp.data)
+    ok_('data1' not in resp.data)
+
+    resp = client.get(prev_url(resp.data).group(1).replace('&amp;', '&'))
+    ok_('data5' in resp.data)
+    ok_('data4' in resp.data)
+    ok_(prev_url(resp.data) is None)
+
+    # A garbled cursor falls back to the first page
+    resp = client.get('/admin/model1/?cursor=garbage')
+    eq_(resp.status_code, 200)
+    ok_('data1' in resp.data)
+
+
+def test_count_strategy():
+    app, db, admin = setup()
+
+    Model1, Model2 = create_models(db)
+
+    view = CustomModelView(Model1, db.session, list_per_page=2,
+                           count_strategy='none', list_display=['test1'])
+    admin.add_view(view)
+
+    for name in ('data1', 'data2', 'data3'):
+        db.session.add(Model1(name))
+    db.session.commit()
+
+    client = app.test_client()
+
+    resp = client.get('/admin/model1/')
+    ok_('Total count' not in resp.data)
+    ok_('data2' in resp.data)
+    ok_('data3' not in resp.data)
+    ok_('href="/admin/model1/?page=1"' in resp.data)
+
+    resp = client.get('/admin/model1/?page=1')
+    ok_('data3' in resp.data)
+    ok_('href="/admin/model1/?page=2"' not in resp.data)
+
+    view.count_strategy = 'cached'
+    resp = client.get('/admin/model1/')
+    ok_('<div class="total-count">Total count: 3</div>' in resp.data)
+
+    # Cached counts don't see new rows until they expire
+    db.session.add(Model1('data4'))
+    db.session.commit()
+    resp = client.get('/admin/model1/')
+    ok_('<div class="total-count">Total count: 3</div>' in resp.data)
+
+    view.count_strategy.invalidate()
+    resp = client.get('/admin/model1/')
+    ok_('<div class="total-count">Total count: 4</div>' in resp.data)
+
+    # SQLite has no row estimate, so the exact count is used
+    view.count_strategy = 'estimate'
+    resp = client.get('/admin/model1/')
+    ok_('<div class="total-count">Total count: ~4</div>' in resp.data)
+
+    # Cached counts are forgotten when saving or deleting through the
+    # admin
+    view.count_strategy = 'cached'
+    client.get('/admin/model1/')
+    resp = client.post('/admin/model1/1/delete/',
+                       data={'confirm_delete': 'Confirm'})
+    eq_(resp.status_code, 302)
+    resp = client.get('/admin/model1/')
+    ok_('<div class="total-count">Total count: 3</div>' in resp.data)
+
+    # Counted separately for every list cache scope
+    scope = ['a']
+
+    def get_queryset():
+        qs = db.session.query(Model1)
+        if scope[0] == 'b':
+            qs = qs.filter(Model1.test1 != 'data2')
+        return qs
+
+    view.get_list_cache_scope = lambda: scope[0]
+    view.get_queryset = get_queryset
+    resp = client.get('/admin/model1/')
+    ok_('<div class="total-count">Total count: 3</div>' in resp.data)
+    scope[0] = 'b'
+    resp = client.get('/admin/model1/')
+    ok_('<div class="total-count">Total count: 2</div>' in resp.data)
+
+
+def test_list_select_related():
+    app, db, admin = setup()
+
+    class Person(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+        pets = db.relationship('Dog', backref='owner')
+
+    class Dog(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+        owner_id = db.Column(db.Integer, db.ForeignKey('person.id'))
+
+    db.create_all()
+
+    for i in range(5):
+        person = Person(name='person%s' % i)
+        db.session.add(person)
+        db.session.add(Dog(name='dog%s' % i, owner=person))
+    db.session.commit()
+
+    view = CustomModelView(Dog, db.session,
+                           list_display=('name', 'owner.name', 'owner.pets'))
+    admin.add_view(view)
+    eq_(view.get_select_related(), ('owner', 'owner.pets'))
+
+    queries = []
+
+    def count_queries(*args):
+        queries.append(args)
+
+    db.session.remove()
+    event.listen(db.engine, 'before_cursor_execute', count_queries)
+    try:
+        resp = app.test_client().get('/admin/dog/')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_queries)
+
+    eq_(resp.status_code, 200)
+    ok_('person4' in resp.data)
+    # count, page (with owners joined in), owners' pets
+    eq_(len(queries), 3)
+
+    view.list_select_related = False
+    eq_(view.get_select_related(), ())
+
+
+def test_model_view_lookup():
+    app, db, admin = setup()
+
+    class Animal(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        kind = db.Column(db.String(20))
+        __mapper_args__ = {'polymorphic_on': kind,
+                           'polymorphic_identity': 'animal'}
+
+    class Cat(Animal):
+        __mapper_args__ = {'polymorphic_identity': 'cat'}
+
+    db.create_all()
+
+    class AnimalAdmin(ModelAdmin):
+        session = db.session
+
+    admin.register(Animal, AnimalAdmin)
+    animal_view = admin._models[0][1]
+
+    eq_(admin.get_model_view(Animal), animal_view)
+    # Subclasses fall back to the view of their closest registered parent
+    eq_(admin.get_model_view(Cat), animal_view)
+    eq_(admin.get_model_view(int), None)
+
+    cat = Cat()
+    db.session.add(cat)
+    db.session.commit()
+
+    with app.test_request_context():
+        eq_(animal_view.get_reference(cat), '/admin/animal/%s/' % cat.id)
+        eq_(animal_view.get_reference(5), None)
+
+
+def test_autocomplete():
+    app, db, admin = setup()
+
+    class Person(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+
+        def __unicode__(self):
+            return self.name
+
+    class Dog(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+        owner_id = db.Column(db.Integer, db.ForeignKey('person.id'),
+                             nullable=False)
+        owner = db.relationship(Person)
+
+    db.create_all()
+
+    class PersonAdmin(ModelAdmin):
+        session = db.session
+        search_fields = ('name',)
+        autocomplete_limit = 2
+
+    class DogAdmin(ModelAdmin):
+        session = db.session
+        autocomplete_fields = ('owner',)
+
+    for name in ('Stan', 'Steve', 'Stella', 'Kyle'):
+        db.session.add(Person(name=name))
+    db.session.commit()
+    stan = db.session.query(Person).filter_by(name='Stan').one()
+    kyle = db.session.query(Person).filter_by(name='Kyle').one()
+
+    admin.register(Person, PersonAdmin)
+    admin.register(Dog, DogAdmin)
+
+    client = app.test_client()
+
+    resp = client.get('/admin/person/autocomplete/?q=St')
+    data = json.loads(resp.data)
+    eq_([r['text'] for r in data['results']], ['Stan', 'Steve'])
+    ok_(data['more'])
+
+    resp = client.get('/admin/person/autocomplete/?q=St&page=1')
+    data = json.loads(resp.data)
+    eq_([r['text'] for r in data['results']], ['Stella'])
+    ok_(not data['more'])
+
+    # Pages are sliced from rows in primary key order
+    statements = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    client.get('/admin/person/autocomplete/?q=St')
+    eq_(len([s for s in statements if 'ORDER BY person.id' in s]), 1)
+
+    resp = client.post('/admin/dog/add/', data=dict(name='Sparky',
+                                                    owner=str(stan.id)))
+    eq_(resp.status_code, 302)
+    dog = db.session.query(Dog).one()
+    eq_(dog.owner.name, 'Stan')
+
+    # Without search fields nothing matches a query
+    resp = client.get('/admin/dog/autocomplete/?q=Sp')
+    eq_(json.loads(resp.data)['results'], [])
+    resp = client.get('/admin/dog/autocomplete/')
+    eq_(len(json.loads(resp.data)['results']), 1)
+
+    # Only the selected owner is rendered
+    resp = client.get('/admin/dog/%s/' % dog.id)
+    ok_('data-url="/admin/person/autocomplete/"' in resp.data)
+    ok_('Stan' in resp.data)
+    ok_('Kyle' not in resp.data)
+
+    resp = client.post('/admin/dog/%s/' % dog.id, data=dict(name='Sparky',
+                                                            owner='1000'))
+    eq_(resp.status_code, 200)
+    ok_('Not a valid choice' in resp.data)
+
+    resp = client.post('/admin/dog/%s/' % dog.id, data=dict(name='Sparky',
+                                                            owner='x'))
+    ok_('Not a valid choice' in resp.data)
+
+    resp = client.post('/admin/dog/%s/' % dog.id, data=dict(name='Sparky',
+                                                            owner=kyle.id))
+    eq_(resp.status_code, 302)
+    eq_(db.session.query(Dog).one().owner.name, 'Kyle')
+
+
+def test_bulk_delete():
+    app, db, admin = setup()
+
+    class Author(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+        books = db.relationship('Book', cascade='all, delete-orphan')
+
+    class Book(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.String(20))
+        author_id = db.Column(db.Integer, db.ForeignKey('author.id'))
+
+    db.create_all()
+
+    for i in range(10):
+        author = Author(name='author%s' % i)
+        author.books.append(Book(title='book%s' % i))
+        db.session.add(author)
+    db.session.commit()
+
+    book_view = CustomModelView(Book, db.session, search_fields=('title',),
+                                delete_chunk_size=3)
+    author_view = CustomModelView(Author, db.session, endpoint='authors')
+    admin.add_view(book_view)
+    admin.add_view(author_view)
+    ok_(book_view.can_bulk_delete())
+    # Deleting authors has to cascade to their books through the session
+    ok_(not author_view.can_bulk_delete())
+
+    queries = []
+
+    def count_queries(conn, cursor, statement, *args):
+        if statement.startswith('DELETE'):
+            queries.append(statement)
+
+    client = app.test_client()
+    event.listen(db.engine, 'before_cursor_execute', count_queries)
+    try:
+        rv = client.post('/admin/book/', data={
+            'action': 'delete', 'confirm_delete': 'Confirm',
+            '_selected_action': ['1', '2', '3', '4', '5', '6', '7']})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_queries)
+    eq_(rv.status_code, 302)
+    eq_(Book.query.count(), 3)
+    # 7 rows in chunks of 3
+    eq_(len(queries), 3)
+
+    author_view.delete_models('1')
+    eq_(Author.query.count(), 9)
+    eq_(Book.query.count(), 3)
+
+    # Deleting everything matching a search, with one statement
+    rv = client.get('/admin/book/delete/?q=book9')
+    eq_(rv.status_code, 200)
+    ok_('1' in rv.data and 'book9' in rv.data)
+    del queries[:]
+    event.listen(db.engine, 'before_cursor_execute', count_queries)
+    try:
+        rv = client.post('/admin/book/delete/?q=book9',
+                         data={'confirm_delete': 'Confirm'})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_queries)
+    eq_(rv.status_code, 302)
+    eq_(len(queries), 1)
+    eq_([b.title for b in Book.query.order_by(Book.id)], ['book7', 'book8'])
+
+    # Without a search there is nothing to delete from there, blank
+    # searches included
+    for url in ('/admin/book/delete/', '/admin/book/delete/?q=%20'):
+        rv = client.post(url, data={'confirm_delete': 'Confirm'})
+        eq_(rv.status_code, 302)
+        eq_(Book.query.count(), 2)
+    rv = client.post('/admin/book/?q=%20', data={
+        'action': 'delete', 'select_across': '1'})
+    eq_(rv.status_code, 200)
+    eq_(Book.query.count(), 2)
+
+
+def test_bulk_delete_fallback():
+    app, db, admin = setup()
+
+    post_tags = db.Table(
+        'post_tags',
+        db.Column('post_id', db.Integer, db.ForeignKey('post.id')),
+        db.Column('tag_id', db.Integer, db.ForeignKey('tag.id')))
+
+    class Tag(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+
+    class Post(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        tags = db.relationship(Tag, secondary=post_tags)
+
+    class Owner(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        pets = db.relationship('Pet', backref='owner')
+
+    class Pet(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        owner_id = db.Column(db.Integer, db.ForeignKey('owner.id'))
+
+    class Note(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+
+    db.create_all()
+    db.session.add(Post(tags=[Tag()]))
+    db.session.add(Owner(pets=[Pet()]))
+    db.session.commit()
+
+    post_view = CustomModelView(Post, db.session)
+    owner_view = CustomModelView(Owner, db.session)
+    note_view = CustomModelView(Note, db.session)
+    ok_(not post_view.can_bulk_delete())
+    ok_(not owner_view.can_bulk_delete())
+    ok_(note_view.can_bulk_delete())
+    # Many-to-one relations don't need the session
+    ok_(CustomModelView(Pet, db.session).can_bulk_delete())
+
+    @event.listens_for(Note, 'before_delete')
+    def before_delete(mapper, connection, target):
+        pass
+    ok_(not note_view.can_bulk_delete())
+
+    post_view.delete_models(1)
+    eq_(db.session.execute(post_tags.select()).fetchall(), [])
+    owner_view.delete_models(1)
+    eq_(Pet.query.one().owner_id, None)
+
+
+def test_export():
+    app, db, admin = setup()
+
+    class Owner(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+        pets = db.relationship('Pet', backref='owner')
+
+        def __unicode__(self):
+            return self.name
+
+    class Pet(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+        age = db.Column(db.Integer)
+        owner_id = db.Column(db.Integer, db.ForeignKey('owner.id'))
+
+    db.create_all()
+
+    owner = Owner(name=u'J\xfcrgen')
+    for i in range(5):
+        db.session.add(Pet(name='pet%s' % i, age=i, owner=owner))
+    db.session.add(Pet(name='stray', age=None))
+    db.session.commit()
+
+    view = CustomModelView(Pet, db.session, search_fields=('name',),
+                           list_display=('name', 'age', 'owner.name'),
+                           export_batch_size=2)
+    admin.add_view(view)
+    client = app.test_client()
+
+    rv = client.get('/admin/pet/export/?sort=-age&q=pet')
+    eq_(rv.status_code, 200)
+    eq_(rv.mimetype, 'text/csv')
+    ok_('attachment' in rv.headers['Content-Disposition'])
+    lines = rv.data.splitlines()
+    eq_(lines[0], 'Name,Age,Owner.Name')
+    eq_(lines[1], 'pet4,4,J\xc3\xbcrgen')
+    eq_(len(lines), 6)
+
+    rv = client.get('/admin/pet/export/?format=json&sort=name')
+    rows = [json.loads(line) for line in rv.data.splitlines()]
+    eq_([row['name'] for row in rows],
+        ['pet0', 'pet1', 'pet2', 'pet3', 'pet4', 'stray'])
+    eq_(rows[1], {'name': 'pet1', 'age': 1, 'owner.name': u'J\xfcrgen'})
+    eq_(rows[5]['owner.name'], None)
+
+    rv = client.get('/admin/pet/export/?format=xml')
+    eq_(rv.status_code, 404)
+
+
+def test_instrumentation():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = '1'
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    db = SQLAlchemy(app)
+    admin = Admin(app, debug_footer=True)
+    ok_(admin.instrument)
+
+    Model1, Model2 = create_models(db)
+    db.create_all()
+
+    view = CustomModelView(Model1, db.session)
+    admin.add_view(view)
+
+    collected = []
+    admin.stats_callback(collected.append)
+
+    client = app.test_client()
+    rv = client.get('/admin/model1/')
+    eq_(rv.status_code, 200)
+    ok_('class="debug-footer"' in rv.data)
+
+    eq_(len(collected), 1)
+    stats = collected[0]
+    ok_(stats.view is view)
+    eq_(stats.endpoint, 'model1.list')
+    # count and page
+    eq_(stats.query_count, 2)
+    ok_(stats.db_time > 0)
+    ok_(stats.template_time > 0)
+    ok_(stats.total_time >= stats.template_time)
+
+    client.get('/admin/model1/add/')
+    ok_(collected[1].form_time > 0)
+    client.get('/admin/model1/add/')
+    # The form class is cached by then
+    eq_(collected[2].form_time, 0)
+
+    # Queries outside of admin requests aren't recorded anywhere
+    Model1.query.count()
+    eq_(len(collected), 3)
+
+
+def test_search_engines():
+    app, db, admin = setup()
+
+    class Article(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.String(50))
+
+    db.create_all()
+    db.session.execute('CREATE VIRTUAL TABLE article_fts USING '
+                       "fts5(title, content='article', content_rowid='id')")
+    for title in ('flask admin', 'flasks and bottles', 'django admin',
+                  'sqlalchemy'):
+        article = Article(title=title)
+        db.session.add(article)
+        db.session.flush()
+        db.session.execute('INSERT INTO article_fts (rowid, title) '
+                           'VALUES (:id, :title)',
+                           {'id': article.id, 'title': title})
+    db.session.commit()
+
+    view = CustomModelView(Article, db.session, search_fields=('title',),
+                           search_engine='sqlite_fts')
+    admin.add_view(view)
+
+    def search(query):
+        qs = view.apply_search(view.get_queryset(), query)
+        return sorted(a.title for a in qs)
+
+    eq_(search('admin'), ['django admin', 'flask admin'])
+    # Full words only, unless prefixed with ^
+    eq_(search('flask'), ['flask admin'])
+    eq_(search('^flask'), ['flask admin', 'flasks and bottles'])
+    eq_(search('=sqlalchemy django'), ['django admin', 'sqlalchemy'])
+    # Query syntax typed by the user is ignored
+    eq_(search('"admin" OR'), ['django admin', 'flask admin'])
+    # Searches without words match nothing, blank ones everything
+    eq_(search('!! ^'), [])
+    eq_(len(search(' ')), 4)
+
+    view.search_engine = 'default'
+    eq_(search('flask'), ['flask admin', 'flasks and bottles'])
+
+    postgres = view.search_engines['postgres']()
+    sql = str(postgres.apply(view, view.get_queryset(), '^fla =x').statement)
+    ok_('to_tsvector' in sql and 'to_tsquery' in sql)
+    ok_('article.title =' in sql)
+
+
+def test_search_plan():
+    app, db, admin = setup()
+
+    class Product(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        code = db.Column(db.String(20), index=True)
+        name = db.Column(db.String(50))
+
+    db.create_all()
+    for code, name in (('abc', 'xabc'), ('xab', 'thing'), ('12', 'other')):
+        db.session.add(Product(code=code, name=name))
+    db.session.commit()
+
+    view = CustomModelView(Product, db.session,
+                           search_fields=('id', 'code', 'name'))
+    admin.add_view(view)
+
+    # Substrings everywhere unless asked for
+    eq_(view.get_search_plan(),
+        (('id', 'contains'), ('code', 'contains'), ('name', 'contains')))
+
+    view.search_use_indexes = True
+    eq_(view.get_search_plan(),
+        (('id', 'exact'), ('code', 'prefix'), ('name', 'contains')))
+
+    def search(query):
+        qs = view.apply_search(view.get_queryset(), query)
+        return sorted(p.code for p in qs)
+
+    # The indexed code column only matches from the start
+    eq_(search('ab'), ['abc'])
+    eq_(search('xab'), ['abc', 'xab'])
+    eq_(search('1'), ['12', 'abc'])
+    eq_(search('3'), ['12'])
+
+    # Words that can't match any field match nothing, not everything
+    view.search_fields = ('id',)
+    eq_(search('abc'), [])
+    eq_(search('^'), [])
+    eq_(search(' '), ['12', 'abc', 'xab'])
+    view.search_fields = ('id', 'code', 'name')
+
+    view.search_use_indexes = False
+    eq_(view.get_search_plan(),
+        (('id', 'contains'), ('code', 'contains'), ('name', 'contains')))
+    eq_(search('ab'), ['abc', 'xab'])
+
+    messages = []
+    app.logger.info = lambda msg, *args: messages.append(msg % args)
+    view.search_use_indexes = True
+    view.search_explain = True
+    with app.app_context():
+        search('ab')
+    eq_(len(messages), 1)
+    ok_('code by prefix' in messages[0] and 'LIKE' in messages[0])
+
+
+class FakeRedis(object):
+    # Just what RedisCache uses, without expiry
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+
+
+def test_list_cache():
+    from flask_superadmin.model.cache import LRUCache, RedisCache
+
+    for store in (LRUCache(), RedisCache(FakeRedis())):
+        app, db, admin = setup()
+        admin.instrument = True
+        collected = []
+        admin.stats_callback(collected.append)
+
+        class Author(db.Model):
+            id = db.Column(db.Integer, primary_key=True)
+            name = db.Column(db.String(20))
+
+            def __unicode__(self):
+                return self.name
+
+        class Book(db.Model):
+            id = db.Column(db.Integer, primary_key=True)
+            title = db.Column(db.String(20))
+            author_id = db.Column(db.Integer, db.ForeignKey(Author.id))
+            author = db.relationship(Author)
+
+        db.create_all()
+        author = Author(name='Kafka')
+        db.session.add(author)
+        for i in range(3):
+            db.session.add(Book(title='Book %d' % i, author=author))
+        db.session.commit()
+
+        admin.add_view(CustomModelView(Author, db.session, list_cache=store))
+        admin.add_view(CustomModelView(Book, db.session, list_cache=store,
+                                       list_display=('title', 'author.name'),
+                                       list_per_page=2))
+        client = app.test_client()
+
+        def list_books(url='/admin/book/'):
+            rv = client.get(url)
+            eq_(rv.status_code, 200)
+            return collected[-1].query_count, rv.data
+
+        # count and page, then the rows of the cached page by primary key
+        eq_(list_books()[0], 2)
+        queries, data = list_books()
+        eq_(queries, 1)
+        ok_('Book 0' in data and 'Book 1' in data and 'Kafka' in data)
+        eq_(list_books('/admin/book/?page=1')[0], 2)
+        eq_(list_books('/admin/book/?sort=-title')[0], 2)
+        ok_('Book 2' in list_books('/admin/book/?sort=-title')[1])
+
+        # Changing a referenced model drops the cached pages
+        rv = client.post('/admin/author/%d/' % author.id,
+                         data={'name': 'Borges'})
+        eq_(rv.status_code, 302)
+        queries, data = list_books()
+        eq_(queries, 2)
+        ok_('Borges' in data)
+
+        rv = client.post('/admin/book/', data={'_selected_action': ['1'],
+                                               'action': 'delete',
+                                               'confirm_delete': '1'})
+        eq_(rv.status_code, 302)
+        queries, data = list_books()
+        eq_(queries, 2)
+        ok_('Book 0' not in data)
+
+
+def test_concurrent_count():
+    import os
+    import tempfile
+    import threading
+    from flask_superadmin.model.counts import ExactCount
+
+    class ThreadCount(ExactCount):
+        def count(self, view, qs, search_query, filters):
+            threads.append(threading.current_thread())
+            return super(ThreadCount, self).count(view, qs, search_query,
+                                                  filters)
+
+    threads = []
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        app, db, admin = setup()
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        admin.instrument = True
+        collected = []
+        admin.stats_callback(collected.append)
+
+        Model1, Model2 = create_models(db)
+        for i in range(25):
+            db.session.add(Model1('test%d' % i))
+        db.session.commit()
+
+        view = CustomModelView(Model1, db.session, list_concurrent_count=True,
+                               count_strategy=ThreadCount(),
+                               search_fields=('test1',))
+        admin.add_view(view)
+
+        with app.test_request_context('/admin/model1/?q=test1'):
+            ok_(view.can_count_concurrently())
+            count, data = view.get_list(page=0, search_query='test1')
+            eq_(count, 11)
+            eq_(len(data), 11)
+            ok_(threads[-1] is not threading.current_thread())
+
+            view.list_concurrent_count = False
+            eq_(view.get_list(page=0, search_query='test1')[0], 11)
+            ok_(threads[-1] is threading.current_thread())
+            view.list_concurrent_count = True
+
+        client = app.test_client()
+        rv = client.get('/admin/model1/?page=1')
+        eq_(rv.status_code, 200)
+        ok_('test24' in rv.data)
+        # The count from the pool is recorded too
+        eq_(collected[-1].query_count, 2)
+        db.session.remove()
+    finally:
+        os.remove(path)
+
+    # In-memory databases can't be shared with other threads
+    app, db, admin = setup()
+    Model1, Model2 = create_models(db)
+    view = CustomModelView(Model1, db.session, list_concurrent_count=True)
+    admin.add_view(view)
+    with app.test_request_context('/admin/model1/'):
+        ok_(not view.can_count_concurrently())
+        eq_(view.get_list()[0], 0)
+
+
+def test_sortable_columns():
+    app, db, admin = setup()
+
+    class Author(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20), index=True)
+
+    class Book(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.String(20))
+        year = db.Column(db.Integer)
+        author_id = db.Column(db.Integer, db.ForeignKey(Author.id))
+        author = db.relationship(Author)
+
+    db.create_all()
+    for name, title, year in (('Borges', 'Ficciones', 1944),
+                              ('Austen', 'Emma', 1815),
+                              ('Kafka', 'Amerika', 1927)):
+        db.session.add(Book(title=title, year=year,
+                            author=Author(name=name)))
+    db.session.commit()
+
+    view = CustomModelView(Book, db.session, list_display=('title', 'author'))
+    admin.add_view(view)
+    client = app.test_client()
+
+    def titles(url):
+        data = client.get(url).data
+        return sorted(['Amerika', 'Emma', 'Ficciones'], key=data.index)
+
+    # By default, the columns of list_display
+    eq_(sorted(view.get_sortable_columns()), ['title'])
+    ok_(view.is_sortable('title'))
+    ok_(not view.is_sortable('author'))
+    eq_(titles('/admin/book/?sort=-title'), ['Ficciones', 'Emma', 'Amerika'])
+    # Anything else is ignored
+    eq_(titles('/admin/book/?sort=-year'), ['Ficciones', 'Emma', 'Amerika'])
+    eq_(client.get('/admin/book/?sort=1/0').status_code, 200)
+
+    view.sortable_columns = ('title', 'year', 'author.name')
+    columns = view.get_sortable_columns()
+    ok_(columns['author.name'].indexed)
+    ok_(not columns['year'].indexed)
+    eq_(titles('/admin/book/?sort=-year'), ['Ficciones', 'Amerika', 'Emma'])
+    eq_(titles('/admin/book/?sort=author.name'),
+        ['Emma', 'Ficciones', 'Amerika'])
+
+    # Only what an index serves
+    view.sort_indexed_only = True
+    eq_(sorted(view.get_sortable_columns()), ['author.name'])
+    eq_(titles('/admin/book/?sort=-year'), ['Ficciones', 'Emma', 'Amerika'])
+    view.sort_indexed_only = False
+
+    view.keyset_pagination = True
+    view.list_per_page = 2
+    data = client.get('/admin/book/?sort=author.name').data
+    ok_('Ficciones' in data and 'Amerika' not in data)
+    next_url = re.search(r'href="([^"]*cursor=[^"]*)">&gt;', data).group(1)
+    data = client.get(next_url.replace('&amp;', '&')).data
+    ok_('Amerika' in data and 'Ficciones' not in data)
+
+    view.sortable_columns = ('author.books',)
+    assert_raises(ValueError, view.get_sortable_columns)
+
+
+def test_list_projection():
+    app, db, admin = setup()
+
+    class Author(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+
+    class Post(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.String(20))
+        year = db.Column(db.Integer)
+        body = db.Column(db.Text)
+        author_id = db.Column(db.Integer, db.ForeignKey(Author.id))
+        author = db.relationship(Author)
+
+        @property
+        def summary(self):
+            return self.body[:10]
+
+    db.create_all()
+    db.session.add(Post(title='Hello', year=2000, body='x' * 1000,
+                        author=Author(name='Ann')))
+    db.session.commit()
+
+    view = CustomModelView(Post, db.session,
+                           list_display=('title', 'author.name'),
+                           sortable_columns=('title', 'year'))
+    admin.add_view(view)
+
+    eq_(view.get_list_projection(), ['title', 'author_id'])
+    eq_(view.get_list_projection('year'), ['title', 'author_id', 'year'])
+
+    db.session.expunge_all()
+    count, data = view.get_list(execute=True)
+    post = data[0]
+    ok_('body' not in post.__dict__ and 'year' not in post.__dict__)
+    eq_(post.title, 'Hello')
+    eq_(view.get_column(post, 'author.name'), 'Ann')
+
+    client = app.test_client()
+    rv = client.get('/admin/post/')
+    ok_('Hello' in rv.data and 'Ann' in rv.data)
+    rv = client.get('/admin/post/export/')
+    eq_(rv.data.splitlines()[1], 'Hello,Ann')
+
+    # Properties and admin methods can use any field
+    view.list_display = ('title', 'summary')
+    eq_(view.get_list_projection(), None)
+    view.list_display = ('title', 'get_body')
+    view.get_body = lambda post: post.body
+    eq_(view.get_list_projection(), None)
+
+    view.list_display = ('title',)
+    view.list_projection = False
+    eq_(view.get_list_projection(), None)
+
+
+def test_update_actions():
+    from flask_superadmin.model.actions import UpdateAction
+
+    app, db, admin = setup()
+
+    class Task(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.String(20))
+        status = db.Column(db.String(20))
+        done = db.Column(db.Boolean, default=False)
+
+    db.create_all()
+    for i in range(5):
+        db.session.add(Task(title='task%d' % i, status='new'))
+    db.session.commit()
+
+    view = CustomModelView(Task, db.session, update_chunk_size=2,
+                           update_actions=(
+                               UpdateAction('finish', values={'done': True}),
+                               UpdateAction('set_status', 'Change status',
+                                            fields=('status',))))
+    admin.add_view(view)
+    client = app.test_client()
+
+    statements = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    rv = client.get('/admin/task/')
+    ok_('<option value="finish">Finish</option>' in rv.data)
+    ok_('<option value="set_status">Change status</option>' in rv.data)
+
+    # Values set right away, with an UPDATE per chunk of primary keys
+    ok_(view.can_bulk_update({'done': True}))
+    ok_(not view.can_bulk_update({'title': 'x', 'missing': 1}))
+    del statements[:]
+    rv = client.post('/admin/task/', data={'action': 'finish',
+                                           '_selected_action': ['1', '2',
+                                                                '3']})
+    eq_(rv.status_code, 302)
+    eq_(len([s for s in statements if s.startswith('UPDATE')]), 2)
+    eq_(sorted(t.id for t in Task.query.filter_by(done=True)), [1, 2, 3])
+
+    # Fields are asked for first
+    rv = client.post('/admin/task/', data={'action': 'set_status',
+                                           '_selected_action': ['4', '5']})
+    eq_(rv.status_code, 200)
+    ok_('name="update-status"' in rv.data)
+    eq_(Task.query.filter_by(status='new').count(), 5)
+
+    rv = client.post('/admin/task/', data={'action': 'set_status',
+                                           '_selected_action': ['4', '5'],
+                                           'update-status': 'closed',
+                                           'confirm_update': '1'})
+    eq_(rv.status_code, 302)
+    eq_(sorted(t.id for t in Task.query.filter_by(status='closed')), [4, 5])
+
+    # Rows are saved one by one for ORM events
+    updated = []
+
+    @event.listens_for(Task, 'before_update')
+    def before_update(mapper, connection, target):
+        updated.append(target.id)
+
+    ok_(not view.can_bulk_update({'done': False}))
+    eq_(view.update_models({'done': False}, 1, 2), 2)
+    eq_(sorted(updated), [1, 2])
+    eq_(Task.query.filter_by(done=True).count(), 1)
+
+    # Every row matching the search
+    view.search_fields = ('title',)
+    rv = client.post('/admin/task/?q=task1', data={'action': 'set_status',
+                                                   'select_across': '1'})
+    ok_('name="select_across"' in rv.data)
+    ok_('name="_selected_action"' not in rv.data)
+    rv = client.post('/admin/task/?q=task1', data={'action': 'set_status',
+                                                   'select_across': '1',
+                                                   'update-status': 'moved',
+                                                   'confirm_update': '1'})
+    eq_(rv.status_code, 302)
+    eq_([t.title for t in Task.query.filter_by(status='moved')], ['task1'])
+
+    # with one statement, and only once confirmed
+    event.remove(Task, 'before_update', before_update)
+    rv = client.post('/admin/task/?q=task', data={'action': 'finish',
+                                                  'select_across': '1'})
+    eq_(rv.status_code, 200)
+    ok_('to all 5 Tasks matching &#34;task&#34;?' in rv.data)
+    ok_('name="confirm_update"' in rv.data)
+    eq_(Task.query.filter_by(done=True).count(), 1)
+    del statements[:]
+    rv = client.post('/admin/task/?q=task', data={'action': 'finish',
+                                                  'select_across': '1',
+                                                  'confirm_update': '1'})
+    eq_(rv.status_code, 302)
+    eq_(len([s for s in statements if s.startswith('UPDATE')]), 1)
+    eq_(Task.query.filter_by(done=True).count(), 5)
+
+
+def test_custom_actions():
+    from flask_superadmin.model.actions import action
+
+    app, db, admin = setup()
+
+    class Post(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.String(20))
+        archived = db.Column(db.Boolean, default=False)
+
+    db.create_all()
+    for title in ('news1', 'news2', 'blog1', 'blog2'):
+        db.session.add(Post(title=title))
+    db.session.commit()
+
+    querysets = []
+
+    class PostAdmin(CustomModelView):
+        @action('archive', 'Archive')
+        def archive_posts(self, qs):
+            querysets.append(qs)
+            qs.update({'archived': True}, synchronize_session=False)
+            self.session.commit()
+
+        @action(permission=None)
+        def count_posts(self, qs):
+            return str(qs.count())
+
+        @action(permission='delete')
+        def purge(self, qs):
+            qs.delete(synchronize_session=False)
+            self.session.commit()
+
+    view = PostAdmin(Post, db.session, search_fields=('title',))
+    admin.add_view(view)
+    client = app.test_client()
+
+    rv = client.get('/admin/post/')
+    ok_('<option value="delete">' in rv.data)
+    ok_('<option value="archive">Archive</option>' in rv.data)
+    ok_('<option value="count_posts">Count posts</option>' in rv.data)
+    ok_('select_across' not in rv.data)
+    ok_('select_across' in client.get('/admin/post/?q=news').data)
+
+    # The action gets a query of the selected rows
+    rv = client.post('/admin/post/', data={'action': 'archive',
+                                           '_selected_action': ['1', '3']})
+    eq_(rv.status_code, 302)
+    ok_(hasattr(querysets[0], 'update'))
+    eq_(sorted(p.id for p in Post.query.filter_by(archived=True)), [1, 3])
+
+    # or of every row matching the search
+    rv = client.post('/admin/post/?q=news', data={'action': 'count_posts',
+                                                  'select_across': '1'})
+    eq_(rv.data, '2')
+
+    # but never of the whole table
+    rv = client.post('/admin/post/', data={'action': 'count_posts',
+                                           'select_across': '1'})
+    eq_(rv.status_code, 200)
+    ok_('<option value="archive">' in rv.data)
+
+    # Deleting every matching row goes through its confirmation
+    rv = client.post('/admin/post/?q=blog', data={'action': 'delete',
+                                                  'select_across': '1'})
+    eq_(rv.status_code, 302)
+    ok_(rv.location.endswith('/admin/post/delete/?q=blog'))
+
+    # Unknown actions just show the list
+    rv = client.post('/admin/post/', data={'action': 'nope',
+                                           '_selected_action': ['1']})
+    eq_(rv.status_code, 200)
+
+    # Actions need the permission they declare, editing by default
+    view.can_edit = False
+    view.can_delete = False
+    rv = client.get('/admin/post/')
+    ok_('<option value="archive">' not in rv.data)
+    ok_('<option value="purge">' not in rv.data)
+    ok_('<option value="count_posts">' in rv.data)
+    for name in ('archive', 'purge'):
+        rv = client.post('/admin/post/', data={'action': name,
+                                               '_selected_action': ['2']})
+        eq_(rv.status_code, 403)
+    eq_(Post.query.filter_by(archived=True).count(), 2)
+    eq_(Post.query.count(), 4)
+    rv = client.post('/admin/post/', data={'action': 'count_posts',
+                                           '_selected_action': ['2']})
+    eq_(rv.data, '1')
+
+    view.can_delete = True
+    ok_('<option value="purge">' in client.get('/admin/post/').data)
+    rv = client.post('/admin/post/', data={'action': 'purge',
+                                           '_selected_action': ['2']})
+    eq_(rv.status_code, 302)
+    eq_(Post.query.count(), 3)
+
+    assert_raises(ValueError, action, permission='view')
+
+
+def test_unique_validation():
+    app, db, admin = setup()
+
+    class Team(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+
+        def __unicode__(self):
+            return self.name
+
+    class Player(db.Model):
+        __table_args__ = (db.UniqueConstraint('team_id', 'number'),)
+        id = db.Column(db.Integer, primary_key=True)
+        email = db.Column(db.String(20), unique=True, nullable=False)
+        code = db.Column(db.String(20), unique=True)
+        number = db.Column(db.Integer, nullable=False)
+        team_id = db.Column(db.Integer, db.ForeignKey(Team.id),
+                            nullable=False)
+        team = db.relationship(Team)
+
+    db.create_all()
+    red, blue = Team(name='red'), Team(name='blue')
+    db.session.add_all([red, blue])
+    db.session.add(Player(email='a@x', code='A', number=1, team=red))
+    db.session.add(Player(email='b@x', code='B', number=2, team=red))
+    db.session.commit()
+
+    view = CustomModelView(Player, db.session)
+    admin.add_view(view)
+    client = app.test_client()
+
+    eq_(sorted(view.get_unique_checks()),
+        [('code',), ('email',), ('id',), ('team', 'number')])
+
+    statements = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # All unique columns are checked in one query
+    rv = client.post('/admin/player/add/', data={'email': 'a@x', 'code': 'B',
+                                                 'number': '1', 'team': '1'})
+    eq_(rv.status_code, 200)
+    eq_(rv.data.count('Already exists.'), 2)
+    ok_('Already exists with the same team, number.' in rv.data)
+    eq_(len([s for s in statements if 'EXISTS' in s]), 1)
+    eq_(Player.query.count(), 2)
+
+    # The edited row is left out
+    rv = client.post('/admin/player/1/', data={'email': 'a@x', 'code': 'C',
+                                               'number': '1', 'team': '1'})
+    eq_(rv.status_code, 302)
+    eq_(Player.query.get(1).code, 'C')
+
+    rv = client.post('/admin/player/add/', data={'email': 'c@x', 'code': 'A',
+                                                 'number': '1', 'team': '2'})
+    eq_(rv.status_code, 302)
+    eq_(Player.query.count(), 3)
+
+    # Rows the view doesn't list still conflict
+    view.get_queryset = lambda: db.session.query(Player).filter_by(team=blue)
+    rv = client.post('/admin/player/add/', data={'email': 'b@x', 'code': 'D',
+                                                 'number': '3', 'team': '2'})
+    eq_(rv.status_code, 200)
+    eq_(rv.data.count('Already exists.'), 1)
+    eq_(Player.query.count(), 3)
+
+
+def test_list_filters():
+    from flask_superadmin.model.backends.sqlalchemy.filters import FilterEqual
+
+    app, db, admin = setup()
+
+    class Order(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        customer = db.Column(db.String(20), index=True)
+        total = db.Column(db.Integer)
+        paid = db.Column(db.Boolean)
+        created = db.Column(db.Date)
+
+    db.create_all()
+    for i in range(10):
+        db.session.add(Order(customer='cust%d' % (i % 3), total=i * 10,
+                             paid=i % 2 == 0,
+                             created=datetime.date(2013, 1, i + 1)))
+    db.session.commit()
+
+    view = CustomModelView(Order, db.session, list_display=('customer',),
+                           search_fields=('customer',),
+                           list_filters=('customer', 'total', 'paid',
+                                         'created',
+                                         FilterEqual(Order.id, 'Number')))
+    admin.add_view(view)
+    client = app.test_client()
+
+    names = [(unicode(f.name), unicode(f.operation()))
+             for f in view.get_filters()]
+    eq_(names[:4], [('Customer', 'equals'), ('Customer', 'not equal'),
+                    ('Customer', 'contains'), ('Customer', 'not contains')])
+    eq_(names[4:6], [('Total', 'equals'), ('Total', 'not equal')])
+    eq_(names[8:10], [('Paid', 'equals'), ('Paid', 'not equal')])
+    eq_(names[-1], ('Number', 'equals'))
+    groups, options, types = view.get_filter_groups()
+    eq_(groups.keys(), ['Customer', 'Total', 'Paid', 'Created', 'Number'])
+    eq_(options, {8: [('1', 'Yes'), ('0', 'No')],
+                  9: [('1', 'Yes'), ('0', 'No')]})
+    eq_(types[10], 'datepicker')
+
+    with app.test_request_context('/admin/order/?flt1_6=30&flt0_8=1'
+                                  '&flt2_4=abc&flt3_99=1&q=cust'):
+        eq_(view.filters, [(8, '1'), (6, '30')])
+        eq_(view.get_filter_args(), {'flt0_8': '1', 'flt1_6': '30'})
+        ok_('flt0_8=1' in view.page_url(2))
+        ok_('flt1_6=30' in view.sort_url('customer'))
+        ok_('flt1_6=30' in view.export_url('csv'))
+
+    statements = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # Applied by the database, to the count too
+    rv = client.get('/admin/order/?flt0_0=cust1&flt1_8=0')
+    eq_(rv.status_code, 200)
+    ok_('Total count: 2' in rv.data)
+    ok_('name="flt0_0" type="text" value="cust1"' in rv.data)
+    ok_('<option value="0" selected="selected">No</option>' in rv.data)
+    eq_(len([s for s in statements if 'count(' in s.lower() and
+             'customer = ?' in s and 'paid = 0' in s]), 1)
+
+    eq_(view.get_list(filters=[(7, '20')], execute=True)[0], 2)
+    eq_(view.get_list(filters=[(13, '2013-01-05')], execute=True)[0], 4)
+    eq_(view.get_list(filters=[(14, '3')], execute=True)[1][0].id, 3)
+
+    rv = client.get('/admin/order/export/?format=csv&flt0_6=50')
+    eq_(len(rv.data.strip().splitlines()), 5)
+
+    # Actions on every matching row only need filters
+    rv = client.post('/admin/order/?flt0_8=1',
+                     data={'action': 'delete', 'select_across': '1'})
+    ok_(rv.location.endswith('/admin/order/delete/?flt0_8=1'))
+    rv = client.post('/admin/order/delete/?flt0_8=1',
+                     data={'confirm_delete': 'Confirm'})
+    eq_(rv.status_code, 302)
+    eq_(Order.query.count(), 5)
+    eq_(Order.query.filter_by(paid=True).count(), 0)
+
+    view.list_filters = ('nope',)
+    assert_raises(ValueError, view.get_filters)
+
+
+def test_list_facets():
+    app, db, admin = setup()
+
+    class Ticket(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.String(20))
+        status = db.Column(db.String(20))
+        urgent = db.Column(db.Boolean)
+
+    db.create_all()
+    for i, status in enumerate(['open', 'open', 'open', 'closed', 'closed',
+                                'spam', None]):
+        db.session.add(Ticket(title='ticket%d' % i, status=status,
+                              urgent=i % 3 == 0))
+    db.session.commit()
+
+    view = CustomModelView(Ticket, db.session, search_fields=('title',),
+                           list_filters=('title',),
+                           list_facets=('status', 'urgent'),
+                           list_facet_limit=3)
+    admin.add_view(view)
+    client = app.test_client()
+
+    # Facet fields are filtered by their equality filter
+    eq_(view.get_filter_fields(), ['title'] * 4 + ['status'] * 4 +
+        ['urgent'] * 2)
+
+    statements = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.test_request_context('/admin/ticket/?flt0_4=open'):
+        status, urgent = view.get_facets(filters=view.filters, count=3)
+        eq_(status.label, 'Status')
+        eq_([(v.label, v.count, v.active) for v in status.values],
+            [('open', 3, True), ('closed', 2, False), ('None', 1, False)])
+        # NULLs can't be filtered by
+        eq_(status.values[2].url, None)
+        # The facet's own filter is left out of its counts and links
+        ok_('flt0_4=closed' in status.values[1].url)
+        ok_('flt' not in status.values[0].url)
+        eq_([(v.label, v.count) for v in urgent.values],
+            [('No', 2), ('Yes', 1)])
+        ok_('flt0_4=open' in urgent.values[1].url)
+        ok_('flt1_8=1' in urgent.values[1].url)
+    eq_(len([s for s in statements if 'GROUP BY' in s]), 2)
+
+    # Cached until the model changes
+    del statements[:]
+    with app.test_request_context('/admin/ticket/?flt0_4=open'):
+        view.get_facets(filters=view.filters, count=3)
+    eq_(statements, [])
+
+    rv = client.get('/admin/ticket/?q=ticket1')
+    ok_('<strong>Status:</strong>' in rv.data)
+    ok_('(1)' in rv.data)
+
+    rv = client.post('/admin/ticket/1/delete/',
+                     data={'confirm_delete': 'Confirm'})
+    del statements[:]
+    with app.test_request_context('/admin/ticket/'):
+        status, urgent = view.get_facets(count=6)
+    eq_(status.values[0].count, 2)
+    eq_(len([s for s in statements if 'GROUP BY' in s]), 2)
+
+    # Skipped for large tables
+    view.list_facet_max_rows = 5
+    with app.test_request_context('/admin/ticket/'):
+        eq_(view.get_facets(count=6), [])
+        eq_(len(view.get_facets(count=5)), 2)
+
+
+def test_date_hierarchy():
+    app, db, admin = setup()
+
+    class Event(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+        start = db.Column(db.DateTime, index=True)
+
+    db.create_all()
+    for i, start in enumerate([(2012, 12, 31, 23), (2013, 1, 1, 0),
+                               (2013, 1, 15, 12), (2013, 3, 1, 8)]):
+        db.session.add(Event(name='event%d' % i,
+                             start=datetime.datetime(*start)))
+    db.session.add(Event(name='undated'))
+    db.session.commit()
+
+    view = CustomModelView(Event, db.session, list_display=('name',),
+                           list_filters=('name',),
+                           date_hierarchy='start')
+    admin.add_view(view)
+    client = app.test_client()
+
+    # Added after the other filters
+    index = len(view.get_filters()) - 1
+    eq_(index, 4)
+
+    statements = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.test_request_context('/admin/event/'):
+        hierarchy = view.get_date_hierarchy(count=5)
+        eq_([c.label for c in hierarchy.crumbs], ['All dates'])
+        eq_([(b.label, b.count) for b in hierarchy.buckets],
+            [('2012', 1), ('2013', 3)])
+        ok_('flt0_4=2013' in hierarchy.buckets[1].url)
+    eq_(len([s for s in statements if 'GROUP BY' in s]), 1)
+
+    with app.test_request_context('/admin/event/?flt0_2=event&flt1_4=2013'):
+        filters = view.filters
+        hierarchy = view.get_date_hierarchy(filters=filters, count=3)
+        eq_([c.label for c in hierarchy.crumbs], ['All dates', '2013'])
+        ok_('flt0_2=event' in hierarchy.crumbs[0].url)
+        ok_('flt0_4' not in hierarchy.crumbs[0].url)
+        eq_([(b.label, b.count) for b in hierarchy.buckets],
+            [('January', 2), ('March', 1)])
+        ok_('flt1_4=2013-01' in hierarchy.buckets[0].url)
+
+        # The period is a range on the column, not a function of it
+        del statements[:]
+        count, data = view.get_list(filters=filters)
+        eq_(count, 3)
+        ok_(not [s for s in statements if 'strftime' in s])
+
+    with app.test_request_context('/admin/event/?flt0_4=2013-01-15'):
+        hierarchy = view.get_date_hierarchy(filters=view.filters, count=1)
+        eq_([c.label for c in hierarchy.crumbs],
+            ['All dates', '2013', 'January 2013', 'January 15, 2013'])
+        eq_(hierarchy.buckets, [])
+
+    # Invalid periods are ignored
+    with app.test_request_context('/admin/event/?flt0_4=2013-13'):
+        eq_(view.filters, [])
+
+    rv = client.get('/admin/event/?flt0_4=2013-01')
+    eq_(rv.status_code, 200)
+    ok_('January 2013' in rv.data)
+    ok_('event2' in rv.data)
+    ok_('event0' not in rv.data)
+
+    # Not counted for large tables
+    view.list_facet_max_rows = 2
+    with app.test_request_context('/admin/event/'):
+        eq_([(b.label, b.count) for b in
+             view.get_date_hierarchy(count=5).buckets],
+            [('2012', None), ('2013', None)])
+    with app.test_request_context('/admin/event/?flt0_4=2013-02'):
+        buckets = view.get_date_hierarchy(filters=view.filters,
+                                          count=5).buckets
+        eq_(len(buckets), 28)
+        eq_(buckets[0].count, None)